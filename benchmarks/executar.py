@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from servidor_local import ConfigServidor, ServidorLocal, pregoes, serie_precos, serie_sgs
+
+# Benchmarks offline: coletas contra o servidor local, contexto dos agentes, carga do dashboard e
+# índice do chat, em várias escalas de tickers. Cada escala roda num processo próprio, com um
+# diretório de dados temporário, e o resultado vai para um relatório JSON comparável entre execuções.
+DIRETORIO_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+RAIZ_PROJETO = os.path.dirname(DIRETORIO_BENCHMARKS)
+DIRETORIO_SCRIPTS = os.path.join(RAIZ_PROJETO, "scripts")
+DIRETORIO_RESULTADOS = os.path.join(DIRETORIO_BENCHMARKS, "resultados")
+ARQUIVO_REFERENCIA = os.path.join(DIRETORIO_BENCHMARKS, "referencia.json")
+
+ESCALAS_PADRAO = "10,500,5000"
+# Pregões que faltam no histórico semeado: é o que a coleta de preços tem de buscar e acrescentar
+PREGOES_NOVOS = 5
+# Tickers com histórico completo (5000 pregões em CSV) baixado na etapa de backfill
+TICKERS_BACKFILL = 20
+BUSCAS_RECUPERACAO = 100
+# Regressão: mais lento que a referência além da tolerância e por mais que a folga (ruído)
+TOLERANCIA = 0.20
+FOLGA_S = 0.05
+
+PERGUNTAS = ["Como está a Selic?", "Qual a tendência do IPCA?", "Vale a pena comprar ações de bancos?",
+             "O que as notícias dizem sobre o Ibovespa?", "Qual ação teve maior volatilidade?"]
+
+
+def cronometrar(resultados: dict, etapa: str, funcao, *args, **kwargs):
+    print(f"⏱️ {etapa}...", flush=True)
+    inicio = time.perf_counter()
+    valor = funcao(*args, **kwargs)
+    resultados[etapa] = {"duracao_s": round(time.perf_counter() - inicio, 4)}
+    return valor
+
+
+# --- Execução de uma escala (processo filho) ---
+
+def semear(tickers: list, anos: int, ultimo_dia, codigos_sgs: dict):
+    """Histórico de `anos` anos até PREGOES_NOVOS pregões antes do último, como se viesse de coletas anteriores."""
+    import armazem_precos
+    import dados
+    import indicadores_tecnicos
+
+    fim_semeado = pregoes(ultimo_dia, PREGOES_NOVOS + 1)[0]
+    datas = pregoes(fim_semeado, anos * 252)
+    partes = [serie_precos(t, datas).rename_axis("data").reset_index().assign(ticker=t) for t in tickers]
+    dados.acrescentar("precos", pd.concat(partes, ignore_index=True))
+    armazem_precos.salvar_indice({t: {"ultima_data": fim_semeado.date().isoformat()} for t in tickers})
+    indicadores_tecnicos.main()
+
+    inicio_sgs = (fim_semeado - pd.DateOffset(years=anos)).date()
+    series = []
+    for nome, codigo in codigos_sgs.items():
+        df = pd.DataFrame(serie_sgs(codigo, inicio_sgs, fim_semeado.date()))
+        df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y")
+        df["valor"] = df["valor"].str.replace(",", ".").astype(float)
+        series.append(df.assign(indicador=nome, data_coleta=fim_semeado))
+    dados.salvar("indicadores_economicos", pd.concat(series, ignore_index=True))
+    return len(tickers) * len(datas)
+
+
+def contexto_agentes():
+    """Mesma sequência de agentes_economicos.executar_analise até o contexto pronto (sem CrewAI).
+
+    A atualização da análise cruzada é medida à parte, na etapa "analise_cruzada".
+    """
+    import analise_cruzada
+    import contexto
+    import dados
+    import indicadores_tecnicos
+
+    df_acoes = dados.ler("top_10_acoes").set_index("data")
+    df_noticias = dados.ler("noticias_investimentos")
+    df_indices = dados.ler("indicadores_economicos")
+    tickers = df_acoes["ticker"].unique().tolist()
+    df_tecnicos = indicadores_tecnicos.carregar_indicadores(tickers=tickers)
+    df_sensibilidades = analise_cruzada.sensibilidades_recentes(analise_cruzada.carregar_analise(tickers=tickers))
+    secoes = contexto.construir_contexto(df_acoes, df_indices, df_noticias, df_tecnicos=df_tecnicos,
+                                         df_sensibilidades=df_sensibilidades)
+    contexto.resumos_por_ticker(df_acoes, df_tecnicos=df_tecnicos, df_sensibilidades=df_sensibilidades)
+    return sum(secoes["tokens"].values())
+
+
+def carga_dashboard():
+    """Leituras da primeira carga do dashboard, com o mesmo agrupamento de `indexar_por_grupo`."""
+    import dados
+
+    linhas = 0
+    for tabela, coluna_grupo in (("top_10_acoes", "ticker"), ("indicadores_tecnicos", "ticker"),
+                                 ("indicadores_economicos", "indicador")):
+        df = dados.ler(tabela).dropna(subset=["data"]).sort_values("data", kind="stable")
+        grupos = {str(v): g.drop(columns=coluna_grupo).set_index("data")
+                  for v, g in df.groupby(coluna_grupo, observed=True, sort=True)}
+        linhas += sum(len(g) for g in grupos.values())
+    linhas += len(dados.ler("noticias_investimentos"))
+    return linhas
+
+
+def chat_simulado(servidor: ServidorLocal, indice) -> str:
+    """Uma pergunta do chat contra o modelo simulado; None se o langchain-openai não estiver instalado."""
+    try:
+        from langchain_openai import AzureChatOpenAI
+    except ImportError:
+        return None
+    modelo = AzureChatOpenAI(azure_deployment="simulado", azure_endpoint=servidor.base, api_key="benchmark",
+                             api_version="2024-02-01", temperature=0)
+    pergunta = PERGUNTAS[0]
+    return modelo.invoke([("system", indice.contexto(pergunta)), ("human", pergunta)]).content
+
+
+def medir_escala(escala: int, anos: int, config: ConfigServidor) -> dict:
+    diretorio_dados = tempfile.mkdtemp(prefix=f"benchmark-{escala}-")
+    os.environ["AGENTES_DADOS_DIR"] = diretorio_dados
+    # O limitador de taxa não deve ser o gargalo medido (a não ser com 503/notas simuladas)
+    os.environ["ALPHA_VANTAGE_CHAMADAS_POR_MINUTO"] = "1000000"
+    os.environ["ALPHA_VANTAGE_CHAMADAS_POR_DIA"] = "1000000"
+    os.environ.setdefault("ALPHA_VANTAGE_API_KEY", "benchmark")
+    sys.path.insert(0, DIRETORIO_SCRIPTS)
+    import armazem_precos
+
+    config.ultimo_dia = armazem_precos.ultimo_pregao().date()
+    resultados = {}
+    try:
+        with ServidorLocal(config) as servidor:
+            # As URLs são lidas na importação dos coletores
+            os.environ["ALPHA_VANTAGE_URL"] = servidor.url_alpha_vantage
+            os.environ["BCB_SGS_URL"] = servidor.url_sgs
+            tickers = [f"T{i:04d}" for i in range(escala)]
+            # Universo sintético, todo no nível 1: cada ticker é coletado nesta execução
+            arquivo_universo = os.path.join(diretorio_dados, "universo_acoes.csv")
+            pd.DataFrame({"ticker": tickers, "nivel": 1, "setor": "Sintético"}).to_csv(arquivo_universo, index=False)
+            os.environ["ACOES_UNIVERSO"] = arquivo_universo
+            import acoes_bovespa
+            import analise_cruzada
+            import indicadores_economicos
+            import instrumentacao
+            import noticias
+            from recuperacao import IndiceRecuperacao
+
+            noticias.sites = servidor.urls_noticias()
+
+            linhas = cronometrar(resultados, "semear_historico", semear, tickers, anos, config.ultimo_dia,
+                                 indicadores_economicos.indicadores)
+            resultados["semear_historico"]["linhas"] = linhas
+
+            cronometrar(resultados, "coleta_acoes", acoes_bovespa.main)
+            cronometrar(resultados, "backfill_acoes", acoes_bovespa.backfill, tickers[:TICKERS_BACKFILL])
+            cronometrar(resultados, "coleta_indicadores", indicadores_economicos.main)
+            cronometrar(resultados, "coleta_noticias", noticias.main)
+            # Segunda coleta: as páginas respondem 304 e nada é parseado de novo
+            cronometrar(resultados, "coleta_noticias_304", noticias.main)
+
+            cronometrar(resultados, "analise_cruzada", analise_cruzada.main)
+            tokens = cronometrar(resultados, "contexto_agentes", contexto_agentes)
+            resultados["contexto_agentes"]["tokens"] = tokens
+            linhas = cronometrar(resultados, "carga_dashboard", carga_dashboard)
+            resultados["carga_dashboard"]["linhas"] = linhas
+
+            indice = IndiceRecuperacao()
+            cronometrar(resultados, "indice_recuperacao", indice.atualizar)
+            cronometrar(resultados, "buscas_recuperacao",
+                        lambda: [indice.contexto(PERGUNTAS[i % len(PERGUNTAS)]) for i in range(BUSCAS_RECUPERACAO)])
+            resultados["buscas_recuperacao"]["por_busca_ms"] = round(
+                resultados["buscas_recuperacao"]["duracao_s"] * 1000 / BUSCAS_RECUPERACAO, 3)
+
+            if cronometrar(resultados, "chat_llm_simulado", chat_simulado, servidor, indice) is None:
+                resultados["chat_llm_simulado"] = {"pulada": "langchain-openai não instalado"}
+
+            # p50/p95 dos trechos instrumentados (HTTP, parsing...) durante esta escala
+            resumo = instrumentacao.resumir_por_estagio(instrumentacao.ler_metricas())
+            trechos = json.loads(resumo.to_json(orient="records"))
+    finally:
+        shutil.rmtree(diretorio_dados, ignore_errors=True)
+    return {"etapas": resultados, "trechos": trechos}
+
+
+# --- Orquestração e relatório ---
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ_PROJETO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual: dict, referencia: dict, tolerancia: float = TOLERANCIA) -> list:
+    """Etapas mais lentas que a referência além da tolerância: [(escala, etapa, antes_s, agora_s)]."""
+    regressoes = []
+    for escala, resultado in atual["escalas"].items():
+        anteriores = referencia.get("escalas", {}).get(escala, {}).get("etapas", {})
+        for etapa, medida in resultado["etapas"].items():
+            antes, agora = anteriores.get(etapa, {}).get("duracao_s"), medida.get("duracao_s")
+            if antes is None or agora is None:
+                continue
+            if agora > antes * (1 + tolerancia) and agora - antes > FOLGA_S:
+                regressoes.append((escala, etapa, antes, agora))
+    return regressoes
+
+
+def imprimir_relatorio(relatorio: dict, referencia: dict = None):
+    print(f"\n📊 Benchmarks ({relatorio['commit'] or 'sem commit'}, {relatorio['gerado_em']}):")
+    print(f"{'escala':>7}  {'etapa':<24}{'tempo (s)':>11}{'referência':>12}{'variação':>10}")
+    for escala, resultado in relatorio["escalas"].items():
+        anteriores = (referencia or {}).get("escalas", {}).get(escala, {}).get("etapas", {})
+        for etapa, medida in resultado["etapas"].items():
+            if "duracao_s" not in medida:
+                print(f"{escala:>7}  {etapa:<24}{'pulada':>11}")
+                continue
+            antes = anteriores.get(etapa, {}).get("duracao_s")
+            variacao = f"{medida['duracao_s'] / antes - 1:+.0%}" if antes else "-"
+            referencia_s = f"{antes:.3f}" if antes is not None else "-"
+            print(f"{escala:>7}  {etapa:<24}{medida['duracao_s']:>11.3f}{referencia_s:>12}{variacao:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline das coletas, do contexto dos agentes e do dashboard.")
+    parser.add_argument("--escalas", default=ESCALAS_PADRAO, help="quantidades de tickers, separadas por vírgula")
+    parser.add_argument("--anos", type=int, default=5, help="anos de histórico semeados por ticker e série")
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--latencia-llm-ms", type=float, default=0.0)
+    parser.add_argument("--taxa-503", type=float, default=0.0)
+    parser.add_argument("--taxa-nota", type=float, default=0.0)
+    parser.add_argument("--gravacoes", help="diretório com respostas gravadas (alpha_<TICKER>.json, sgs_<codigo>.json, noticias_<i>.html)")
+    parser.add_argument("--saida", help="arquivo do relatório (padrão: benchmarks/resultados/<data>.json)")
+    parser.add_argument("--comparar", default=ARQUIVO_REFERENCIA, help="relatório de referência para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--salvar-referencia", action="store_true", help="grava este relatório como a nova referência")
+    parser.add_argument("--exigir-referencia", action="store_true",
+                        help="falha se não houver relatório de referência (uso no CI)")
+    parser.add_argument("--escala-interna", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--saida-interna", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    config = ConfigServidor(latencia_ms=args.latencia_ms, latencia_llm_ms=args.latencia_llm_ms, taxa_503=args.taxa_503,
+                            taxa_nota=args.taxa_nota, anos_sgs=args.anos, diretorio_gravacoes=args.gravacoes)
+
+    if args.escala_interna is not None:
+        resultado = medir_escala(args.escala_interna, args.anos, config)
+        with open(args.saida_interna, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False)
+        return
+
+    escalas = [int(e) for e in args.escalas.split(",") if e.strip()]
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "processadores": os.cpu_count(),
+        "parametros": {"anos": args.anos, "latencia_ms": args.latencia_ms, "latencia_llm_ms": args.latencia_llm_ms,
+                       "taxa_503": args.taxa_503, "taxa_nota": args.taxa_nota, "gravacoes": bool(args.gravacoes)},
+        "escalas": {},
+    }
+    repassados = ["--anos", str(args.anos), "--latencia-ms", str(args.latencia_ms), "--latencia-llm-ms",
+                  str(args.latencia_llm_ms), "--taxa-503", str(args.taxa_503), "--taxa-nota", str(args.taxa_nota)]
+    if args.gravacoes:
+        repassados += ["--gravacoes", os.path.abspath(args.gravacoes)]
+    for escala in escalas:
+        print(f"\n🏁 Escala {escala} tickers, {args.anos} anos de histórico")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as temporario:
+            saida_interna = temporario.name
+        try:
+            # Processo novo por escala: a camada de dados lê o diretório na importação
+            subprocess.run([sys.executable, os.path.abspath(__file__), *repassados,
+                            "--escala-interna", str(escala), "--saida-interna", saida_interna], check=True)
+            with open(saida_interna, "r", encoding="utf-8") as f:
+                relatorio["escalas"][str(escala)] = json.load(f)
+        finally:
+            os.remove(saida_interna)
+
+    saida = args.saida or os.path.join(DIRETORIO_RESULTADOS, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\n📁 Relatório salvo em '{saida}'")
+
+    referencia = None
+    if args.comparar and os.path.exists(args.comparar):
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            referencia = json.load(f)
+    imprimir_relatorio(relatorio, referencia)
+
+    if args.salvar_referencia:
+        shutil.copyfile(saida, ARQUIVO_REFERENCIA)
+        print(f"📌 Referência atualizada: '{ARQUIVO_REFERENCIA}'")
+    elif referencia is not None:
+        regressoes = comparar(relatorio, referencia, args.tolerancia)
+        for escala, etapa, antes, agora in regressoes:
+            print(f"❌ Regressão na escala {escala}, etapa '{etapa}': {antes:.3f} s -> {agora:.3f} s")
+        if regressoes:
+            sys.exit(1)
+        print(f"✅ Nenhuma etapa mais de {args.tolerancia:.0%} mais lenta que a referência.")
+    elif args.exigir_referencia:
+        print(f"❌ Relatório de referência '{args.comparar}' não encontrado (use --salvar-referencia para criar um).")
+        sys.exit(1)
+    else:
+        print("ℹ️ Sem relatório de referência para comparar (use --salvar-referencia para criar um).")
+
+
+if __name__ == "__main__":
+    main()
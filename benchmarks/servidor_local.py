@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+# Servidor HTTP local que imita a Alpha Vantage, o SGS do BCB, os portais de notícias e o
+# endpoint de chat do Azure OpenAI, para medir as coletas sem chaves e sem rede.
+
+PALAVRAS_MANCHETES = ["Ibovespa", "Selic", "juros", "inflação", "IPCA", "ações", "mercado", "bolsa", "economia"]
+NOTA_LIMITE_MINUTO = ("Thank you for using Alpha Vantage! Our standard API rate limit is 5 requests per minute. "
+                      "Please subscribe to any of the premium plans.")
+
+
+@dataclass
+class ConfigServidor:
+    latencia_ms: float = 0.0        # atraso de cada resposta GET
+    latencia_llm_ms: float = 0.0    # atraso da resposta do modelo simulado
+    taxa_503: float = 0.0           # fração das chamadas à Alpha Vantage respondidas com 503
+    taxa_nota: float = 0.0          # fração respondida com a nota de limite por minuto
+    ultimo_dia: date = None         # último pregão/observação servido (padrão: hoje)
+    anos_sgs: int = 5               # histórico disponível em cada série do SGS
+    paginas_noticias: int = 4
+    links_por_pagina: int = 200
+    tokens_resposta_llm: int = 400
+    diretorio_gravacoes: str = None  # respostas gravadas (alpha_<TICKER>.json, sgs_<codigo>.json, noticias_<i>.html)
+    semente: int = 42
+
+
+def _semente(*partes) -> int:
+    return int(hashlib.sha256(repr(partes).encode()).hexdigest()[:8], 16)
+
+
+def pregoes(fim: date, quantidade: int) -> pd.DatetimeIndex:
+    return pd.bdate_range(end=fim, periods=quantidade)
+
+
+# Os passeios começam numa data fixa: o mesmo dia tem o mesmo valor em qualquer janela pedida
+INICIO_SERIES = np.datetime64("2000-01-03")
+
+
+def _posicoes(datas: pd.DatetimeIndex) -> np.ndarray:
+    return np.busday_count(INICIO_SERIES, datas.values.astype("datetime64[D]"))
+
+
+def serie_precos(ticker: str, datas: pd.DatetimeIndex) -> pd.DataFrame:
+    """OHLCV sintético e determinístico por ticker (passeio aleatório geométrico)."""
+    posicoes = _posicoes(datas)
+    n = int(posicoes.max()) + 1
+
+    def sorteio(campo):
+        # Um gerador por campo: o prefixo sorteado não depende do tamanho da janela
+        return np.random.default_rng(_semente("precos", ticker, campo))
+
+    fechamento = (20 * np.exp(np.cumsum(sorteio("retorno").normal(0.0003, 0.02, n))))[posicoes]
+    abertura = fechamento * (1 + sorteio("abertura").normal(0, 0.005, n)[posicoes])
+    ruido = np.abs(sorteio("ruido").normal(0, 0.01, (n, 2)))[posicoes]
+    return pd.DataFrame({
+        "abertura": abertura,
+        "alta": np.maximum(abertura, fechamento) * (1 + ruido[:, 0]),
+        "baixa": np.minimum(abertura, fechamento) * (1 - ruido[:, 1]),
+        "fechamento": fechamento,
+        "volume": sorteio("volume").integers(100_000, 50_000_000, n)[posicoes],
+    }, index=datas)
+
+
+def serie_sgs(codigo: int, inicio: date, fim: date) -> list:
+    """Observações diárias (dias úteis) de uma série, no formato do SGS."""
+    datas = pd.bdate_range(inicio, fim)
+    if datas.empty:
+        return []
+    posicoes = _posicoes(datas)
+    rng = np.random.default_rng(_semente("sgs", codigo))
+    valores = (5 + np.cumsum(rng.normal(0, 0.01, int(posicoes.max()) + 1)))[posicoes]
+    return [{"data": d.strftime("%d/%m/%Y"), "valor": f"{v:.2f}".replace(".", ",")} for d, v in zip(datas, valores)]
+
+
+def pagina_noticias(indice: int, links: int) -> bytes:
+    rng = random.Random(_semente("noticias", indice))
+    itens = []
+    for i in range(links):
+        palavra = rng.choice(PALAVRAS_MANCHETES)
+        if i % 3 == 0:
+            itens.append(f'<li><a href="/noticias/{indice}/outros/{i}">Esportes e cultura {i}</a></li>')
+        else:
+            itens.append(f'<li><a href="/noticias/{indice}/materia/{i}">{palavra} em destaque: análise {indice}-{i}</a></li>')
+    corpo = "<html><head><title>Portal</title></head><body><nav>menu</nav><ul>" + "".join(itens) + "</ul></body></html>"
+    return corpo.encode("utf-8")
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: ConfigServidor = None
+    rng: random.Random = None
+    trava_rng = threading.Lock()
+
+    def log_message(self, formato, *args):
+        pass  # Sem uma linha por requisição na saída do benchmark
+
+    def _sortear(self, taxa: float) -> bool:
+        with self.trava_rng:
+            return taxa > 0 and self.rng.random() < taxa
+
+    def _responder(self, status: int, corpo: bytes = b"", tipo: str = "application/json", cabecalhos: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _gravacao(self, nome: str):
+        if not self.config.diretorio_gravacoes:
+            return None
+        caminho = os.path.join(self.config.diretorio_gravacoes, nome)
+        if not os.path.exists(caminho):
+            return None
+        with open(caminho, "rb") as f:
+            return f.read()
+
+    def do_GET(self):
+        if self.config.latencia_ms:
+            time.sleep(self.config.latencia_ms / 1000)
+        url = urlparse(self.path)
+        partes = [p for p in url.path.split("/") if p]
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if partes[:1] == ["query"]:
+            return self._alpha_vantage(params)
+        if partes[:1] == ["sgs"]:
+            return self._sgs(partes, params)
+        if partes[:1] == ["noticias"] and len(partes) == 2:
+            return self._noticias(int(partes[1]))
+        self._responder(404, b"{}")
+
+    def _alpha_vantage(self, params: dict):
+        if self._sortear(self.config.taxa_503):
+            return self._responder(503, b"Service Unavailable", "text/plain")
+        if self._sortear(self.config.taxa_nota):
+            return self._responder(200, json.dumps({"Note": NOTA_LIMITE_MINUTO}).encode())
+        ticker = params.get("symbol", "").removesuffix(".SA")
+        csv = params.get("datatype") == "csv"
+        gravada = self._gravacao(f"alpha_{ticker}.csv" if csv else f"alpha_{ticker}.json")
+        if gravada is not None:
+            return self._responder(200, gravada, "text/csv" if csv else "application/json")
+        quantidade = 100 if params.get("outputsize", "compact") == "compact" else 5000
+        df = serie_precos(ticker, pregoes(self.config.ultimo_dia, quantidade))
+        if csv:
+            # Mesmo formato da API: mais recente primeiro, preços com 4 casas
+            tabela = df[::-1].rename(columns={"abertura": "open", "alta": "high", "baixa": "low",
+                                             "fechamento": "close"})
+            corpo = tabela.rename_axis("timestamp").to_csv(float_format="%.4f", date_format="%Y-%m-%d",
+                                                           lineterminator="\r\n")
+            return self._responder(200, corpo.encode(), "application/x-download")
+        serie = {
+            d.strftime("%Y-%m-%d"): {
+                "1. open": f"{l.abertura:.4f}", "2. high": f"{l.alta:.4f}", "3. low": f"{l.baixa:.4f}",
+                "4. close": f"{l.fechamento:.4f}", "5. volume": str(int(l.volume)),
+            }
+            for d, l in zip(df.index[::-1], df[::-1].itertuples())
+        }
+        corpo = {"Meta Data": {"2. Symbol": params.get("symbol")}, "Time Series (Daily)": serie}
+        self._responder(200, json.dumps(corpo).encode())
+
+    def _sgs(self, partes: list, params: dict):
+        # /sgs/<codigo>/dados[/ultimos/<n>]
+        codigo = int(partes[1])
+        gravada = self._gravacao(f"sgs_{codigo}.json")
+        if gravada is not None:
+            return self._responder(200, gravada)
+        fim = self.config.ultimo_dia
+        if "ultimos" in partes:
+            n = int(partes[partes.index("ultimos") + 1])
+            observacoes = serie_sgs(codigo, fim - timedelta(days=n * 2 + 7), fim)[-n:]
+        else:
+            inicio = datetime.strptime(params["dataInicial"], "%d/%m/%Y").date() if "dataInicial" in params \
+                else fim - timedelta(days=365 * self.config.anos_sgs)
+            if "dataFinal" in params:
+                fim = min(fim, datetime.strptime(params["dataFinal"], "%d/%m/%Y").date())
+            observacoes = serie_sgs(codigo, inicio, fim)
+        if not observacoes:
+            return self._responder(404, b"[]")
+        self._responder(200, json.dumps(observacoes).encode())
+
+    def _noticias(self, indice: int):
+        corpo = self._gravacao(f"noticias_{indice}.html") or pagina_noticias(indice, self.config.links_por_pagina)
+        etag = '"' + hashlib.sha1(corpo).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._responder(304, cabecalhos={"ETag": etag})
+        self._responder(200, corpo, "text/html; charset=utf-8", {"ETag": etag})
+
+    def do_POST(self):
+        # Modelo simulado com a forma da API de chat do Azure OpenAI
+        tamanho = int(self.headers.get("Content-Length", 0))
+        pedido = json.loads(self.rfile.read(tamanho) or b"{}")
+        if self.config.latencia_llm_ms:
+            time.sleep(self.config.latencia_llm_ms / 1000)
+        tokens_prompt = sum(len(str(m.get("content", ""))) for m in pedido.get("messages", [])) // 4
+        texto = " ".join(["análise"] * self.config.tokens_resposta_llm)
+        uso = {"prompt_tokens": tokens_prompt, "completion_tokens": self.config.tokens_resposta_llm,
+               "total_tokens": tokens_prompt + self.config.tokens_resposta_llm}
+        base = {"id": "simulado", "created": int(time.time()), "model": "simulado"}
+        if not pedido.get("stream"):
+            corpo = dict(base, object="chat.completion", usage=uso, choices=[
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": texto}}])
+            return self._responder(200, json.dumps(corpo).encode())
+        eventos = []
+        for palavra in texto.split(" "):
+            eventos.append(dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "finish_reason": None, "delta": {"content": palavra + " "}}]))
+        eventos.append(dict(base, object="chat.completion.chunk", choices=[
+            {"index": 0, "finish_reason": "stop", "delta": {}}]))
+        corpo = "".join(f"data: {json.dumps(e)}\n\n" for e in eventos) + "data: [DONE]\n\n"
+        self._responder(200, corpo.encode(), "text/event-stream")
+
+
+class ServidorLocal:
+    """Servidor em segundo plano numa porta livre; use como context manager.
+
+        with ServidorLocal(ConfigServidor(latencia_ms=50)) as servidor:
+            os.environ["ALPHA_VANTAGE_URL"] = servidor.url_alpha_vantage
+    """
+
+    def __init__(self, config: ConfigServidor = None):
+        self.config = config or ConfigServidor()
+        self.config.ultimo_dia = self.config.ultimo_dia or date.today()
+        manipulador = type("Manipulador", (_Manipulador,), {
+            "config": self.config, "rng": random.Random(self.config.semente)})
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), manipulador)
+        self._servidor.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self._servidor.server_address[1]}"
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+
+    @property
+    def url_alpha_vantage(self) -> str:
+        return f"{self.base}/query"
+
+    @property
+    def url_sgs(self) -> str:
+        return self.base + "/sgs/{codigo}/dados"
+
+    def urls_noticias(self) -> dict:
+        return {f"Portal {i}": f"{self.base}/noticias/{i}/" for i in range(self.config.paginas_noticias)}
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *excecao):
+        self._servidor.shutdown()
+        self._servidor.server_close()
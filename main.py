@@ -1,18 +1,37 @@
 # main.py
 
+import argparse
 import os
+import subprocess
+import sys
 
-print("🔁 Executando coleta de indicadores econômicos...")
-os.system("python scripts/indicadores_economicos.py")
 
-print("📈 Executando coleta das ações da Bovespa...")
-os.system("python scripts/acoes_bovespa.py")
+def main():
+    parser = argparse.ArgumentParser(description="Coleta os dados, roda a análise dos agentes e abre o dashboard.")
+    parser.add_argument("--agendador", action="store_true",
+                        help="abre o dashboard na hora e atualiza cada fonte em segundo plano, no seu próprio ritmo")
+    args = parser.parse_args()
 
-print("📰 Executando coleta de notícias econômicas...")
-os.system("python scripts/noticias.py")
+    if args.agendador:
+        # O dashboard serve a última versão completa dos dados enquanto o agendador atualiza
+        print("⏰ Iniciando agendador de atualizações em segundo plano...")
+        agendador = subprocess.Popen([sys.executable, os.path.join("scripts", "agendador.py")])
+        try:
+            print("🚀 Iniciando dashboard Streamlit...")
+            os.system("streamlit run streamlit/dashboard.py")
+        finally:
+            agendador.terminate()
+    else:
+        from scripts.pipeline import executar_pipeline
 
-print("🧠 Executando análise dos agentes econômicos (CrewAI)...")
-os.system("python scripts/agentes_economicos.py")
+        # Coletas (indicadores, ações e notícias) rodam em paralelo no mesmo processo;
+        # a análise dos agentes (CrewAI) começa assim que todas as entradas existem
+        executar_pipeline()
 
-print("🚀 Iniciando dashboard Streamlit...")
-os.system("streamlit run streamlit/dashboard.py")
+        print("🚀 Iniciando dashboard Streamlit...")
+        os.system("streamlit run streamlit/dashboard.py")
+
+
+# Os processos de coleta usam "spawn", que reimporta este arquivo: nada roda fora do guard
+if __name__ == "__main__":
+    main()
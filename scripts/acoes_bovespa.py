@@ -1,78 +1,376 @@
 
+import argparse
 import requests
 import pandas as pd
-from time import sleep
 from datetime import datetime
+import functools
+import io
+import itertools
+import json
+import multiprocessing
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv
+from limitador_taxa import LimitadorTaxa
+import armazem_precos
+import dados
+import indicadores_tecnicos
+from instrumentacao import medir
 
 load_dotenv()
 
 api_key=os.getenv("ALPHA_VANTAGE_API_KEY")
 
-# Top 10 ações da B3 por volume - definidas manualmente
+# Limites publicados pela Alpha Vantage para o plano em uso (gratuito: 5 chamadas/minuto, 25/dia)
+CHAMADAS_POR_MINUTO = int(os.getenv("ALPHA_VANTAGE_CHAMADAS_POR_MINUTO", "5"))
+CHAMADAS_POR_DIA = int(os.getenv("ALPHA_VANTAGE_CHAMADAS_POR_DIA", "25"))
+ARQUIVO_COTA = dados.caminho_arquivo(".cota_alpha_vantage.json")
+# Endereço da API; pode apontar para um espelho ou para o servidor local dos benchmarks
+URL_ALPHA_VANTAGE = os.getenv("ALPHA_VANTAGE_URL", "https://www.alphavantage.co/query")
+MAX_TENTATIVAS = 4
+# Como a Alpha Vantage avisa que o limite foi atingido. A nota por minuto também anuncia o
+# limite diário ("5 calls per minute and 500 calls per day"), por isso é testada primeiro;
+# outras mensagens (endpoint premium, chave inválida) não melhoram com nova tentativa
+NOTA_LIMITE_MINUTO = re.compile(r"per minute|per second|call frequency|sparingly", re.IGNORECASE)
+NOTA_LIMITE_DIARIO = re.compile(r"requests per day|daily rate limit", re.IGNORECASE)
+# Pregões por lote gravado no backfill do histórico completo (memória por ticker não cresce com o histórico)
+TAMANHO_LOTE_BACKFILL = int(os.getenv("ACOES_TAMANHO_LOTE_BACKFILL", "1000"))
+# Quantidade de pregões por ação na visão recente consumida pelos agentes e pelo dashboard
+NUM_REGISTROS_VISAO = 10
+
+# Universo coletado: um ticker por linha, com o nível de prioridade na cota diária
+ARQUIVO_UNIVERSO = os.getenv("ACOES_UNIVERSO", dados.caminho_arquivo("universo_acoes.csv"))
+# Tickers por shard e processos de coleta; todos consomem do mesmo orçamento da API
+TAMANHO_SHARD = int(os.getenv("ACOES_TAMANHO_SHARD", "10"))
+PROCESSOS_COLETA = int(os.getenv("ACOES_PROCESSOS", "4"))
+# Pregões tolerados entre coletas de cada nível (1 = todo pregão, 5 = uma vez por semana)
+PREGOES_ENTRE_COLETAS = {1: 1, 2: 1, 3: 5}
+# A tabela top_10_acoes guarda os tickers de maior volume recente do universo
+NUM_DESTAQUES = 10
+
+# Top 10 ações da B3 por volume - definidas manualmente; usadas se o arquivo do universo não existir
 top_10_acoes = ["PETR4", "VALE3", "ITUB4", "BBDC4", "ABEV3", "BBAS3", "B3SA3", "WEGE3", "RENT3", "MGLU3"]
 
-def buscar_dados_acao_alpha_vantage(ticker_b3, api_key, num_registros=10): # Adicionado num_registros
-    ticker = ticker_b3 + ".SA"
-    # outputsize=compact ainda busca 100 pontos, o que é bom para depois selecionarmos os últimos N
-    url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={ticker}&apikey={api_key}&outputsize=compact"
 
-    response = requests.get(url)
-    if response.status_code != 200:
-        # Adiciona um tratamento para o erro 503, comum quando a API está ocupada
+def carregar_universo() -> pd.DataFrame:
+    """Tickers do universo com as colunas 'ticker', 'nivel' e 'setor'."""
+    if not os.path.exists(ARQUIVO_UNIVERSO):
+        return pd.DataFrame({"ticker": top_10_acoes, "nivel": 1, "setor": None})
+    universo = pd.read_csv(ARQUIVO_UNIVERSO, comment="#", dtype={"ticker": str})
+    universo["ticker"] = universo["ticker"].str.strip().str.upper()
+    universo["nivel"] = universo["nivel"].fillna(1).astype(int)
+    return universo.drop_duplicates("ticker").reset_index(drop=True)
+
+
+def planejar_coleta(universo: pd.DataFrame, indice: dict, cota: int) -> list:
+    """Tickers a coletar nesta execução, em ordem de prioridade e cortados na cota restante.
+
+    Fica de fora quem já tem barra recente para o ritmo do seu nível. Dentro de
+    cada nível, vai primeiro o ticker coletado há mais tempo: quando a cota não
+    cobre o nível inteiro, ele é revezado entre as execuções.
+    """
+    prioritarios = universo[universo["nivel"] <= 2]
+    if len(prioritarios) > CHAMADAS_POR_DIA:
+        nivel_1 = int((prioritarios["nivel"] == 1).sum())
+        vagas = max(CHAMADAS_POR_DIA - nivel_1, 0)
+        revezamento = f"cada ticker do nível 2 a cada ~{-(-(len(prioritarios) - nivel_1) // vagas)} pregões" \
+            if vagas else "o nível 2 fica sem coleta"
+        print(f"⚠️ Níveis 1 e 2 têm {len(prioritarios)} tickers, mas a cota diária é de {CHAMADAS_POR_DIA} chamadas: "
+              f"{revezamento}.")
+    pendentes = universo[[
+        not armazem_precos.esta_atualizado(indice, ticker, pregoes=PREGOES_ENTRE_COLETAS.get(nivel, 1))
+        for ticker, nivel in zip(universo["ticker"], universo["nivel"])
+    ]]
+    # Última coleta tentada (verificado_em) ou, em índices antigos, a última barra guardada
+    ultima_coleta = pendentes["ticker"].map(
+        lambda t: indice.get(t, {}).get("verificado_em") or indice.get(t, {}).get("ultima_data") or "")
+    ordem = pendentes.assign(ultima_coleta=ultima_coleta).sort_values(["nivel", "ultima_coleta"], kind="stable")
+    plano = ordem["ticker"].tolist()
+    if len(plano) > cota:
+        print(f"⏸️ {len(plano) - cota} tickers ficam para a próxima execução (cota diária restante: {cota}).")
+        for nivel, adiados in ordem.iloc[cota:].groupby("nivel")["ticker"]:
+            if nivel <= 2:
+                print(f"   ↳ nível {nivel}: {', '.join(adiados)}")
+        plano = plano[:cota]
+    if plano:
+        print(f"🗓️ {len(plano)} tickers na fila; estimativa de ~{len(plano) / CHAMADAS_POR_MINUTO:.0f} min "
+              f"no ritmo de {CHAMADAS_POR_MINUTO} chamadas/minuto.")
+    return plano
+
+
+def _chamar_api(ticker_b3, url, limitador, csv=False):
+    """Chamada à Alpha Vantage com limitador de taxa e recuo nos sinais de limite.
+
+    Devolve o JSON da resposta ou, com `csv=True`, um iterador sobre as linhas do
+    CSV ainda não baixadas (a resposta é lida em streaming). None se a coleta foi adiada.
+    """
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        # Tempo parado no limitador de taxa, separado do tempo de rede
+        with medir("espera.alpha_vantage", ticker=ticker_b3, tentativas=tentativa):
+            liberada = limitador.aguardar()
+        if not liberada:
+            print(f"[{ticker_b3}] Cota diária da Alpha Vantage esgotada. Coleta adiada.")
+            return None
+
+        with medir("http.alpha_vantage", ticker=ticker_b3, tentativas=tentativa) as trecho:
+            response = requests.get(url, timeout=30, stream=csv)
+            # Em streaming o corpo ainda não foi lido: os bytes são contados no parsing
+            trecho.update(status=response.status_code, bytes=None if csv else len(response.content),
+                          falhou=response.status_code != 200)
+        # 503 é comum quando a API está ocupada: recua com jitter em vez de uma espera fixa
         if response.status_code == 503:
-            print(f"[{ticker_b3}] Servidor Alpha Vantage indisponível (503). Tentando novamente em alguns segundos...")
-            sleep(30) # Espera um pouco mais em caso de 503
-            response = requests.get(url) # Tenta novamente
-            if response.status_code != 200:
-                 raise Exception(f"[{ticker_b3}] Erro {response.status_code} após nova tentativa.")
-        else:
+            espera = limitador.registrar_limite()
+            print(f"[{ticker_b3}] Servidor Alpha Vantage indisponível (503). Tentativa {tentativa}/{MAX_TENTATIVAS}, aguardando ~{espera:.0f}s.")
+            # Em streaming a conexão só volta ao pool depois de fechada
+            response.close()
+            continue
+        if response.status_code != 200:
             raise Exception(f"[{ticker_b3}] Erro {response.status_code}")
 
+        if csv:
+            # Avisos e erros chegam como JSON mesmo com datatype=csv: espia a primeira linha
+            response.encoding = response.encoding or "utf-8"
+            linhas = response.iter_lines(decode_unicode=True)
+            primeira = next(linhas, "")
+            if not primeira.lstrip().startswith("{"):
+                limitador.registrar_sucesso()
+                return itertools.chain([primeira], linhas)
+            data = json.loads(primeira + "".join(linhas))
+        else:
+            data = response.json()
+        # "Note"/"Information" são as mensagens de limite de API da Alpha Vantage
+        if "Note" in data or "Information" in data:
+            nota = data.get('Note', data.get('Information', 'Limite de API provavelmente atingido.'))
+            print(f"[{ticker_b3}] Nota da API: {nota}")
+            if not NOTA_LIMITE_MINUTO.search(nota):
+                if NOTA_LIMITE_DIARIO.search(nota):
+                    limitador.esgotar_cota_diaria()
+                else:
+                    print(f"[{ticker_b3}] Resposta não é de limite de taxa; coleta não será repetida.")
+                return None
+            espera = limitador.registrar_limite()
+            print(f"[{ticker_b3}] Tentativa {tentativa}/{MAX_TENTATIVAS}, aguardando ~{espera:.0f}s.")
+            continue
+        limitador.registrar_sucesso()
+        if csv:
+            print(f"[{ticker_b3}] Resposta sem CSV: {data}")
+            return None
+        return data
+    print(f"[{ticker_b3}] Limite da API persistiu após {MAX_TENTATIVAS} tentativas.")
+    return None
+
 
-    data = response.json()
-    # Verifica se a chave "Time Series (Daily)" existe e também se há alguma mensagem de erro/limite
-    if "Note" in data or "Information" in data: # Checa por mensagens de limite de API
-        print(f"[{ticker_b3}] Nota da API: {data.get('Note', data.get('Information', 'Limite de API provavelmente atingido.'))}")
+def buscar_dados_acao_alpha_vantage(ticker_b3, api_key, num_registros=None, limitador=None):
+    ticker = ticker_b3 + ".SA"
+    # outputsize=compact traz os últimos 100 pregões, suficiente para completar o histórico guardado
+    url = f"{URL_ALPHA_VANTAGE}?function=TIME_SERIES_DAILY&symbol={ticker}&apikey={api_key}&outputsize=compact"
+    if limitador is None:
+        limitador = limitador_do_processo()
+
+    data = _chamar_api(ticker_b3, url, limitador)
+    if data is None:
         return None
     if "Time Series (Daily)" not in data:
         print(f"[{ticker_b3}] Sem dados 'Time Series (Daily)' na resposta. Resposta completa: {data}")
         return None
 
-    df = pd.DataFrame.from_dict(data["Time Series (Daily)"], orient="index")
-    df.columns = ["abertura", "alta", "baixa", "fechamento", "volume"]
-    df = df.astype(float)
-    df.index = pd.to_datetime(df.index)
-    df = df.sort_index(ascending=True) # Garante que o índice (data) está em ordem crescente
+    with medir("parse.alpha_vantage", ticker=ticker_b3):
+        df = pd.DataFrame.from_dict(data["Time Series (Daily)"], orient="index")
+        df.columns = ["abertura", "alta", "baixa", "fechamento", "volume"]
+        df = df.astype(float)
+        df.index = pd.to_datetime(df.index)
+        df = df.sort_index(ascending=True) # Garante que o índice (data) está em ordem crescente
     df["ticker"] = ticker_b3
     
-    # Seleciona os últimos 'num_registros' (os mais recentes)
-    df = df.tail(num_registros)
-    
+    # Seleciona os últimos 'num_registros' (os mais recentes); None mantém todos
+    if num_registros is not None:
+        df = df.tail(num_registros)
+
     return df
 
-df_total = pd.DataFrame()
 
-for ativo in top_10_acoes:
+def ler_csv_em_lotes(linhas, tamanho_lote: int = TAMANHO_LOTE_BACKFILL):
+    """Converte as linhas do CSV da Alpha Vantage em DataFrames de até `tamanho_lote` pregões.
+
+    Cada lote já sai com os tipos compactos da tabela de preços (float32/int64) e
+    indexado por data; só um lote fica em memória por vez.
+    """
+    cabecalho = next(linhas, "")
+    colunas = {"timestamp": "data", "open": "abertura", "high": "alta", "low": "baixa",
+               "close": "fechamento", "volume": "volume"}
+    tipos = {"open": "float32", "high": "float32", "low": "float32", "close": "float32", "volume": "int64"}
+    while True:
+        lote = [linha for linha in itertools.islice(linhas, tamanho_lote) if linha]
+        if not lote:
+            return
+        df = pd.read_csv(io.StringIO(cabecalho + "\n" + "\n".join(lote)), dtype=tipos, parse_dates=["timestamp"])
+        yield df.rename(columns=colunas).set_index("data")
+
+
+def backfill_historico(ticker_b3, api_key, indice: dict, limitador=None) -> int:
+    """Baixa o histórico completo do ticker (outputsize=full, CSV) direto para a tabela de preços.
+
+    A resposta é lida em streaming e gravada lote a lote. Retorna a quantidade de
+    pregões gravados, ou None se a coleta foi adiada.
+    """
+    ticker = ticker_b3 + ".SA"
+    url = (f"{URL_ALPHA_VANTAGE}?function=TIME_SERIES_DAILY&symbol={ticker}&apikey={api_key}"
+           f"&outputsize=full&datatype=csv")
+    if limitador is None:
+        limitador = limitador_do_processo()
+
+    linhas = _chamar_api(ticker_b3, url, limitador, csv=True)
+    if linhas is None:
+        return None
+    with medir("backfill.alpha_vantage", ticker=ticker_b3) as trecho:
+        contador = {"bytes": 0}
+
+        def contar(iteravel):
+            for linha in iteravel:
+                contador["bytes"] += len(linha) + 1
+                yield linha
+
+        gravados = armazem_precos.acrescentar_lotes(indice, ticker_b3, ler_csv_em_lotes(contar(linhas)))
+        trecho.update(bytes=contador["bytes"], linhas=gravados)
+    return gravados
+
+
+def criar_limitador() -> LimitadorTaxa:
+    # Compartilhado: os processos de coleta dividem o mesmo orçamento por minuto e por dia
+    return LimitadorTaxa(CHAMADAS_POR_MINUTO, CHAMADAS_POR_DIA, arquivo_estado=ARQUIVO_COTA, compartilhado=True)
+
+
+@functools.lru_cache(maxsize=None)
+def limitador_do_processo() -> LimitadorTaxa:
+    """Limitador compartilhado usado quando quem chama a coleta não passa um.
+
+    Um por processo: as fichas reservadas em lote não se espalham por instâncias avulsas.
+    """
+    return criar_limitador()
+
+
+def coletar_shard(tickers: list, registros: dict) -> dict:
+    """Coleta um grupo de tickers e devolve os registros do índice atualizados.
+
+    Roda em um processo separado; o índice em disco só é gravado pelo processo principal.
+    """
+    limitador = criar_limitador()
+    indice = dict(registros)
     try:
-        print(f"🔄 Coletando {ativo}...")
-        # Agora a função buscar_dados_acao_alpha_vantage buscará 20 registros por padrão
-        df = buscar_dados_acao_alpha_vantage(ativo, api_key) 
-        # Se quisesse um número diferente, poderia passar: buscar_dados_acao_alpha_vantage(ativo, API_KEY, num_registros=25)
-
-        if df is not None and not df.empty: # Adicionado not df.empty para segurança
-            df_total = pd.concat([df_total, df])
-            print(f"✅ {ativo} adicionado com {len(df)} registros.")
-        elif df is not None and df.empty:
-            print(f"⚠️ {ativo} retornou um DataFrame vazio após o processamento (pode ser que não haja 20 dias de dados após o filtro).")
-        # Se df for None, a mensagem já foi impressa dentro da função
-        
-        sleep(15) # Mantém o sleep para respeitar os limites da API Alpha Vantage (5 chamadas/minuto, 500/dia na gratuita)
-    except Exception as e:
-        print(f"❌ Erro com {ativo}: {e}")
-if not df_total.empty:
-    df_total.to_csv("data/top_10_acoes.csv", index=True, encoding="utf-8-sig")
-    print(f"📁 Arquivo final salvo com {len(df_total)} linhas.")
-else:
-    print("ℹ️ Nenhum dado foi coletado para salvar no arquivo CSV.")
+        _coletar_tickers(tickers, indice, limitador)
+    finally:
+        # As fichas reservadas e não usadas voltam para os outros shards e para a próxima execução
+        limitador.liberar_reservas()
+    return {ticker: indice[ticker] for ticker in tickers if ticker in indice}
+
+
+def _coletar_tickers(tickers: list, indice: dict, limitador: LimitadorTaxa):
+    for ativo in tickers:
+        if limitador.cota_restante() == 0:
+            print(f"⏸️ Cota diária da Alpha Vantage esgotada. {ativo} e os demais do shard ficam para a próxima execução.")
+            break
+        try:
+            print(f"🔄 Coletando {ativo}...")
+            df = buscar_dados_acao_alpha_vantage(ativo, api_key, limitador=limitador)
+
+            if df is not None and not df.empty:
+                novos = armazem_precos.acrescentar(indice, ativo, df)
+                print(f"✅ {ativo}: {novos} pregões novos acrescentados ao histórico.")
+            elif df is not None and df.empty:
+                print(f"⚠️ {ativo} retornou um DataFrame vazio após o processamento.")
+            # Se df for None, a mensagem já foi impressa dentro da função
+            # O ritmo das chamadas é controlado pelo limitador, sem sleep fixo entre ações
+        except Exception as e:
+            print(f"❌ Erro com {ativo}: {e}")
+
+
+def main():
+    universo = carregar_universo()
+    indice = armazem_precos.carregar_indice()
+    plano = planejar_coleta(universo, indice, criar_limitador().cota_restante())
+    if not plano:
+        print("⏭️ Todos os tickers do universo estão atualizados para o seu nível. Sem chamadas à API.")
+
+    shards = [plano[i:i + TAMANHO_SHARD] for i in range(0, len(plano), TAMANHO_SHARD)]
+    concluidos = 0
+
+    def registrar_shard(registros: dict, tamanho: int):
+        # Checkpoint: o índice vai para o disco a cada shard, e uma execução interrompida
+        # retoma só com o que faltou
+        nonlocal concluidos
+        indice.update(registros)
+        armazem_precos.salvar_indice(indice)
+        concluidos += tamanho
+        print(f"📦 Progresso da coleta: {concluidos}/{len(plano)} tickers.")
+
+    if len(shards) <= 1 or PROCESSOS_COLETA <= 1:
+        for shard in shards:
+            registrar_shard(coletar_shard(shard, {t: indice[t] for t in shard if t in indice}), len(shard))
+    else:
+        # "spawn": a coleta pode ser disparada de dentro de uma thread do pipeline,
+        # e fork a partir de um processo com threads não é seguro
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(PROCESSOS_COLETA, len(shards)), mp_context=contexto) as executor:
+            futuros = {
+                executor.submit(coletar_shard, shard, {t: indice[t] for t in shard if t in indice}): shard
+                for shard in shards
+            }
+            for futuro in as_completed(futuros):
+                shard = futuros[futuro]
+                try:
+                    registrar_shard(futuro.result(), len(shard))
+                except Exception as e:
+                    print(f"❌ Erro no shard {shard[0]}..{shard[-1]}: {e}")
+
+    # A visão recente é montada a partir do histórico em disco, de uma só vez
+    linhas = armazem_precos.gerar_visao_recente(universo["ticker"].tolist(), NUM_REGISTROS_VISAO,
+                                                num_destaques=NUM_DESTAQUES)
+    if linhas:
+        print(f"📁 Tabela top_10_acoes salva com {linhas} linhas.")
+    else:
+        print("ℹ️ Nenhum dado foi coletado para salvar na tabela top_10_acoes.")
+
+    # Indicadores técnicos: recalcula só a cauda dos tickers que ganharam barras novas
+    indicadores_tecnicos.main()
+
+
+def backfill(tickers: list = None, refazer: bool = False):
+    """Carga única do histórico completo (todo o universo, se `tickers` for None).
+
+    Tickers que já passaram por backfill são pulados, a não ser com `refazer`; o
+    índice é salvo a cada ticker, e uma carga interrompida continua de onde parou.
+    """
+    tickers = tickers or carregar_universo()["ticker"].tolist()
+    indice = armazem_precos.carregar_indice()
+    pendentes = [t for t in tickers if refazer or not indice.get(t, {}).get("historico_completo")]
+    limitador = criar_limitador()
+    print(f"🗄️ Backfill do histórico completo: {len(pendentes)} de {len(tickers)} tickers pendentes.")
+    for posicao, ativo in enumerate(pendentes, start=1):
+        if limitador.cota_restante() == 0:
+            print(f"⏸️ Cota diária da Alpha Vantage esgotada. {len(pendentes) - posicao + 1} tickers ficam para a próxima carga.")
+            break
+        try:
+            gravados = backfill_historico(ativo, api_key, indice, limitador=limitador)
+        except Exception as e:
+            print(f"❌ Erro no backfill de {ativo}: {e}")
+            continue
+        if gravados is not None:
+            armazem_precos.salvar_indice(indice)
+            print(f"✅ [{posicao}/{len(pendentes)}] {ativo}: {gravados} pregões gravados.")
+    limitador.liberar_reservas()
+
+    # Os pregões antigos entram nos indicadores técnicos; a visão recente não muda
+    indicadores_tecnicos.main()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Coleta os preços diários das ações do universo.")
+    parser.add_argument("--backfill", nargs="*", metavar="TICKER",
+                        help="baixa o histórico completo (outputsize=full) dos tickers informados ou de todo o universo")
+    parser.add_argument("--refazer", action="store_true", help="no backfill, refaz também os tickers já carregados")
+    args = parser.parse_args()
+    if args.backfill is not None:
+        backfill([t.upper() for t in args.backfill], refazer=args.refazer)
+    else:
+        main()
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Mesmo esquema do pipeline: os coletores são importados pelo nome do módulo
+DIRETORIO_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+if DIRETORIO_SCRIPTS not in sys.path:
+    sys.path.insert(0, DIRETORIO_SCRIPTS)
+
+import armazem_precos  # noqa: E402
+import dados  # noqa: E402
+from pipeline import (ENTRADAS_ANALISE, ENTRADAS_ANALISE_CRUZADA, ETAPA_ANALISE, ETAPA_ANALISE_CRUZADA,  # noqa: E402
+                      ETAPAS_COLETA, entradas_faltando, executar_etapa)
+
+# Quando cada fonte foi atualizada pela última vez; também é lido pelo dashboard
+ARQUIVO_ESTADO = dados.caminho_arquivo("agendador_estado.json")
+
+INTERVALO_INDICADORES = timedelta(hours=float(os.getenv("AGENDADOR_INDICADORES_HORAS", "24")))
+INTERVALO_NOTICIAS = timedelta(minutes=float(os.getenv("AGENDADOR_NOTICIAS_MINUTOS", "10")))
+# A análise só roda quando as entradas mudam, e no máximo uma vez por este intervalo
+INTERVALO_MINIMO_ANALISE = timedelta(hours=float(os.getenv("AGENDADOR_ANALISE_HORAS", "4")))
+# Uma tabela derivada que falhou só é tentada de novo depois deste intervalo (ou de entradas novas)
+ESPERA_APOS_FALHA = timedelta(minutes=float(os.getenv("AGENDADOR_ESPERA_FALHA_MINUTOS", "30")))
+INTERVALO_VERIFICACAO_S = float(os.getenv("AGENDADOR_VERIFICACAO_SEGUNDOS", "30"))
+
+
+def agora_b3() -> datetime:
+    # Horários do agendador seguem a B3, qualquer que seja o fuso do servidor
+    return datetime.now(armazem_precos.FUSO_B3)
+
+
+def _data_hora(texto):
+    if not texto:
+        return None
+    momento = datetime.fromisoformat(texto)
+    # Estados gravados antes do fuso explícito estão em horário local da B3
+    return momento if momento.tzinfo else momento.replace(tzinfo=armazem_precos.FUSO_B3)
+
+
+def _a_cada(intervalo: timedelta):
+    return lambda ultima, agora: ultima is None or agora - ultima >= intervalo
+
+
+def precos_vencidos(ultima, agora: datetime) -> bool:
+    """Uma vez por pregão, a partir de `armazem_precos.HORA_DISPONIBILIDADE` (horário da B3).
+
+    A coleta usa só barras diárias: antes desse horário não há barra nova para buscar,
+    e durante o pregão uma consulta repetida não traria nada.
+    """
+    return ultima is None or ultima < armazem_precos.ultimo_pregao(agora)
+
+
+# Fonte -> (módulo com main(), regra que diz se está na hora de atualizar, tabelas que ela grava)
+FONTES_AGENDADAS = {
+    "indicadores": (ETAPAS_COLETA["indicadores"], _a_cada(INTERVALO_INDICADORES), ["indicadores_economicos"]),
+    "acoes": (ETAPAS_COLETA["acoes"], precos_vencidos, ["precos", "top_10_acoes"]),
+    "noticias": (ETAPAS_COLETA["noticias"], _a_cada(INTERVALO_NOTICIAS), ["noticias_investimentos"]),
+}
+
+# Tabela derivada -> (módulo com main(), tabelas de entrada, tabelas que ela grava):
+# recalculada assim que alguma entrada muda, sem esperar a análise dos agentes
+DERIVADAS_AGENDADAS = {
+    "analise_cruzada": (ETAPA_ANALISE_CRUZADA, ENTRADAS_ANALISE_CRUZADA, ["analise_cruzada"]),
+}
+
+
+def versoes_entrada(tabelas: list = ENTRADAS_ANALISE) -> list:
+    return [repr(dados.versao(tabela)) for tabela in tabelas]
+
+
+def ler_estado(caminho: str = ARQUIVO_ESTADO) -> dict:
+    """{fonte: {ultima_tentativa, ultimo_sucesso, em_andamento, status, sem_novidades, duracao_s, erro, ...}}
+
+    `ultimo_sucesso` só avança quando a execução mudou alguma tabela da fonte.
+    """
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return {}
+
+
+class Agendador:
+    """Atualiza cada fonte no próprio ritmo, em segundo plano e sem sobrepor execuções da mesma fonte.
+
+    Os coletores gravam pela camada de dados (arquivo temporário + rename), então
+    quem lê durante uma atualização continua vendo a última versão completa.
+    """
+
+    def __init__(self, fontes: dict = FONTES_AGENDADAS, caminho_estado: str = ARQUIVO_ESTADO,
+                 derivadas: dict = DERIVADAS_AGENDADAS):
+        self.fontes = fontes
+        self.derivadas = derivadas
+        self.caminho_estado = caminho_estado
+        self.estado = ler_estado(caminho_estado)
+        self._trava = threading.Lock()
+        # Execuções interrompidas (processo encerrado no meio) não contam como em andamento
+        for registro in self.estado.values():
+            registro["em_andamento"] = False
+        self._executor = ThreadPoolExecutor(max_workers=len(fontes) + len(derivadas) + 1, thread_name_prefix="agendador")
+        self._futuros = {}
+
+    def _gravar_estado(self):
+        with self._trava:
+            conteudo = json.dumps(self.estado, ensure_ascii=False, indent=2, sort_keys=True)
+
+        def escrever(temporario):
+            with open(temporario, "w", encoding="utf-8") as f:
+                f.write(conteudo)
+
+        dados.escrever_atomico(self.caminho_estado, escrever)
+
+    def _ocupada(self, fonte: str) -> bool:
+        futuro = self._futuros.get(fonte)
+        return futuro is not None and not futuro.done()
+
+    def _derivada_vencida(self, nome: str, entradas: list, agora: datetime) -> bool:
+        # Espera as coletas em curso terminarem: as entradas ainda vão mudar
+        if any(self._ocupada(fonte) for fonte in self.fontes):
+            return False
+        registro = self.estado.get(nome, {})
+        ultima = _data_hora(registro.get("ultima_tentativa"))
+        if registro.get("status") and ultima is not None and agora - ultima < ESPERA_APOS_FALHA:
+            return False
+        return registro.get("versoes_entrada") != versoes_entrada(entradas)
+
+    def _analise_vencida(self, agora: datetime) -> bool:
+        # Espera as coletas e as tabelas derivadas em curso terminarem para não analisar um retrato pela metade
+        if any(self._ocupada(fonte) for fonte in [*self.fontes, *self.derivadas]) or entradas_faltando():
+            return False
+        registro = self.estado.get("analise", {})
+        ultima = _data_hora(registro.get("ultima_tentativa"))
+        if ultima is not None and agora - ultima < INTERVALO_MINIMO_ANALISE:
+            return False
+        return registro.get("versoes_entrada") != versoes_entrada()
+
+    def _executar(self, fonte: str, modulo: str, tabelas: list = None, entradas: list = None):
+        # Versões das entradas no início: o que mudar durante a execução dispara a próxima
+        versoes = versoes_entrada(entradas) if entradas is not None else None
+        antes = versoes_entrada(tabelas) if tabelas else None
+        with self._trava:
+            registro = self.estado.setdefault(fonte, {})
+            registro.update(em_andamento=True, ultima_tentativa=agora_b3().isoformat(timespec="seconds"))
+        self._gravar_estado()
+        print(f"🔄 Atualizando '{fonte}'...")
+
+        resultado = executar_etapa(fonte, modulo)
+        # Execução sem erro que não gravou nada (sem barra nova, sem notícia nova) não é atualização
+        sem_novidades = not resultado["status"] and antes is not None and versoes_entrada(tabelas) == antes
+
+        with self._trava:
+            registro.update(em_andamento=False, status=resultado["status"], sem_novidades=sem_novidades,
+                            duracao_s=round(resultado["duracao_s"], 2), erro=resultado["erro"])
+            if not resultado["status"] and not sem_novidades:
+                registro["ultimo_sucesso"] = agora_b3().isoformat(timespec="seconds")
+            if not resultado["status"] and versoes is not None:
+                # Entradas processadas, mesmo que não tenham gerado linhas novas
+                registro["versoes_entrada"] = versoes
+        self._gravar_estado()
+        if resultado["status"]:
+            print(f"⚠️ Falha ao atualizar '{fonte}' ({resultado['duracao_s']:.1f} s): {resultado['erro']}")
+        elif sem_novidades:
+            print(f"ℹ️ '{fonte}' sem dados novos ({resultado['duracao_s']:.1f} s)")
+        else:
+            print(f"✅ '{fonte}' atualizada em {resultado['duracao_s']:.1f} s")
+
+    def verificar(self, agora: datetime = None) -> list:
+        """Dispara, em segundo plano, as fontes vencidas que não estão rodando; devolve os nomes delas."""
+        agora = agora or agora_b3()
+        disparadas = []
+        for fonte, (modulo, vencida, tabelas) in self.fontes.items():
+            ultima = _data_hora(self.estado.get(fonte, {}).get("ultima_tentativa"))
+            if not self._ocupada(fonte) and vencida(ultima, agora):
+                self._futuros[fonte] = self._executor.submit(self._executar, fonte, modulo, tabelas)
+                disparadas.append(fonte)
+        if disparadas:
+            return disparadas
+        for nome, (modulo, entradas, tabelas) in self.derivadas.items():
+            if not self._ocupada(nome) and self._derivada_vencida(nome, entradas, agora):
+                self._futuros[nome] = self._executor.submit(self._executar, nome, modulo, tabelas, entradas)
+                disparadas.append(nome)
+        if not disparadas and not self._ocupada("analise") and self._analise_vencida(agora):
+            self._futuros["analise"] = self._executor.submit(self._executar, "analise", ETAPA_ANALISE,
+                                                             entradas=ENTRADAS_ANALISE)
+            disparadas.append("analise")
+        return disparadas
+
+    def aguardar(self):
+        for futuro in list(self._futuros.values()):
+            futuro.result()
+
+    def rodar(self, intervalo_verificacao: float = INTERVALO_VERIFICACAO_S):
+        print(f"⏰ Agendador iniciado (verificação a cada {intervalo_verificacao:.0f} s). Ctrl+C para encerrar.")
+        try:
+            while True:
+                self.verificar()
+                time.sleep(intervalo_verificacao)
+        except KeyboardInterrupt:
+            print("🛑 Agendador encerrado; atualizações em curso terminam em segundo plano.")
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza indicadores, preços, notícias e a análise, cada um no seu ritmo.")
+    parser.add_argument("--uma-vez", action="store_true",
+                        help="atualiza só o que está vencido e sai (para uso com cron)")
+    args = parser.parse_args()
+
+    agendador = Agendador()
+    if args.uma_vez:
+        # Coletas, depois as tabelas derivadas das entradas que mudaram e, por último, a análise
+        for _ in range(3):
+            if not agendador.verificar():
+                break
+            agendador.aguardar()
+    else:
+        agendador.rodar()
+
+
+if __name__ == "__main__":
+    main()
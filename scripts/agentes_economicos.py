@@ -1,201 +1,438 @@
+import contextlib
 import os
-import pandas as pd
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 from dotenv import load_dotenv
-from crewai import Agent, Task, Crew, Process
-from langchain_openai import AzureChatOpenAI
-from langchain_community.utilities import GoogleSerperAPIWrapper
+from crewai import Agent, Task, Crew, LLM
+from crewai.llms.base_llm import BaseLLM, call_stop_override
+from pydantic import PrivateAttr
 from crewai_tools.tools import SerperDevTool
+import dados
+from cache_llm import cache_padrao, chamar_com_cache
+import analise_cruzada
+from contexto import construir_contexto, resumos_por_ticker
+from indicadores_tecnicos import carregar_indicadores as carregar_indicadores_tecnicos
+from manifesto_relatorio import ManifestoRelatorio, impressao
+from registro_execucao import ContadorTokens, RegistroExecucao, ultima_execucao
 
 
 # === Carregar variáveis do ambiente (.env) ===
 load_dotenv()
 
-tool = SerperDevTool()
-
-llm = AzureChatOpenAI(
-    model="azure/" + os.getenv("AZURE_OPENAI_DEPLOYMENT_LLM"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_API_VERSION"),
-    temperature=0.3
-)
-# === Ler os novos arquivos CSV localmente ===
-try:
-    df_top_10_acoes = pd.read_csv("data/top_10_acoes.csv")
-    df_noticias_investimento = pd.read_csv("data/noticias_investimentos.csv")
-    df_indices = pd.read_csv("data/indicadores_economicos.csv")
-except FileNotFoundError as e:
-    print(f"Erro: Arquivo CSV não encontrado. Verifique os nomes e caminhos dos arquivos: {e}")
-    print("Certifique-se que 'top_10_acoes.csv', 'noticias_investimento.csv' e 'indicadores_economicos.csv' estão na raiz do projeto.")
-    exit()
-# === Transformar os DataFrames em texto de contexto ===
-contexto_top_10_acoes = df_top_10_acoes.to_markdown(index=False)
-contexto_indices = df_indices.to_markdown(index=False)
-
-# Assumindo que df_noticias_investimento tem colunas 'titulo', 'resumo', 'link'
-# Ajuste se os nomes das colunas forem diferentes
-contexto_noticias_investimentos = "\n".join([
-    f"Título: {row['titulo']}\nLink: {row['link']}"
-    for _, row in df_noticias_investimento.iterrows()
-]) if not df_noticias_investimento.empty else "Nenhuma notícia de investimento carregada do CSV."
-
-
-# === Juntar todo o contexto BASE (dos CSVs) ===
-contexto_geral_csv = f"""
-=== 📈 Dados Históricos de Índices Economicos ===
+# "paralelo": análise macro uma vez e, em seguida, uma análise por ação ao mesmo tempo
+# "sequencial": uma única tarefa em que o especialista percorre todas as ações na mesma conversa
+MODO_ANALISE_ACOES = os.getenv("MODO_ANALISE_ACOES", "paralelo")
+CONCORRENCIA_ANALISE_ACOES = int(os.getenv("CONCORRENCIA_ANALISE_ACOES", "4"))
+
+TABELAS_ENTRADA = ["top_10_acoes", "noticias_investimentos", "indicadores_economicos"]
+
+
+class SerperDevToolComCache(SerperDevTool):
+    """SerperDevTool que reaproveita o resultado de buscas idênticas feitas há poucas horas."""
+
+    def _run(self, **kwargs):
+        return cache_padrao().obter_ou_calcular(
+            "busca", [self.name, kwargs], lambda: super(SerperDevToolComCache, self)._run(**kwargs)
+        )
+
+
+class LLMComCache(BaseLLM):
+    """LLM do CrewAI que responde do cache em disco quando o mesmo prompt já foi enviado.
+
+    O CrewAI troca modelos de outras bibliotecas pelo seu próprio LLM (perdendo `cache=`),
+    mas usa uma subclasse de BaseLLM como está. Cada thread cria o seu LLM real com `fabrica`,
+    o que também mantém separadas as métricas de uso lidas pelo `contador`.
+    """
+
+    fabrica: Any
+    cache: Any
+    contador: Any = None
+    _local: threading.local = PrivateAttr(default_factory=threading.local)
+
+    def _llm(self):
+        llm = getattr(self._local, "llm", None)
+        if llm is None:
+            llm = self._local.llm = self.fabrica()
+        return llm
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None,
+             from_agent=None, response_model=None):
+        llm = self._llm()
+        parametros = {"temperature": llm.temperature, "stop": self.stop_sequences,
+                      "response_model": getattr(response_model, "__name__", None)}
+        # As palavras de parada que o agente definir para esta chamada valem para o LLM real
+        with call_stop_override(llm, self.stop_sequences), \
+                (self.contador.chamada(llm) if self.contador else contextlib.nullcontext()):
+            return chamar_com_cache(self.cache, llm, messages, tools=tools, parametros=parametros,
+                                    callbacks=callbacks, available_functions=available_functions,
+                                    from_task=from_task, from_agent=from_agent, response_model=response_model)
+
+    def supports_function_calling(self) -> bool:
+        return self._llm().supports_function_calling()
+
+    def supports_stop_words(self) -> bool:
+        return self._llm().supports_stop_words()
+
+    def get_context_window_size(self) -> int:
+        return self._llm().get_context_window_size()
+
+
+def criar_especialista_em_acoes(tool, llm, azure_deployment_name):
+    return Agent(
+        role="Especialista em Análise de Ações da Bovespa",
+        goal="Avaliar ações da Bovespa, com ênfase nas 'top_10_acoes.csv' mas não se limitando a elas, com base na análise macroeconômica, dados fundamentalistas (se disponíveis nos CSVs ou buscados) e notícias de mercado. Gerar recomendações de COMPRA, VENDA ou MANTER para ações específicas, com justificativas claras.",
+        backstory="Analista de investimentos (CNPI) focado no mercado de ações brasileiro, com expertise em valuation de empresas e estratégias de investimento. Busca identificar assimetrias e oportunidades no mercado, fornecendo recomendações acionáveis.",
+        verbose=True,
+        allow_delegation=False, # Pode se tornar True se houver um agente de pesquisa de dados fundamentalistas dedicado
+        tools=[tool],
+        llm=llm,
+        model_name=f"azure/{azure_deployment_name}"
+    )
+
+
+def texto_do_resultado(resultado_crew) -> str:
+    # Tente acessar o resultado textual. A forma exata pode variar um pouco
+    # dependendo da versão do CrewAI e do que a sua Crew retorna.
+    # Tentativa 1: Acessar um atributo 'result' ou 'raw' se o objeto for um Pydantic model
+    # ou tiver um atributo específico para o output textual.
+    # Vamos testar com str() primeiro, que é mais genérico.
+    if hasattr(resultado_crew, 'raw') and isinstance(resultado_crew.raw, str):
+        return resultado_crew.raw
+    elif hasattr(resultado_crew, 'result') and isinstance(resultado_crew.result, str): # Comum em versões mais antigas ou específicas
+        return resultado_crew.result
+    # Se não houver um atributo óbvio, converter o objeto todo para string
+    # pode funcionar se o __str__ do CrewOutput for o relatório final.
+    return str(resultado_crew)
+
+
+def executar_tarefa(agente, tarefa) -> str:
+    """Roda uma única tarefa numa Crew própria e devolve o texto produzido."""
+    crew = Crew(agents=[agente], tasks=[tarefa], verbose=True)
+    return texto_do_resultado(crew.kickoff())
+
+
+def descricao_analise_acao(ticker, dados_acao, analise_macro) -> str:
+    return (
+        f"1. Com base na análise do cenário macroeconômico abaixo, avalie a ação {ticker}.\n"
+        f"2. Utilize a ferramenta SerperDevTool para buscar sobre {ticker}: "
+        "a) Notícias recentes e específicas sobre a empresa e seu setor. "
+        "b) Análises e perspectivas de mercado para essa ação (preço-alvo, recomendações de outras casas de análise, etc.). "
+        "c) Informações sobre os fundamentos da empresa (ex: P/L, dividend yield, endividamento).\n"
+        f"3. Formule uma recomendação de INVESTIMENTO (COMPRA, VENDA ou MANTER) para {ticker}, com justificativa clara, "
+        "baseada na análise macroeconômica, setorial, notícias e dados da empresa.\n\n"
+        f"Análise do cenário macroeconômico:\n{analise_macro}\n\n"
+        f"Dados de {ticker} (do CSV):\n{dados_acao}"
+    )
+
+
+def analisar_acao(ticker, dados_acao, analise_macro, tool, llm, azure_deployment_name) -> str:
+    """Análise de uma única ação: recebe só o resumo macro e os dados desse ticker."""
+    # Um agente por ação: as conversas paralelas não compartilham estado
+    especialista = criar_especialista_em_acoes(tool, llm, azure_deployment_name)
+    tarefa = Task(
+        description=descricao_analise_acao(ticker, dados_acao, analise_macro),
+        expected_output=(
+            f"Recomendação para {ticker}: COMPRA, VENDA ou MANTER, seguida de uma justificativa de um a dois parágrafos "
+            "explicando os fatores considerados (macroeconômicos, setoriais, específicos da empresa, notícias recentes)."
+        ),
+        agent=especialista,
+    )
+    return executar_tarefa(especialista, tarefa)
+
+
+def analisar_acoes_em_paralelo(resumos: dict, analise_macro, tool, llm, azure_deployment_name,
+                               manifesto: ManifestoRelatorio = None) -> tuple:
+    """Uma análise por ticker, no máximo CONCORRENCIA_ANALISE_ACOES ao mesmo tempo, juntadas na ordem original.
+
+    Com `manifesto`, só os tickers cujos dados (ou a análise macro) mudaram vão ao LLM.
+    Devolve (texto das análises, tickers cuja análise falhou).
+    """
+    def analisar(ticker, dados_acao):
+        executar = lambda: analisar_acao(ticker, dados_acao, analise_macro, tool, llm, azure_deployment_name)
+        if manifesto is None:
+            return executar()
+        chave = impressao(azure_deployment_name, descricao_analise_acao(ticker, dados_acao, analise_macro))
+        return manifesto.executar_ou_reaproveitar(f"acao_{ticker}", chave, executar)
+
+    with ThreadPoolExecutor(max_workers=max(1, CONCORRENCIA_ANALISE_ACOES)) as executor:
+        futuros = {ticker: executor.submit(analisar, ticker, dados_acao) for ticker, dados_acao in resumos.items()}
+        analises, falhas = [], []
+        for ticker, futuro in futuros.items():
+            try:
+                analises.append(f"### {ticker}\n{futuro.result()}")
+            except Exception as e:
+                print(f"❌ Análise de {ticker} falhou: {e}")
+                falhas.append(ticker)
+    return "\n\n".join(analises), falhas
+
+
+def executar_analise(registro: RegistroExecucao) -> str:
+    """Gera o relatório e devolve o status da execução: "concluida" ou "parcial" (alguma ação sem análise)."""
+    # Completions e buscas repetidas (mesmo modelo, parâmetros e mensagens) saem do cache em disco
+    cache = cache_padrao()
+    tool = SerperDevToolComCache()
+
+    modelo = "azure/" + os.getenv("AZURE_OPENAI_DEPLOYMENT_LLM")
+    llm = LLMComCache(
+        model=modelo,
+        temperature=0.3,
+        cache=cache,
+        # Chamadas e tokens de cada etapa vão para o registro desta execução
+        contador=ContadorTokens(registro),
+        fabrica=lambda: LLM(
+            model=modelo,
+            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            api_version=os.getenv("AZURE_API_VERSION"),
+            temperature=0.3,
+        ),
+    )
+    # === Ler as tabelas coletadas (já tipadas) pela camada de dados ===
+    faltando = [tabela for tabela in TABELAS_ENTRADA if not dados.existe(tabela)]
+    if faltando:
+        print(f"Erro: tabelas de entrada não encontradas em '{dados.DIRETORIO_DADOS}': {', '.join(faltando)}")
+        print("Execute as coletas (indicadores_economicos.py, acoes_bovespa.py e noticias.py) antes da análise.")
+        sys.exit(1)
+    df_top_10_acoes = dados.ler("top_10_acoes").set_index("data")
+    df_noticias_investimento = dados.ler("noticias_investimentos")
+    df_indices = dados.ler("indicadores_economicos")
+    # Indicadores técnicos pré-calculados (RSI, MACD, volatilidade...) no lugar de histórico bruto
+    df_tecnicos = carregar_indicadores_tecnicos(tickers=df_top_10_acoes["ticker"].unique().tolist())
+    # Correlações e betas das ações contra dólar, commodities e Selic, mantidos pelo agendador/pipeline
+    df_sensibilidades = analise_cruzada.sensibilidades_recentes(
+        analise_cruzada.carregar_analise(tickers=df_top_10_acoes["ticker"].unique().tolist()))
+    # === Transformar os DataFrames em resumos compactos, dentro do orçamento de tokens de cada seção ===
+    contexto = construir_contexto(df_top_10_acoes, df_indices, df_noticias_investimento, df_tecnicos=df_tecnicos,
+                                  df_sensibilidades=df_sensibilidades)
+    contexto_indices = contexto["secoes"]["indicadores"]
+    contexto_noticias_investimentos = contexto["secoes"]["noticias"]
+    contexto_top_10_acoes = contexto["secoes"]["acoes"]
+    contexto_sensibilidades = contexto["secoes"]["sensibilidades"]
+    print("🧮 Tokens do contexto: " + ", ".join(f"{secao}={n}" for secao, n in contexto["tokens"].items())
+          + f" (total {sum(contexto['tokens'].values())})")
+
+
+    # === Contexto BASE (dos CSVs) ===
+    # A análise macro recebe só indicadores e notícias: preços e sensibilidades mudam a cada
+    # pregão e, no prompt macro, invalidariam a etapa macro e todas as que dependem dela
+    contexto_geral_csv = f"""
+=== 📈 Resumo dos Índices Economicos (último valor, variação e tendência) ===
 {contexto_indices}
 
 === 📰 Notícias de Investimento Recentes (do CSV) ===
 {contexto_noticias_investimentos}
-
-=== 📊 Top 10 Ações (do CSV) ===
+"""
+    contexto_acoes_csv = f"""
+=== 📊 Resumo das Top 10 Ações (do CSV) ===
 {contexto_top_10_acoes}
+
+=== 🔗 Sensibilidade das Ações a Dólar, Commodities e Selic (correlação e beta móveis) ===
+corr/beta_dolar: retornos diários, 63 pregões; commodities e selic: retornos mensais, 24 meses.
+beta = % de retorno da ação por 1% do dólar/commodities ou por 1 p.p. de Selic.
+{contexto_sensibilidades}
 """
-azure_deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_LLM")
-
-
-# === Definir os agentes ===
-analista_macroeconomico = Agent(
-    role="Analista Macroeconômico Sênior",
-    goal="Analisar o cenário macroeconômico brasileiro, com foco nos indicadores economicos e nas notícias de investimento, para identificar tendências e seus impactos potenciais no mercado de ações, especialmente nas ações listadas no arquivo 'top_10_acoes.csv'.",
-    backstory="Economista com vasta experiência na análise da conjuntura econômica brasileira, indicadores economicos e seus efeitos sobre os ativos financeiros. Utiliza dados históricos e informações de mercado atualizadas para embasar suas projeções.",
-    verbose=True,
-    allow_delegation=False,
-    tools=[tool],
-    llm=llm,
-    model_name=f"azure/{azure_deployment_name}"
-)
-
-especialista_em_acoes = Agent(
-    role="Especialista em Análise de Ações da Bovespa",
-    goal="Avaliar ações da Bovespa, com ênfase nas 'top_10_acoes.csv' mas não se limitando a elas, com base na análise macroeconômica, dados fundamentalistas (se disponíveis nos CSVs ou buscados) e notícias de mercado. Gerar recomendações de COMPRA, VENDA ou MANTER para ações específicas, com justificativas claras.",
-    backstory="Analista de investimentos (CNPI) focado no mercado de ações brasileiro, com expertise em valuation de empresas e estratégias de investimento. Busca identificar assimetrias e oportunidades no mercado, fornecendo recomendações acionáveis.",
-    verbose=True,
-    allow_delegation=False, # Pode se tornar True se houver um agente de pesquisa de dados fundamentalistas dedicado
-    tools=[tool],
-    llm=llm,
-    model_name=f"azure/{azure_deployment_name}"
-)
-
-redator_de_relatorios_de_investimento = Agent(
-    role="Redator de Relatórios de Investimento",
-    goal="Consolidar a análise macroeconômica e as recomendações de ações em um relatório final claro, conciso e bem estruturado para investidores. O relatório deve destacar as principais indicações de ações e suas justificativas.",
-    backstory="Profissional de comunicação com foco no mercado financeiro, especializado em transformar análises técnicas complexas em relatórios de fácil compreensão para o público investidor.",
-    verbose=True,
-    allow_delegation=False,
-    tools=[],
-    llm=llm,
-    model_name=f"azure/{azure_deployment_name}"
-)
-# === Criar as tarefas ===
-
-tarefa_analise_cenario = Task(
-    description=(
-        "1. Analise os dados dos indicadores economicos fornecidos no 'contexto_geral_csv' para entender as tendências recentes do mercado.\n"
-        "2. Revise as 'Notícias de Investimento Recentes (do CSV)' para capturar o sentimento e os eventos atuais do mercado.\n"
-        "3. Utilize a ferramenta SerPerDevTool para buscar informações atualizadas (últimos 1-3 meses) sobre: "
-        "a) Perspectivas para o IPCA, PIB, dolar, IGP-M e a taxa Selic no Brasil. "
-        "b) Principais fatores macroeconômicos que estão afetando o mercado de ações brasileiro. "
-        "c) Notícias relevantes sobre a economia brasileira que possam impactar investimentos.\n"
-        "4. Sintetize essas informações para construir um panorama do cenário macroeconômico atual e suas implicações para investidores em ações.\n\n"
-        "Contexto dos CSVs:\n"
-        f"{contexto_geral_csv}"
-    ),
-    expected_output=(
-        "Um relatório conciso sobre o cenário macroeconômico brasileiro, destacando: \n"
-        "- Análise da trajetória recente dos indices economicos obtidos e suas perspectivas.\n"
-        "- Principais notícias e eventos de investimento relevantes (do CSV e da pesquisa online).\n"
-        "- Impactos esperados desse cenário no mercado de ações brasileiro em geral."
-    ),
-    agent=analista_macroeconomico
-)
-
-tarefa_indicacao_acoes = Task(
-    description=(
-        "1. Com base na análise do cenário macroeconômico (fornecida pela tarefa anterior), avalie as ações listadas no arquivo 'top_10_acoes.csv'.\n"
-        "2. Para cada ação no 'top_10_acoes.csv', utilize a ferramenta SerperDevTool para buscar: "
-        "a) Notícias recentes e específicas sobre a empresa e seu setor. "
-        "b) Análises e perspectivas de mercado para essa ação (preço-alvo, recomendações de outras casas de análise, etc.). "
-        "c) Informações sobre os fundamentos da empresa, se não estiverem detalhados no CSV (ex: P/L, dividend yield, endividamento).\n"
-        "3. Se julgar pertinente, pesquise também outras ações da Bovespa que possam representar boas oportunidades ou riscos no cenário atual.\n"
-        "4. Formule recomendações de INVESTIMENTO (COMPRA, VENDA ou MANTER) para pelo menos 5 ações (priorizando as do 'top_10_acoes.csv', mas podendo incluir outras). Cada recomendação deve ser acompanhada de uma justificativa clara, baseada na análise macroeconômica, setorial, notícias e dados da empresa.\n\n"
-        "Contexto dos CSVs (especialmente 'Top 10 Ações'):\n"
-        f"{contexto_top_10_acoes}" # Foco principal, mas não exclusivo
-    ),
-    expected_output=(
-        "Um relatório de indicações de ações contendo:\n"
-        "- Recomendações claras de COMPRA, VENDA ou MANTER para 3 a 5 ações da Bovespa (com seus tickers).\n"
-        "- Justificativa detalhada para cada recomendação, explicando os fatores considerados (macroeconômicos, setoriais, específicos da empresa, notícias recentes)."
-        "Priorizar as ações do 'top_10_acoes.csv' na análise, mas incluir outras se forem identificadas oportunidades/riscos relevantes."
-    ),
-    agent=especialista_em_acoes,
-    context=[tarefa_analise_cenario] # Depende da análise macroeconômica
-)
-
-tarefa_compilacao_relatorio_final = Task(
-    description=(
-        "**Sua responsabilidade é GERAR e ESCREVER O CONTEÚDO COMPLETO do relatório de investimento final em formato markdown. NÃO descreva o que você faria ou o que o relatório conteria; em vez disso, PRODUZA o relatório AGORA.**\n\n"
-        "Para fazer isso, você DEVE:\n"
-        "1. Unificar a 'análise do cenário macroeconômico' (fornecida pelo Analista Macroeconômico) e as 'indicações de ações' (fornecidas pelo Especialista em Ações) em um relatório final coeso, detalhado e bem formatado.\n"
-        "2. Escrever o relatório em linguagem clara, profissional e acessível para investidores, utilizando a sintaxe markdown para uma excelente estrutura (títulos H2 e H3, subtítulos, listas com marcadores ou numeradas, negrito para destaques).\n"
-        "3. Detalhar as principais conclusões da análise macroeconômica e explicar explicitamente como elas fundamentam as estratégias de investimento e as recomendações de ações específicas.\n"
-        "4. Apresentar de forma proeminente e individualizada cada indicação de ação (COMPRA, VENDA, MANTER), incluindo o ticker da ação e um parágrafo de justificativa claro, conciso e bem fundamentado para cada uma.\n"
-        "5. Incluir um breve apêndice no final do relatório mencionando as fontes de dados primárias (os arquivos CSV: 'indicadores_economicos.csv', 'noticias_investimento.csv', 'top_10_acoes.csv') e o uso de pesquisa online para informações complementares.\n\n"
-        "**Utilize as informações das análises das tarefas anteriores, que estão disponíveis no contexto, como base fundamental para escrever este relatório.**"
-    ),
-    expected_output=(
-        "O TEXTO COMPLETO e FINAL de um Relatório de Investimento em formato markdown na língua portuguesa do brasil. O relatório DEVE ser abrangente e conter as seguintes seções PREENCHIDAS com análises, dados e texto gerado:\n"
-        "### Sumário Executivo\n"
-        "   - (Texto do sumário com as principais conclusões e recomendações de investimento.)\n"
-        "### Análise do Cenário Macroeconômico\n"
-        "   - (Texto da análise detalhada dos indicadores economicos, notícias relevantes e seus impactos esperados no mercado de ações.)\n"
-        "### Indicações de Ações Detalhadas\n"
-        "   - (Para cada ação recomendada: Ticker, Recomendação [COMPRA/VENDA/MANTER], e Justificativa completa e bem fundamentada.)\n"
-        "### Breves Considerações sobre Riscos e Oportunidades\n"
-        "   - (Texto com uma visão geral dos riscos e oportunidades identificados no cenário atual.)\n"
-        "### Apêndice: Fontes de Dados\n"
-        "   - (Texto mencionando as fontes de dados utilizadas.)"
-    ),
-    agent=redator_de_relatorios_de_investimento,
-    context=[tarefa_analise_cenario, tarefa_indicacao_acoes],
-)
-
-# === Criar o time (Crew) ===
-crew_recomendacao_de_acoes = Crew(
-    agents=[analista_macroeconomico, especialista_em_acoes, redator_de_relatorios_de_investimento],
-    tasks=[tarefa_analise_cenario, tarefa_indicacao_acoes, tarefa_compilacao_relatorio_final],
-    verbose=True, # verbose=True para ver os pensamentos dos agentes
-    manager_llm=llm,
-    #process=Process.hierarchical, # Habilita o "gerente" para orquestrar com mais "raciocínio"
-)
-
-# === Executar o Crew ===
-print("Iniciando a análise da Crew para recomendação de ações...")
-resultado_crew = crew_recomendacao_de_acoes.kickoff() # Mudei o nome da variável para clareza
-
-print("\n\n=== OBJETO CrewOutput COMPLETO (para depuração) ===\n")
-print(resultado_crew) # Isso vai mostrar a estrutura do objeto CrewOutput
-
-# Tente acessar o resultado textual. A forma exata pode variar um pouco
-# dependendo da versão do CrewAI e do que a sua Crew retorna.
-# Tentativa 1: Acessar um atributo 'result' ou 'raw' se o objeto for um Pydantic model
-# ou tiver um atributo específico para o output textual.
-# Vamos testar com str() primeiro, que é mais genérico.
-if hasattr(resultado_crew, 'raw') and isinstance(resultado_crew.raw, str):
-    texto_para_salvar = resultado_crew.raw
-elif hasattr(resultado_crew, 'result') and isinstance(resultado_crew.result, str): # Comum em versões mais antigas ou específicas
-    texto_para_salvar = resultado_crew.result
-else:
-    # Se não houver um atributo óbvio, converter o objeto todo para string
-    # pode funcionar se o __str__ do CrewOutput for o relatório final.
-    texto_para_salvar = str(resultado_crew)
+    azure_deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_LLM")
+
+
+    # === Definir os agentes ===
+    analista_macroeconomico = Agent(
+        role="Analista Macroeconômico Sênior",
+        goal="Analisar o cenário macroeconômico brasileiro, com foco nos indicadores economicos e nas notícias de investimento, para identificar tendências e seus impactos potenciais no mercado de ações, especialmente nas ações listadas no arquivo 'top_10_acoes.csv'.",
+        backstory="Economista com vasta experiência na análise da conjuntura econômica brasileira, indicadores economicos e seus efeitos sobre os ativos financeiros. Utiliza dados históricos e informações de mercado atualizadas para embasar suas projeções.",
+        verbose=True,
+        allow_delegation=False,
+        tools=[tool],
+        llm=llm,
+        model_name=f"azure/{azure_deployment_name}"
+    )
+
+    especialista_em_acoes = criar_especialista_em_acoes(tool, llm, azure_deployment_name)
+
+    redator_de_relatorios_de_investimento = Agent(
+        role="Redator de Relatórios de Investimento",
+        goal="Consolidar a análise macroeconômica e as recomendações de ações em um relatório final claro, conciso e bem estruturado para investidores. O relatório deve destacar as principais indicações de ações e suas justificativas.",
+        backstory="Profissional de comunicação com foco no mercado financeiro, especializado em transformar análises técnicas complexas em relatórios de fácil compreensão para o público investidor.",
+        verbose=True,
+        allow_delegation=False,
+        tools=[],
+        llm=llm,
+        model_name=f"azure/{azure_deployment_name}"
+    )
+    # === Criar as tarefas ===
+
+    tarefa_analise_cenario = Task(
+        description=(
+            "1. Analise os dados dos indicadores economicos fornecidos no 'contexto_geral_csv' para entender as tendências recentes do mercado.\n"
+            "2. Revise as 'Notícias de Investimento Recentes (do CSV)' para capturar o sentimento e os eventos atuais do mercado.\n"
+            "3. Utilize a ferramenta SerPerDevTool para buscar informações atualizadas (últimos 1-3 meses) sobre: "
+            "a) Perspectivas para o IPCA, PIB, dolar, IGP-M e a taxa Selic no Brasil. "
+            "b) Principais fatores macroeconômicos que estão afetando o mercado de ações brasileiro. "
+            "c) Notícias relevantes sobre a economia brasileira que possam impactar investimentos.\n"
+            "4. Sintetize essas informações para construir um panorama do cenário macroeconômico atual e suas implicações para investidores em ações.\n\n"
+            "Contexto dos CSVs:\n"
+            f"{contexto_geral_csv}"
+        ),
+        expected_output=(
+            "Um relatório conciso sobre o cenário macroeconômico brasileiro, destacando: \n"
+            "- Análise da trajetória recente dos indices economicos obtidos e suas perspectivas.\n"
+            "- Principais notícias e eventos de investimento relevantes (do CSV e da pesquisa online).\n"
+            "- Impactos esperados desse cenário no mercado de ações brasileiro em geral."
+        ),
+        agent=analista_macroeconomico
+    )
+
+    tarefa_indicacao_acoes = Task(
+        description=(
+            "1. Com base na análise do cenário macroeconômico (fornecida pela tarefa anterior), avalie as ações listadas no arquivo 'top_10_acoes.csv'.\n"
+            "2. Para cada ação no 'top_10_acoes.csv', utilize a ferramenta SerperDevTool para buscar: "
+            "a) Notícias recentes e específicas sobre a empresa e seu setor. "
+            "b) Análises e perspectivas de mercado para essa ação (preço-alvo, recomendações de outras casas de análise, etc.). "
+            "c) Informações sobre os fundamentos da empresa, se não estiverem detalhados no CSV (ex: P/L, dividend yield, endividamento).\n"
+            "3. Se julgar pertinente, pesquise também outras ações da Bovespa que possam representar boas oportunidades ou riscos no cenário atual.\n"
+            "4. Formule recomendações de INVESTIMENTO (COMPRA, VENDA ou MANTER) para pelo menos 5 ações (priorizando as do 'top_10_acoes.csv', mas podendo incluir outras). Cada recomendação deve ser acompanhada de uma justificativa clara, baseada na análise macroeconômica, setorial, notícias e dados da empresa.\n\n"
+            "Contexto dos CSVs (especialmente 'Top 10 Ações'):\n"
+            f"{contexto_acoes_csv}" # Foco principal, mas não exclusivo
+        ),
+        expected_output=(
+            "Um relatório de indicações de ações contendo:\n"
+            "- Recomendações claras de COMPRA, VENDA ou MANTER para 3 a 5 ações da Bovespa (com seus tickers).\n"
+            "- Justificativa detalhada para cada recomendação, explicando os fatores considerados (macroeconômicos, setoriais, específicos da empresa, notícias recentes)."
+            "Priorizar as ações do 'top_10_acoes.csv' na análise, mas incluir outras se forem identificadas oportunidades/riscos relevantes."
+        ),
+        agent=especialista_em_acoes,
+        context=[tarefa_analise_cenario] # Depende da análise macroeconômica
+    )
+
+    tarefa_compilacao_relatorio_final = Task(
+        description=(
+            "**Sua responsabilidade é GERAR e ESCREVER O CONTEÚDO COMPLETO do relatório de investimento final em formato markdown. NÃO descreva o que você faria ou o que o relatório conteria; em vez disso, PRODUZA o relatório AGORA.**\n\n"
+            "Para fazer isso, você DEVE:\n"
+            "1. Unificar a 'análise do cenário macroeconômico' (fornecida pelo Analista Macroeconômico) e as 'indicações de ações' (fornecidas pelo Especialista em Ações) em um relatório final coeso, detalhado e bem formatado.\n"
+            "2. Escrever o relatório em linguagem clara, profissional e acessível para investidores, utilizando a sintaxe markdown para uma excelente estrutura (títulos H2 e H3, subtítulos, listas com marcadores ou numeradas, negrito para destaques).\n"
+            "3. Detalhar as principais conclusões da análise macroeconômica e explicar explicitamente como elas fundamentam as estratégias de investimento e as recomendações de ações específicas.\n"
+            "4. Apresentar de forma proeminente e individualizada cada indicação de ação (COMPRA, VENDA, MANTER), incluindo o ticker da ação e um parágrafo de justificativa claro, conciso e bem fundamentado para cada uma.\n"
+            "5. Incluir um breve apêndice no final do relatório mencionando as fontes de dados primárias (os arquivos CSV: 'indicadores_economicos.csv', 'noticias_investimento.csv', 'top_10_acoes.csv') e o uso de pesquisa online para informações complementares.\n\n"
+            "**Utilize as informações das análises das tarefas anteriores, que estão disponíveis no contexto, como base fundamental para escrever este relatório.**"
+        ),
+        expected_output=(
+            "O TEXTO COMPLETO e FINAL de um Relatório de Investimento em formato markdown na língua portuguesa do brasil. O relatório DEVE ser abrangente e conter as seguintes seções PREENCHIDAS com análises, dados e texto gerado:\n"
+            "### Sumário Executivo\n"
+            "   - (Texto do sumário com as principais conclusões e recomendações de investimento.)\n"
+            "### Análise do Cenário Macroeconômico\n"
+            "   - (Texto da análise detalhada dos indicadores economicos, notícias relevantes e seus impactos esperados no mercado de ações.)\n"
+            "### Indicações de Ações Detalhadas\n"
+            "   - (Para cada ação recomendada: Ticker, Recomendação [COMPRA/VENDA/MANTER], e Justificativa completa e bem fundamentada.)\n"
+            "### Breves Considerações sobre Riscos e Oportunidades\n"
+            "   - (Texto com uma visão geral dos riscos e oportunidades identificados no cenário atual.)\n"
+            "### Apêndice: Fontes de Dados\n"
+            "   - (Texto mencionando as fontes de dados utilizadas.)"
+        ),
+        agent=redator_de_relatorios_de_investimento,
+        context=[tarefa_analise_cenario, tarefa_indicacao_acoes],
+    )
+
+    # Cada etapa só vai ao LLM se o prompt (dados incluídos) mudou desde a última execução
+    manifesto = ManifestoRelatorio(registro=registro)
+    falhas = []
+
+    # === Macro uma vez; cada etapa é um ponto de retomada: uma falha não refaz as anteriores ===
+    print("Iniciando a análise macroeconômica...")
+    analise_macro = manifesto.executar_ou_reaproveitar(
+        "analise_cenario",
+        impressao(azure_deployment_name, tarefa_analise_cenario.description, tarefa_analise_cenario.expected_output),
+        lambda: executar_tarefa(analista_macroeconomico, tarefa_analise_cenario),
+    )
+
+    if MODO_ANALISE_ACOES == "paralelo":
+        # === Ações em paralelo, uma análise por ticker ===
+        resumos = resumos_por_ticker(df_top_10_acoes, df_tecnicos=df_tecnicos, df_sensibilidades=df_sensibilidades)
+        print(f"Analisando {len(resumos)} ações em paralelo (até {CONCORRENCIA_ANALISE_ACOES} ao mesmo tempo)...")
+        analises_acoes, falhas = analisar_acoes_em_paralelo(resumos, analise_macro, tool, llm, azure_deployment_name,
+                                                            manifesto=manifesto)
+    else:
+        # === Todas as ações numa única tarefa, que recebe a análise macro já pronta ===
+        print("Iniciando a indicação de ações...")
+        tarefa_acoes = Task(
+            description=(
+                tarefa_indicacao_acoes.description
+                + "\n\n=== Análise do Cenário Macroeconômico (Analista Macroeconômico) ===\n"
+                + analise_macro
+            ),
+            expected_output=tarefa_indicacao_acoes.expected_output,
+            agent=especialista_em_acoes,
+        )
+        analises_acoes = manifesto.executar_ou_reaproveitar(
+            "indicacao_acoes",
+            impressao(azure_deployment_name, tarefa_acoes.description, tarefa_acoes.expected_output),
+            lambda: executar_tarefa(especialista_em_acoes, tarefa_acoes),
+        )
+
+    # === Relatório final com as análises juntadas ===
+    tarefa_relatorio = Task(
+        description=(
+            tarefa_compilacao_relatorio_final.description
+            + "\n\n=== Análise do Cenário Macroeconômico (Analista Macroeconômico) ===\n"
+            + analise_macro
+            + "\n\n=== Indicações de Ações (Especialista em Ações) ===\n"
+            + analises_acoes
+        ),
+        expected_output=tarefa_compilacao_relatorio_final.expected_output,
+        agent=redator_de_relatorios_de_investimento,
+    )
+    texto_para_salvar = manifesto.executar_ou_reaproveitar(
+        "relatorio_final",
+        impressao(azure_deployment_name, tarefa_relatorio.description, tarefa_relatorio.expected_output),
+        lambda: executar_tarefa(redator_de_relatorios_de_investimento, tarefa_relatorio),
+    )
+
+    print("\n\n=== RELATÓRIO FINAL DE INVESTIMENTO GERADO PELA CREW (TEXTO) ===\n")
+    print(texto_para_salvar)
+
+
+    # Salvar o resultado em um arquivo .md ===
+    nome_arquivo_saida = dados.caminho_arquivo("relatorio_indicacao_acoes.md")
+
+    def escrever_relatorio(temporario):
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(texto_para_salvar) # Agora estamos passando uma string
+
+    # Troca atômica: o dashboard continua mostrando o relatório anterior até o novo estar completo
+    dados.escrever_atomico(nome_arquivo_saida, escrever_relatorio)
+    print(f"\n\nRelatório salvo em '{nome_arquivo_saida}'")
+    if manifesto.geradas:
+        print(f"🧾 Etapas geradas: {', '.join(manifesto.geradas)}. Reaproveitadas: {len(manifesto.reaproveitadas)}.")
+    else:
+        print("🧾 Nenhuma entrada mudou desde a última execução: relatório reaproveitado sem chamadas ao LLM.")
+
+    for tipo, c in cache.estatisticas().items():
+        print(f"🗄️ Cache {tipo}: {c['acertos']} acertos, {c['falhas']} falhas ({c['taxa_acerto']:.0%}).")
+
+    if falhas:
+        print(f"⚠️ Relatório gerado sem a análise de: {', '.join(falhas)}. Elas serão refeitas na próxima execução.")
+        return "parcial"
+    return "concluida"
+
+
+def main():
+    anterior = ultima_execucao()
+    if anterior and anterior["status"] != "concluida":
+        prontas = [nome for nome, e in anterior["etapas"].items() if e["status"] in ("concluida", "reaproveitada")]
+        print(f"↩️ A execução {anterior['id']} não terminou ({anterior['status']}). "
+              f"Etapas já concluídas que serão retomadas: {', '.join(prontas) or 'nenhuma'}.")
 
-print("\n\n=== RELATÓRIO FINAL DE INVESTIMENTO GERADO PELA CREW (TEXTO) ===\n")
-print(texto_para_salvar)
+    registro = RegistroExecucao()
+    print(f"🗂️ Registro da execução em '{registro.diretorio}'")
+    try:
+        status = executar_analise(registro)
+    except BaseException:
+        registro.finalizar("falhou")
+        registro.imprimir_resumo()
+        raise
+    registro.finalizar(status)
+    registro.imprimir_resumo()
 
 
-# Salvar o resultado em um arquivo .md ===
-nome_arquivo_saida = "../data/relatorio_indicacao_acoes.md"
-with open(nome_arquivo_saida, "w", encoding="utf-8") as f:
-    f.write(texto_para_salvar) # Agora estamos passando uma string
-print(f"\n\nRelatório salvo em '{nome_arquivo_saida}'")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+
+import armazem_precos
+import dados
+
+# Correlações e betas móveis de cada ação contra fatores macro, materializados na tabela
+# "analise_cruzada" (uma linha por ticker e pregão), lidos pelo dashboard e pelos agentes
+TABELA_ANALISE_CRUZADA = "analise_cruzada"
+TABELA_INDICADORES = "indicadores_economicos"
+
+# Alinhamento de cada indicador ao calendário de pregões: por quantos dias corridos a última
+# observação é repetida (forward-fill) antes de virar lacuna. Séries mensais e trimestrais
+# ficam na data de referência do SGS (dia 1 do mês)
+VALIDADE_DIAS = {"DÓLAR": 7, "SELIC": 45, "COMMODITIES": 62, "IPCA": 62, "IGP-M": 62, "PIB": 120}
+
+# Fator -> indicador de origem, transformação (retorno log ou diferença em p.p.),
+# periodicidade do cálculo ("B": pregões, "ME": fim de mês) e janela em períodos.
+# Betas em % de retorno da ação por 1% do dólar/commodities ou por 1 p.p. de Selic.
+FATORES = {
+    "dolar": {"indicador": "DÓLAR", "transformacao": "retorno", "periodo": "B", "janela": 63},
+    "commodities": {"indicador": "COMMODITIES", "transformacao": "retorno", "periodo": "ME", "janela": 24},
+    "selic": {"indicador": "SELIC", "transformacao": "diferenca", "periodo": "ME", "janela": 24},
+}
+# Fração da janela com observações válidas exigida para publicar a estatística
+COBERTURA_MINIMA = 0.6
+COLUNAS_ANALISE = [f"{medida}_{fator}" for fator in FATORES for medida in ("corr", "beta")]
+
+
+def painel_alinhado(indicadores: pd.DataFrame, calendario: pd.DatetimeIndex) -> pd.DataFrame:
+    """Nível de cada indicador em cada data de `calendario` (uma coluna por indicador).
+
+    Cada observação vale até a seguinte, desde que dentro de `VALIDADE_DIAS`.
+    """
+    largas = (indicadores.dropna(subset=["data", "valor"])
+              .pivot_table(index="data", columns="indicador", values="valor", aggfunc="last", observed=True)
+              .sort_index())
+    largas.columns = largas.columns.astype(str)
+    painel = {}
+    for indicador in largas.columns:
+        serie = largas[indicador].dropna()
+        validade = pd.Timedelta(days=VALIDADE_DIAS.get(indicador, 7))
+        # merge_asof: última observação até cada data, desde que dentro da validade
+        alinhada = pd.merge_asof(
+            pd.DataFrame({"data": calendario}), serie.rename("valor").rename_axis("data").reset_index(),
+            on="data", direction="backward", tolerance=validade,
+        )
+        painel[indicador] = alinhada["valor"].to_numpy()
+    return pd.DataFrame(painel, index=calendario)
+
+
+def cobertura_fatores(indicadores: pd.DataFrame) -> tuple:
+    """(início, fim) do intervalo em que todos os fatores já têm as observações que os determinam.
+
+    O fim evita gravar estatísticas com um fator ainda não publicado (o valor repetido daria
+    variação zero e o pregão não seria recalculado depois). None se faltar algum fator.
+    """
+    datas = indicadores.dropna(subset=["valor"]).groupby("indicador", observed=True)["data"].agg(["min", "max"])
+    datas.index = datas.index.astype(str)
+    inicios, fins = [], []
+    for config in FATORES.values():
+        if config["indicador"] not in datas.index:
+            return None
+        primeira, ultima = datas.loc[config["indicador"]]
+        inicios.append(primeira)
+        # Um fator mensal fecha o mês de referência; vale para os pregões até o fim do mês seguinte
+        fins.append(ultima + pd.offsets.MonthEnd(2) if config["periodo"] == "ME" else ultima)
+    return max(inicios), min(fins)
+
+
+def estatisticas_moveis(retornos: np.ndarray, fator: np.ndarray, janela: int, minimo: int):
+    """Correlação e beta móveis de todas as colunas de `retornos` (T x N) contra `fator` (T).
+
+    Somas móveis por diferença de somas acumuladas: o custo é o mesmo para qualquer janela.
+    Cada coluna usa só as linhas em que ela e o fator têm valor.
+    """
+    valido = ~np.isnan(retornos) & ~np.isnan(fator)[:, None]
+    x = np.where(valido, fator[:, None], 0.0)
+    y = np.where(valido, retornos, 0.0)
+    fim = np.arange(1, len(retornos) + 1)
+    inicio = np.maximum(fim - janela, 0)
+
+    def soma_movel(matriz):
+        acumulada = np.vstack([np.zeros((1, matriz.shape[1])), np.cumsum(matriz, axis=0)])
+        return acumulada[fim] - acumulada[inicio]
+
+    n = soma_movel(valido.astype(float))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media_x, media_y = soma_movel(x) / n, soma_movel(y) / n
+        covariancia = soma_movel(x * y) / n - media_x * media_y
+        variancia_x = soma_movel(x * x) / n - media_x ** 2
+        variancia_y = soma_movel(y * y) / n - media_y ** 2
+        correlacao = covariancia / np.sqrt(variancia_x * variancia_y)
+        beta = covariancia / variancia_x
+    # Variâncias quase nulas (fator parado na janela) viram lacuna, não números explosivos
+    insuficiente = (n < minimo) | (variancia_x <= 1e-12) | (variancia_y <= 1e-12)
+    correlacao[insuficiente] = np.nan
+    beta[insuficiente] = np.nan
+    return np.clip(correlacao, -1, 1), beta
+
+
+def _transformar(niveis: pd.DataFrame, transformacao: str) -> pd.DataFrame:
+    if transformacao == "retorno":
+        return np.log(niveis.where(niveis > 0)).diff()
+    return niveis.diff()
+
+
+def calcular_analise(fechamentos: pd.DataFrame, painel: pd.DataFrame) -> dict:
+    """{coluna: DataFrame datas x tickers} com correlação e beta de cada fator.
+
+    `fechamentos` tem uma coluna por ticker no calendário de pregões; `painel`, os
+    indicadores alinhados no mesmo calendário. Estatísticas mensais valem para os
+    pregões do mês seguinte ao fechamento do mês.
+    """
+    resultados = {}
+    for fator, config in FATORES.items():
+        if config["indicador"] not in painel.columns:
+            continue
+        precos, nivel_fator = fechamentos, painel[config["indicador"]]
+        if config["periodo"] != "B":
+            precos = fechamentos.resample(config["periodo"]).last()
+            nivel_fator = nivel_fator.resample(config["periodo"]).last()
+        retornos = np.log(precos).diff()
+        variacao_fator = _transformar(nivel_fator.to_frame(), config["transformacao"]).iloc[:, 0]
+        minimo = max(3, int(config["janela"] * COBERTURA_MINIMA))
+        correlacao, beta = estatisticas_moveis(retornos.to_numpy(dtype=float), variacao_fator.to_numpy(dtype=float),
+                                               config["janela"], minimo)
+        for medida, valores in (("corr", correlacao), ("beta", beta)):
+            quadro = pd.DataFrame(valores, index=precos.index, columns=precos.columns)
+            if config["periodo"] != "B":
+                # Rótulo de fim de mês passa para o dia 1 do mês seguinte: durante o mês,
+                # inclusive no último pregão, vale a estatística do mês anterior (já fechado)
+                quadro = quadro.shift(1, freq="D").reindex(fechamentos.index, method="ffill")
+            resultados[f"{medida}_{fator}"] = quadro
+    return resultados
+
+
+def carregar_analise(tickers: list = None, colunas: list = None, desde=None) -> pd.DataFrame:
+    filtros = [("ticker", "in", list(tickers))] if tickers else []
+    if desde is not None:
+        filtros.append(("data", ">=", pd.Timestamp(desde)))
+    filtros = filtros or None
+    if colunas is not None:
+        colunas = ["data", "ticker"] + [c for c in colunas if c not in ("data", "ticker")]
+    return dados.ler(TABELA_ANALISE_CRUZADA, colunas=colunas, filtros=filtros)
+
+
+def atualizar_analise(historico: pd.DataFrame, indicadores: pd.DataFrame, existentes: pd.DataFrame) -> pd.DataFrame:
+    """Calcula só os pregões que ainda não estão na tabela, com a janela anterior necessária.
+
+    Como em `indicadores_tecnicos`, entram as barras depois da última calculada e as
+    anteriores à primeira (backfill). Retorna apenas as linhas novas.
+    """
+    vazio = pd.DataFrame(columns=["data", "ticker"] + COLUNAS_ANALISE)
+    cobertura = cobertura_fatores(indicadores)
+    if historico.empty or cobertura is None:
+        return vazio
+    inicio, fim = (np.datetime64(data) for data in cobertura)
+    fechamentos = historico.pivot_table(index=historico.index, columns="ticker", values="fechamento",
+                                        aggfunc="last", observed=True).sort_index()
+    fechamentos.columns = fechamentos.columns.astype(str)
+    fechamentos = fechamentos.astype(float)
+
+    calculadas = existentes.groupby("ticker", observed=True)["data"].agg(["min", "max"])
+    calculadas.index = calculadas.index.astype(str)
+    limites = calculadas.reindex(fechamentos.columns).astype("datetime64[ns]")
+    datas = fechamentos.index.to_numpy()[:, None]
+    nova = (fechamentos.notna().to_numpy() & (datas >= inicio) & (datas <= fim)
+            & (limites["max"].isna().to_numpy()
+               | (datas > limites["max"].to_numpy()) | (datas < limites["min"].to_numpy())))
+    if not nova.any():
+        return vazio
+
+    # Janela anterior à primeira barra nova: a maior entre os fatores, com folga de um período
+    primeira_nova = fechamentos.index[nova.any(axis=1).argmax()]
+    recuo = max(pd.Timedelta(days=int((c["janela"] + 2) * (31 if c["periodo"] == "ME" else 1.6)))
+                for c in FATORES.values())
+    recorte = fechamentos.loc[primeira_nova - recuo:]
+    painel = painel_alinhado(indicadores, recorte.index)
+    resultados = calcular_analise(recorte, painel)
+    if not resultados:
+        return vazio
+
+    nova = nova[-len(recorte):]
+    linhas, colunas = np.nonzero(nova)
+    novas = pd.DataFrame({"data": recorte.index[linhas], "ticker": recorte.columns[colunas]})
+    for coluna in COLUNAS_ANALISE:
+        novas[coluna] = resultados[coluna].to_numpy()[linhas, colunas] if coluna in resultados else np.nan
+    # Pregões ainda sem nenhuma estatística (janela incompleta) não são gravados: entram numa
+    # próxima execução, quando houver histórico de indicadores suficiente
+    return novas.dropna(subset=COLUNAS_ANALISE, how="all").reset_index(drop=True)
+
+
+def main():
+    historico = armazem_precos.ler_historico(colunas=["fechamento"])
+    indicadores = dados.ler(TABELA_INDICADORES, colunas=["data", "indicador", "valor"]) \
+        if dados.existe(TABELA_INDICADORES) else dados.vazia(TABELA_INDICADORES)
+    if historico.empty or indicadores.empty:
+        print("ℹ️ Sem preços ou indicadores econômicos para a análise cruzada.")
+        return
+    # Só as datas já calculadas de cada ticker importam aqui
+    existentes = carregar_analise(colunas=[])
+    novas = atualizar_analise(historico, indicadores, existentes)
+    if novas.empty:
+        print("ℹ️ Análise cruzada (correlações e betas macro) já está atualizada.")
+        return
+    dados.acrescentar(TABELA_ANALISE_CRUZADA, novas)
+    print(f"✅ Análise cruzada calculada para {len(novas)} pregões novos.")
+
+
+def sensibilidades_recentes(analise: pd.DataFrame) -> pd.DataFrame:
+    """Última leitura de cada ticker (uma linha por ticker, colunas de `COLUNAS_ANALISE`)."""
+    if analise.empty:
+        return pd.DataFrame(columns=["ticker"] + COLUNAS_ANALISE)
+    ultimas = analise.sort_values("data", kind="stable").groupby("ticker", observed=True).tail(1)
+    ultimas = ultimas.assign(ticker=ultimas["ticker"].astype(str))
+    return ultimas[["ticker"] + [c for c in COLUNAS_ANALISE if c in ultimas.columns]].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    main()
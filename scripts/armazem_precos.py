@@ -0,0 +1,197 @@
+import glob
+import json
+import os
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+import dados
+
+# Histórico OHLCV persistente e só de acréscimos (append-only), na tabela "precos" da camada de dados
+ARQUIVO_INDICE = dados.caminho_arquivo("precos_indice.json")
+COLUNAS_PRECOS = ["abertura", "alta", "baixa", "fechamento", "volume"]
+
+FUSO_B3 = ZoneInfo("America/Sao_Paulo")
+# O pregão fecha às 17h; a Alpha Vantage publica a barra diária algum tempo depois
+HORA_DISPONIBILIDADE = time(19, 0)
+
+
+def ultimo_pregao(agora: datetime = None) -> datetime:
+    """Momento a partir do qual a barra do último pregão já deve estar disponível.
+
+    Considera apenas fins de semana; feriados são cobertos pelo registro de
+    verificação em `esta_atualizado` (um ticker checado após esse momento não é
+    consultado de novo).
+    """
+    # O horário de disponibilidade é da B3: momentos em outro fuso são convertidos antes
+    agora = agora.astimezone(FUSO_B3) if agora else datetime.now(FUSO_B3)
+    dia = agora.date()
+    if agora.timetz().replace(tzinfo=None) < HORA_DISPONIBILIDADE:
+        dia -= timedelta(days=1)
+    while dia.weekday() >= 5:
+        dia -= timedelta(days=1)
+    return datetime.combine(dia, HORA_DISPONIBILIDADE, tzinfo=FUSO_B3)
+
+
+def carregar_indice() -> dict:
+    migrar_csv_legado()
+    if not os.path.exists(ARQUIVO_INDICE):
+        return {}
+    with open(ARQUIVO_INDICE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def salvar_indice(indice: dict):
+    conteudo = json.dumps(indice, indent=2, sort_keys=True)
+
+    def escrever(temporario):
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+
+    dados.escrever_atomico(ARQUIVO_INDICE, escrever)
+
+
+def esta_atualizado(indice: dict, ticker: str, agora: datetime = None, pregoes: int = 1) -> bool:
+    """True se o ticker já tem (ou já foi verificado para) um dos últimos `pregoes` pregões."""
+    registro = indice.get(ticker)
+    if not registro:
+        return False
+    corte = ultimo_pregao(agora)
+    for _ in range(pregoes - 1):
+        corte -= timedelta(days=3 if corte.weekday() == 0 else 1)
+    if registro.get("ultima_data") and registro["ultima_data"] >= corte.date().isoformat():
+        return True
+    verificado_em = registro.get("verificado_em")
+    return bool(verificado_em) and datetime.fromisoformat(verificado_em) >= corte
+
+
+def acrescentar(indice: dict, ticker: str, df: pd.DataFrame) -> int:
+    """Acrescenta ao histórico apenas as barras posteriores à última data guardada.
+
+    `df` deve ter índice de datas e as colunas de `COLUNAS_PRECOS`. Retorna o
+    número de barras novas gravadas. O índice é atualizado em memória; cabe a
+    quem chama persisti-lo com `salvar_indice`.
+    """
+    registro = indice.setdefault(ticker, {})
+    ultima_data = registro.get("ultima_data")
+
+    novos = df[COLUNAS_PRECOS].sort_index()
+    novos = novos[~novos.index.duplicated(keep="last")]
+    if ultima_data:
+        novos = novos[novos.index > pd.Timestamp(ultima_data)]
+
+    registro["verificado_em"] = datetime.now(FUSO_B3).isoformat(timespec="seconds")
+    if novos.empty:
+        return 0
+
+    dados.acrescentar("precos", novos.rename_axis("data").reset_index().assign(ticker=ticker))
+    registro["ultima_data"] = novos.index[-1].date().isoformat()
+    return len(novos)
+
+
+def acrescentar_lotes(indice: dict, ticker: str, lotes) -> int:
+    """Grava lotes de barras (em qualquer ordem de datas) um de cada vez, sem juntá-los em memória.
+
+    Usado no backfill do histórico completo: barras já guardadas são regravadas e a
+    leitura fica com a parte mais recente de cada (ticker, data). Retorna o total de
+    barras gravadas; como em `acrescentar`, cabe a quem chama salvar o índice.
+    """
+    registro = indice.setdefault(ticker, {})
+    total, mais_recente = 0, None
+    for lote in lotes:
+        if lote.empty:
+            continue
+        dados.acrescentar("precos", lote[COLUNAS_PRECOS].rename_axis("data").reset_index().assign(ticker=ticker))
+        total += len(lote)
+        mais_recente = max(mais_recente, lote.index.max()) if mais_recente is not None else lote.index.max()
+
+    registro["verificado_em"] = datetime.now(FUSO_B3).isoformat(timespec="seconds")
+    if mais_recente is not None:
+        registro["historico_completo"] = registro["verificado_em"]
+        if mais_recente.date().isoformat() > registro.get("ultima_data", ""):
+            registro["ultima_data"] = mais_recente.date().isoformat()
+    return total
+
+
+def ler_historico(tickers: list = None, desde=None, colunas: list = None) -> pd.DataFrame:
+    """Histórico dos tickers pedidos (todos, se None), indexado por data e com a coluna 'ticker'.
+
+    Só as partições dos tickers pedidos, as datas a partir de `desde` e as colunas
+    informadas são lidas do disco.
+    """
+    filtros = []
+    if tickers is not None:
+        if not tickers:
+            return dados.vazia("precos").set_index("data")
+        filtros.append(("ticker", "in", list(tickers)))
+    if desde is not None:
+        filtros.append(("data", ">=", pd.Timestamp(desde)))
+    if colunas is not None:
+        colunas = ["data", "ticker"] + [c for c in colunas if c not in ("data", "ticker")]
+    historico = dados.ler("precos", colunas=colunas, filtros=filtros or None)
+    return historico.sort_values(["ticker", "data"], kind="stable").set_index("data")
+
+
+def gerar_visao_recente(tickers: list, num_registros: int = 10, num_destaques: int = None) -> int:
+    """Grava os últimos `num_registros` pregões de cada ticker na tabela 'top_10_acoes'.
+
+    Com `num_destaques`, só entram os tickers de maior volume médio nesses pregões.
+    """
+    desde = ultimo_pregao().date() - timedelta(days=num_registros * 3 + 14)
+    historico = ler_historico(tickers, desde=desde)
+    if historico.empty:
+        return 0
+    recente = historico.groupby("ticker", sort=False, observed=True).tail(num_registros)
+    if num_destaques:
+        volume = recente.groupby("ticker", observed=True)["volume"].mean().nlargest(num_destaques)
+        recente = recente[recente["ticker"].isin(volume.index)]
+    dados.salvar("top_10_acoes", recente.reset_index())
+    return len(recente)
+
+
+def migrar_csv_legado():
+    """Converte o histórico em CSV para a tabela Parquet.
+
+    Entram o histórico por ticker (data/precos/<TICKER>.csv) e, na primeira carga da
+    tabela, os pregões de data/top_10_acoes.csv, o único histórico que as versões
+    anteriores guardavam. O índice passa a apontar para a última data importada.
+    """
+    diretorio = dados.caminho("precos")
+    legados = glob.glob(os.path.join(diretorio, "*.csv"))
+    indice_legado = os.path.join(diretorio, "indice.json")
+    primeira_carga = not dados.existe("precos")
+    importadas = {}
+    for caminho_csv in legados:
+        ticker = os.path.splitext(os.path.basename(caminho_csv))[0]
+        df = pd.read_csv(caminho_csv, parse_dates=["data"]).assign(ticker=ticker)
+        dados.acrescentar("precos", df)
+        importadas[ticker] = set(df["data"])
+        os.remove(caminho_csv)
+    if os.path.exists(indice_legado):
+        os.replace(indice_legado, ARQUIVO_INDICE)
+    if primeira_carga:
+        _importar_visao_recente(importadas)
+
+
+def _importar_visao_recente(importadas: dict):
+    """Acrescenta à tabela de preços os pregões da visão recente antiga que ainda não estão nela."""
+    visao = dados.ler("top_10_acoes").dropna(subset=["data", "ticker"])
+    if visao.empty:
+        return
+    visao = visao.drop_duplicates(subset=["ticker", "data"], keep="last")
+    ja_importada = [data in importadas.get(ticker, ()) for ticker, data in zip(visao["ticker"], visao["data"])]
+    visao = visao[~pd.Series(ja_importada, index=visao.index, dtype=bool)]
+    if visao.empty:
+        return
+    dados.acrescentar("precos", visao[COLUNAS_PRECOS + ["data", "ticker"]])
+
+    indice = {}
+    if os.path.exists(ARQUIVO_INDICE):
+        with open(ARQUIVO_INDICE, "r", encoding="utf-8") as f:
+            indice = json.load(f)
+    for ticker, ultima in visao.groupby("ticker", observed=True)["data"].max().items():
+        registro = indice.setdefault(str(ticker), {})
+        registro["ultima_data"] = max(registro.get("ultima_data", ""), ultima.date().isoformat())
+    salvar_indice(indice)
+    print(f"🗃️ {len(visao)} pregões de top_10_acoes importados para a tabela de preços.")
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import dados
+
+DIRETORIO_CACHE = dados.caminho_arquivo(".cache_llm")
+HORA = 3600
+# Resultados de busca envelhecem rápido; completions com o mesmo prompt e parâmetros duram mais
+TTL_POR_TIPO = {
+    "busca": float(os.getenv("CACHE_TTL_BUSCA_HORAS", "6")) * HORA,
+    "llm": float(os.getenv("CACHE_TTL_LLM_HORAS", str(7 * 24))) * HORA,
+}
+TAMANHO_MAXIMO_BYTES = int(float(os.getenv("CACHE_TAMANHO_MAXIMO_MB", "200")) * 1024 * 1024)
+
+
+class CacheDisco:
+    """Cache em disco endereçado por conteúdo, com TTL por tipo e despejo do menos usado.
+
+    Cada entrada é um arquivo <sha256>.json; a data de modificação marca o último
+    uso e orienta o despejo quando o diretório passa de `tamanho_maximo_bytes`.
+    """
+
+    def __init__(self, diretorio: str = DIRETORIO_CACHE, ttl_por_tipo: dict = None,
+                 tamanho_maximo_bytes: int = TAMANHO_MAXIMO_BYTES):
+        self.diretorio = diretorio
+        self.ttl_por_tipo = dict(TTL_POR_TIPO, **(ttl_por_tipo or {}))
+        self.tamanho_maximo_bytes = tamanho_maximo_bytes
+        self.contadores = {}
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        self._tamanho_total = sum(e.stat().st_size for e in os.scandir(diretorio) if e.name.endswith(".json"))
+
+    @staticmethod
+    def chave(tipo: str, *partes) -> str:
+        conteudo = json.dumps([tipo, partes], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f"{chave}.json")
+
+    def _contar(self, tipo: str, evento: str):
+        with self._lock:
+            por_tipo = self.contadores.setdefault(tipo, {"acertos": 0, "falhas": 0})
+            por_tipo[evento] += 1
+
+    def obter(self, tipo: str, chave: str):
+        """Valor guardado para a chave, ou None se ausente ou expirado."""
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            self._contar(tipo, "falhas")
+            return None
+        if time.time() - entrada["criado_em"] > self.ttl_por_tipo.get(tipo, 0):
+            self._contar(tipo, "falhas")
+            return None
+        os.utime(caminho)  # Marca o uso recente para o despejo LRU
+        self._contar(tipo, "acertos")
+        return entrada["valor"]
+
+    def gravar(self, tipo: str, chave: str, valor):
+        caminho = self._caminho(chave)
+        conteudo = json.dumps({"tipo": tipo, "criado_em": time.time(), "valor": valor}, ensure_ascii=False)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+        anterior = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+        os.replace(temporario, caminho)
+        with self._lock:
+            self._tamanho_total += os.path.getsize(caminho) - anterior
+            excedeu = self._tamanho_total > self.tamanho_maximo_bytes
+        if excedeu:
+            self._despejar()
+
+    def _despejar(self):
+        """Remove as entradas usadas há mais tempo até voltar a 90% do limite."""
+        with self._lock:
+            entradas = sorted(
+                (e for e in os.scandir(self.diretorio) if e.name.endswith(".json")),
+                key=lambda e: e.stat().st_mtime,
+            )
+            alvo = self.tamanho_maximo_bytes * 0.9
+            for entrada in entradas:
+                if self._tamanho_total <= alvo:
+                    break
+                tamanho = entrada.stat().st_size
+                try:
+                    os.remove(entrada.path)
+                except OSError:
+                    continue
+                self._tamanho_total -= tamanho
+
+    def obter_ou_calcular(self, tipo: str, partes_chave: list, calcular):
+        chave = self.chave(tipo, *partes_chave)
+        valor = self.obter(tipo, chave)
+        if valor is None:
+            valor = calcular()
+            self.gravar(tipo, chave, valor)
+        return valor
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                tipo: dict(c, taxa_acerto=c["acertos"] / max(1, c["acertos"] + c["falhas"]))
+                for tipo, c in self.contadores.items()
+            }
+
+
+def _nomes_ferramentas(tools) -> list:
+    nomes = []
+    for ferramenta in tools or []:
+        if isinstance(ferramenta, dict):
+            ferramenta = ferramenta.get("function", ferramenta)
+            nomes.append(ferramenta.get("name"))
+        else:
+            nomes.append(getattr(ferramenta, "name", str(ferramenta)))
+    return nomes
+
+
+def chamar_com_cache(cache: CacheDisco, llm, messages, tools=None, parametros: dict = None, **kwargs):
+    """`llm.call(messages, tools=tools, **kwargs)` reaproveitando respostas idênticas do cache "llm".
+
+    A chave combina o modelo, os `parametros` de geração, as mensagens e os nomes das
+    ferramentas. Só respostas em texto são guardadas: chamadas de ferramenta e saídas
+    estruturadas vão sempre ao modelo.
+    """
+    chave = cache.chave("llm", getattr(llm, "model", None), parametros or {}, messages, _nomes_ferramentas(tools))
+    valor = cache.obter("llm", chave)
+    if valor is not None:
+        return valor
+    resposta = llm.call(messages, tools=tools, **kwargs)
+    if isinstance(resposta, str) and resposta:
+        cache.gravar("llm", chave, resposta)
+    return resposta
+
+
+_cache_padrao = None
+_lock_padrao = threading.Lock()
+
+
+def cache_padrao() -> CacheDisco:
+    """Instância única do cache por processo."""
+    global _cache_padrao
+    with _lock_padrao:
+        if _cache_padrao is None:
+            _cache_padrao = CacheDisco()
+        return _cache_padrao
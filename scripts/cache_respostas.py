@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from indice_noticias import normalizar_titulo
+
+# Respostas do chat compartilhadas por todas as sessões do processo do dashboard
+CAPACIDADE = int(os.getenv("CHAT_CACHE_CAPACIDADE", "256"))
+TTL_SEGUNDOS = float(os.getenv("CHAT_CACHE_TTL_MINUTOS", "30")) * 60
+# Espera máxima por uma geração idêntica em andamento; depois disso a sessão gera a sua
+ESPERA_MAXIMA_S = float(os.getenv("CHAT_CACHE_ESPERA_SEGUNDOS", "60"))
+
+
+class _Pendente:
+    """Geração em andamento: quem chega depois espera por ela em vez de chamar o modelo de novo."""
+
+    def __init__(self):
+        self.pronta = threading.Event()
+        self.resposta = None
+        self.erro = None
+        # Líder interrompido sem erro da geração (ex.: st.stop/rerun na sessão dele)
+        self.abandonada = False
+
+
+class CacheRespostas:
+    """Cache LRU com TTL de respostas do chat, com coalescência de pedidos idênticos simultâneos.
+
+    A chave combina a pergunta normalizada, a versão dos dados e o histórico
+    enviado ao modelo: a mesma pergunta sobre os mesmos dados, no mesmo ponto
+    da conversa (tipicamente a primeira), reaproveita a resposta.
+    """
+
+    def __init__(self, capacidade: int = CAPACIDADE, ttl_segundos: float = TTL_SEGUNDOS,
+                 espera_maxima_s: float = ESPERA_MAXIMA_S):
+        self.capacidade = capacidade
+        self.ttl_segundos = ttl_segundos
+        self.espera_maxima_s = espera_maxima_s
+        self._entradas = OrderedDict()  # chave -> (resposta, criada_em, duracao_s)
+        self._pendentes = {}
+        self._trava = threading.Lock()
+        self._estatisticas = {"acertos": 0, "coalescidas": 0, "falhas": 0, "economia_s": 0.0}
+
+    @staticmethod
+    def chave(pergunta: str, versao_dados, historico=()) -> str:
+        conteudo = json.dumps([normalizar_titulo(pergunta), repr(versao_dados), list(historico)], ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    def obter_ou_gerar(self, chave: str, gerar) -> tuple:
+        """Devolve (resposta, origem), com origem em "cache", "coalescida" ou "gerada".
+
+        `gerar()` só é chamada por quem chega primeiro; pedidos iguais que chegam
+        durante a geração esperam (até `espera_maxima_s`) e recebem a mesma resposta.
+        Se o primeiro for interrompido, um dos que esperavam assume a geração.
+        """
+        while True:
+            with self._trava:
+                entrada = self._entradas.get(chave)
+                if entrada and time.time() - entrada[1] <= self.ttl_segundos:
+                    self._entradas.move_to_end(chave)
+                    self._estatisticas["acertos"] += 1
+                    self._estatisticas["economia_s"] += entrada[2]
+                    return entrada[0], "cache"
+                if entrada:
+                    del self._entradas[chave]
+                pendente = self._pendentes.get(chave)
+                lider = pendente is None
+                if lider:
+                    pendente = self._pendentes[chave] = _Pendente()
+            if lider:
+                return self._gerar(chave, gerar, pendente)
+
+            inicio_espera = time.perf_counter()
+            if not pendente.pronta.wait(self.espera_maxima_s):
+                # Geração lenta demais (ou travada): não prende esta sessão indefinidamente
+                return self._gerar(chave, gerar)
+            if pendente.abandonada:
+                continue
+            if pendente.erro is not None:
+                raise pendente.erro
+            with self._trava:
+                self._estatisticas["coalescidas"] += 1
+                entrada = self._entradas.get(chave)
+                if entrada:
+                    self._estatisticas["economia_s"] += max(0.0, entrada[2] - (time.perf_counter() - inicio_espera))
+            return pendente.resposta, "coalescida"
+
+    def _gerar(self, chave: str, gerar, pendente: _Pendente = None) -> tuple:
+        """Chama `gerar()` e guarda a resposta; com `pendente`, libera quem está esperando por ela."""
+        inicio = time.perf_counter()
+        resposta, erro, concluida = None, None, False
+        try:
+            resposta = gerar()
+            concluida = True
+        except Exception as e:
+            # Só erros da geração são repassados a quem espera; interrupções da sessão
+            # (st.stop, rerun, KeyboardInterrupt) ficam com ela
+            erro = e
+            raise
+        finally:
+            with self._trava:
+                self._estatisticas["falhas"] += 1
+                if concluida:
+                    self._entradas[chave] = (resposta, time.time(), time.perf_counter() - inicio)
+                    self._entradas.move_to_end(chave)
+                    while len(self._entradas) > self.capacidade:
+                        self._entradas.popitem(last=False)
+                if pendente is not None:
+                    del self._pendentes[chave]
+            if pendente is not None:
+                pendente.resposta, pendente.erro = resposta, erro
+                pendente.abandonada = not concluida and erro is None
+                pendente.pronta.set()
+        return resposta, "gerada"
+
+    def estatisticas(self) -> dict:
+        with self._trava:
+            e = dict(self._estatisticas)
+            e["entradas"] = len(self._entradas)
+        atendidas = e["acertos"] + e["coalescidas"]
+        total = atendidas + e["falhas"]
+        e["taxa_acerto"] = atendidas / total if total else 0.0
+        return e
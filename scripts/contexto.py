@@ -0,0 +1,210 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Orçamento de tokens por seção do contexto enviado aos agentes
+ORCAMENTO_TOKENS = {
+    "indicadores": int(os.getenv("ORCAMENTO_TOKENS_INDICADORES", "600")),
+    "noticias": int(os.getenv("ORCAMENTO_TOKENS_NOTICIAS", "1200")),
+    "acoes": int(os.getenv("ORCAMENTO_TOKENS_ACOES", "1200")),
+    "sensibilidades": int(os.getenv("ORCAMENTO_TOKENS_SENSIBILIDADES", "500")),
+}
+# Inclinação relativa (% por observação) abaixo da qual a série é considerada lateral
+LIMIAR_TENDENCIA = 0.1
+
+_codificador = None
+
+
+def estimar_tokens(texto: str) -> int:
+    """Conta tokens com o tiktoken quando disponível; senão, aproxima por 4 caracteres/token."""
+    global _codificador
+    if _codificador is None:
+        try:
+            import tiktoken
+            _codificador = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _codificador = False
+    if _codificador:
+        return len(_codificador.encode(texto))
+    return len(texto) // 4 + 1
+
+
+def _tendencia(inclinacao_pct: pd.Series) -> pd.Series:
+    return pd.Series(
+        np.select([inclinacao_pct > LIMIAR_TENDENCIA, inclinacao_pct < -LIMIAR_TENDENCIA], ["alta", "baixa"], "lateral"),
+        index=inclinacao_pct.index,
+    )
+
+
+def _resumir_series(df: pd.DataFrame, chave: str, coluna_valor: str) -> pd.DataFrame:
+    """Último valor, variação, mínimo, máximo e tendência por grupo, sem laços por grupo.
+
+    `df` deve estar ordenado por data dentro de cada grupo. A tendência vem da
+    inclinação da regressão linear do valor contra a posição na série,
+    calculada com agregações agrupadas (cov(t, y) / var(t)).
+    """
+    grupos = df.groupby(chave, sort=False, observed=True)[coluna_valor]
+    t = grupos.cumcount().astype(float)
+    y = df[coluna_valor].astype(float)
+    auxiliar = pd.DataFrame({chave: df[chave], "t": t, "y": y, "ty": t * y, "tt": t * t})
+    medias = auxiliar.groupby(chave, sort=False, observed=True)[["t", "y", "ty", "tt"]].mean()
+    variancia_t = medias["tt"] - medias["t"] ** 2
+    inclinacao = (medias["ty"] - medias["t"] * medias["y"]) / variancia_t.replace(0, np.nan)
+
+    resumo = pd.DataFrame({
+        "primeiro": grupos.first(),
+        "ultimo": grupos.last(),
+        "minimo": grupos.min(),
+        "maximo": grupos.max(),
+        "n": grupos.size(),
+    })
+    resumo["variacao_pct"] = (resumo["ultimo"] / resumo["primeiro"].replace(0, np.nan) - 1) * 100
+    inclinacao_pct = (inclinacao / medias["y"].abs().replace(0, np.nan) * 100).fillna(0)
+    resumo["tendencia"] = _tendencia(inclinacao_pct)
+    return resumo
+
+
+def ultimos_tecnicos(df_tecnicos: pd.DataFrame) -> pd.DataFrame:
+    """Leitura mais recente dos indicadores técnicos materializados de cada ticker."""
+    ultimos = df_tecnicos.sort_values("data", kind="stable").groupby("ticker", observed=True).tail(1).set_index("ticker")
+    return pd.DataFrame({
+        "rsi_14": ultimos["rsi_14"],
+        "macd_hist": ultimos["macd_hist"],
+        "vol_anual": ultimos["volatilidade_20"],
+        "vs_sma20_pct": (ultimos["fechamento"] / ultimos["sma_20"] - 1) * 100,
+        "vs_sma50_pct": (ultimos["fechamento"] / ultimos["sma_50"] - 1) * 100,
+    })
+
+
+def resumir_acoes(df_acoes: pd.DataFrame, df_tecnicos: pd.DataFrame = None) -> pd.DataFrame:
+    """Uma linha por ticker a partir dos pregões (índice de datas, colunas OHLCV e 'ticker').
+
+    Com `df_tecnicos`, acrescenta os indicadores técnicos já calculados em vez de histórico bruto.
+    """
+    df = df_acoes.sort_index(kind="stable")
+    resumo = _resumir_series(df, "ticker", "fechamento")
+    datas = pd.Series(df.index, index=df.index).groupby(df["ticker"].to_numpy(), sort=False)
+    resumo["desde"] = datas.first().dt.strftime("%d/%m/%Y")
+    resumo["ate"] = datas.last().dt.strftime("%d/%m/%Y")
+    resumo["volume_medio"] = df.groupby("ticker", sort=False, observed=True)["volume"].mean()
+    colunas = ["desde", "ate", "ultimo", "variacao_pct", "minimo", "maximo", "tendencia", "volume_medio"]
+    resumo = resumo[colunas]
+    if df_tecnicos is not None and not df_tecnicos.empty:
+        resumo = resumo.join(ultimos_tecnicos(df_tecnicos))
+    return resumo.rename_axis("ticker").reset_index()
+
+
+def resumir_indicadores(df_indicadores: pd.DataFrame) -> pd.DataFrame:
+    """Uma linha por indicador: data e valor mais recentes, variação contra a observação anterior e faixa."""
+    df = df_indicadores.dropna(subset=["data"]).sort_values(["indicador", "data"], kind="stable")
+    resumo = _resumir_series(df, "indicador", "valor")
+    grupos = df.groupby("indicador", sort=False, observed=True)
+    resumo["data"] = grupos["data"].last().dt.strftime("%d/%m/%Y")
+    # Penúltima observação de cada indicador: o valor deslocado de uma posição, na última linha do grupo
+    resumo["anterior"] = grupos["valor"].shift(1).groupby(df["indicador"], sort=False, observed=True).last()
+    resumo["delta"] = resumo["ultimo"] - resumo["anterior"]
+    colunas = ["data", "ultimo", "delta", "minimo", "maximo", "tendencia", "n"]
+    return resumo[colunas].rename_axis("indicador").reset_index()
+
+
+def resumir_sensibilidades(df_sensibilidades: pd.DataFrame) -> pd.DataFrame:
+    """Correlações e betas macro mais recentes por ticker, arredondados, do mais exposto ao dólar ao menos."""
+    resumo = df_sensibilidades.set_index("ticker").astype(float).round(2)
+    if "beta_dolar" in resumo.columns:
+        resumo = resumo.reindex(resumo["beta_dolar"].abs().sort_values(ascending=False, na_position="last").index)
+    return resumo.reset_index()
+
+
+def tabela_compacta(df: pd.DataFrame) -> list:
+    """Linhas CSV (cabeçalho primeiro): bem mais econômico em tokens do que markdown."""
+    return df.to_csv(index=False, float_format="%.6g").strip().splitlines()
+
+
+def limitar_tokens(linhas: list, orcamento: int, cabecalho: int = 1) -> str:
+    """Mantém as primeiras linhas que couberem no orçamento e informa quantas ficaram de fora."""
+    escolhidas = linhas[:cabecalho]
+    usados = estimar_tokens("\n".join(escolhidas))
+    for linha in linhas[cabecalho:]:
+        custo = estimar_tokens(linha) + 1
+        if usados + custo > orcamento:
+            break
+        escolhidas.append(linha)
+        usados += custo
+    omitidas = len(linhas) - len(escolhidas)
+    if omitidas:
+        escolhidas.append(f"... ({omitidas} linhas omitidas pelo limite de {orcamento} tokens)")
+    return "\n".join(escolhidas)
+
+
+def construir_contexto(df_acoes: pd.DataFrame, df_indicadores: pd.DataFrame, df_noticias: pd.DataFrame,
+                       orcamentos: dict = None, df_tecnicos: pd.DataFrame = None,
+                       df_sensibilidades: pd.DataFrame = None) -> dict:
+    """Monta as seções do contexto dos agentes e conta os tokens de cada uma.
+
+    `df_sensibilidades` (última linha por ticker da análise cruzada) acrescenta a seção
+    "sensibilidades", com correlações e betas contra dólar, commodities e Selic.
+
+    Retorna {"secoes": {nome: texto}, "tokens": {nome: n}}.
+    """
+    orcamentos = dict(ORCAMENTO_TOKENS, **(orcamentos or {}))
+    secoes = {}
+
+    if df_indicadores is not None and not df_indicadores.empty:
+        linhas = tabela_compacta(resumir_indicadores(df_indicadores))
+        secoes["indicadores"] = limitar_tokens(linhas, orcamentos["indicadores"])
+    else:
+        secoes["indicadores"] = "Nenhum indicador econômico disponível."
+
+    if df_noticias is not None and not df_noticias.empty:
+        noticias = df_noticias
+        if "primeira_vez" in noticias.columns:
+            noticias = noticias.sort_values("primeira_vez", ascending=False)
+        fontes = noticias["fonte"].astype("string").fillna("") if "fonte" in noticias.columns else pd.Series("", index=noticias.index)
+        linhas = ("- " + noticias["titulo"].astype(str) + np.where(fontes != "", " (" + fontes + ")", "")).tolist()
+        secoes["noticias"] = limitar_tokens(linhas, orcamentos["noticias"], cabecalho=0)
+    else:
+        secoes["noticias"] = "Nenhuma notícia de investimento carregada do CSV."
+
+    if df_acoes is not None and not df_acoes.empty:
+        linhas = tabela_compacta(resumir_acoes(df_acoes, df_tecnicos))
+        secoes["acoes"] = limitar_tokens(linhas, orcamentos["acoes"])
+    else:
+        secoes["acoes"] = "Nenhum dado de ações disponível."
+
+    if df_sensibilidades is not None:
+        if not df_sensibilidades.empty:
+            linhas = tabela_compacta(resumir_sensibilidades(df_sensibilidades))
+            secoes["sensibilidades"] = limitar_tokens(linhas, orcamentos["sensibilidades"])
+        else:
+            secoes["sensibilidades"] = "Sem histórico suficiente para correlações e betas macro."
+
+    return {"secoes": secoes, "tokens": {nome: estimar_tokens(texto) for nome, texto in secoes.items()}}
+
+
+def resumos_por_ticker(df_acoes: pd.DataFrame, ultimos_pregoes: int = 5, df_tecnicos: pd.DataFrame = None,
+                       df_sensibilidades: pd.DataFrame = None) -> dict:
+    """Texto curto por ticker (linha de resumo e últimos fechamentos), para análises individuais."""
+    linhas = tabela_compacta(resumir_acoes(df_acoes, df_tecnicos))
+    cabecalho = linhas[0]
+    recentes = df_acoes.sort_index(kind="stable").groupby("ticker", sort=False, observed=True).tail(ultimos_pregoes)
+    rotulos = pd.Series(
+        recentes.index.strftime("%d/%m").to_numpy() + "=" + recentes["fechamento"].map("{:.2f}".format).to_numpy()
+    )
+    fechamentos = rotulos.groupby(recentes["ticker"].to_numpy(), sort=False).agg(", ".join)
+
+    sensibilidades = {}
+    if df_sensibilidades is not None and not df_sensibilidades.empty:
+        resumo = resumir_sensibilidades(df_sensibilidades).set_index("ticker")
+        sensibilidades = {
+            ticker: ", ".join(f"{coluna}={valor:.2f}" for coluna, valor in valores.dropna().items())
+            for ticker, valores in resumo.iterrows()
+        }
+
+    resumos = {}
+    for linha in linhas[1:]:
+        ticker = linha.split(",", 1)[0]
+        resumos[ticker] = f"{cabecalho}\n{linha}\nÚltimos fechamentos: {fechamentos.get(ticker, '')}"
+        if sensibilidades.get(ticker):
+            resumos[ticker] += f"\nSensibilidade macro (correlação/beta): {sensibilidades[ticker]}"
+    return resumos
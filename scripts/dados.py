@@ -0,0 +1,301 @@
+import glob
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Camada única de acesso aos dados: coletores, agentes e dashboard leem e gravam por aqui.
+# As tabelas ficam em Parquet, com datas de verdade, tickers/indicadores como 'category'
+# e preços em float32; a leitura traz só as colunas e as linhas (filtros) pedidas.
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_DADOS = os.getenv("AGENTES_DADOS_DIR", os.path.join(RAIZ_PROJETO, "data"))
+
+DATA = "datetime64[ns]"
+
+# "particao": tabelas só de acréscimo, gravadas como um diretório de partes (uma subpasta por valor da coluna)
+# "incremental": tabelas só de acréscimo sem partição
+# Demais tabelas são um único arquivo, regravado por inteiro a cada coleta
+TABELAS = {
+    "precos": {
+        "particao": "ticker",
+        "chave": ["ticker", "data"],
+        "tipos": {"data": DATA, "abertura": "float32", "alta": "float32", "baixa": "float32",
+                  "fechamento": "float32", "volume": "int64", "ticker": "category"},
+    },
+    "indicadores_tecnicos": {
+        "particao": "ticker",
+        "chave": ["ticker", "data"],
+        "tipos": {"data": DATA, "ticker": "category", "fechamento": "float32", "retorno": "float32",
+                  "sma_20": "float32", "sma_50": "float32", "ema_12": "float32", "ema_26": "float32",
+                  "macd": "float32", "macd_sinal": "float32", "macd_hist": "float32", "rsi_14": "float32",
+                  "volatilidade_20": "float32", "volume_z_20": "float32"},
+    },
+    "analise_cruzada": {
+        "particao": "ticker",
+        "chave": ["ticker", "data"],
+        "tipos": {"data": DATA, "ticker": "category", "corr_dolar": "float32", "beta_dolar": "float32",
+                  "corr_commodities": "float32", "beta_commodities": "float32",
+                  "corr_selic": "float32", "beta_selic": "float32"},
+    },
+    "noticias_indice": {
+        "incremental": True,
+        "chave": ["hash_url"],
+        "tipos": {"hash_url": "string", "titulo": "string", "link": "string", "fonte": "category",
+                  "primeira_vez": DATA, "duplicata": "bool"},
+    },
+    "indicadores_economicos": {
+        "tipos": {"data": DATA, "valor": "float64", "indicador": "category", "data_coleta": DATA},
+    },
+    "noticias_investimentos": {
+        "tipos": {"titulo": "string", "link": "string", "fonte": "category", "primeira_vez": DATA},
+    },
+    "top_10_acoes": {
+        "tipos": {"data": DATA, "abertura": "float32", "alta": "float32", "baixa": "float32",
+                  "fechamento": "float32", "volume": "int64", "ticker": "category"},
+    },
+}
+
+# Partes acumuladas numa partição antes de juntá-las num único arquivo
+MAX_PARTES_POR_PARTICAO = 32
+# Leituras repetidas quando uma compactação remove uma parte durante a leitura
+TENTATIVAS_LEITURA = 5
+
+
+def caminho(nome: str) -> str:
+    """Arquivo (tabela simples) ou diretório (tabela só de acréscimo) da tabela."""
+    config = TABELAS[nome]
+    if config.get("particao") or config.get("incremental"):
+        return os.path.join(DIRETORIO_DADOS, nome)
+    return os.path.join(DIRETORIO_DADOS, f"{nome}.parquet")
+
+
+def caminho_arquivo(nome_arquivo: str) -> str:
+    """Caminho de um arquivo auxiliar (estado, cache, relatório) dentro do diretório de dados."""
+    return os.path.join(DIRETORIO_DADOS, nome_arquivo)
+
+
+def _partes(nome: str) -> list:
+    return sorted(glob.glob(os.path.join(caminho(nome), "**", "*.parquet"), recursive=True))
+
+
+def existe(nome: str) -> bool:
+    if TABELAS[nome].get("particao") or TABELAS[nome].get("incremental"):
+        return bool(_partes(nome)) or os.path.exists(_caminho_legado(nome))
+    return os.path.exists(caminho(nome)) or os.path.exists(_caminho_legado(nome))
+
+
+def particoes(nome: str) -> list:
+    """Valores gravados da coluna de partição (ex.: tickers), listados pelas pastas, sem ler as partes."""
+    prefixo = f"{TABELAS[nome]['particao']}="
+    try:
+        entradas = os.scandir(caminho(nome))
+    except FileNotFoundError:
+        return []
+    with entradas:
+        return sorted(e.name[len(prefixo):] for e in entradas if e.is_dir() and e.name.startswith(prefixo))
+
+
+def _arquivo_versao(nome: str) -> str:
+    # Oculto: fica fora das leituras de diretório do pyarrow e da listagem das partes
+    return os.path.join(DIRETORIO_DADOS, f".{nome}.versao")
+
+
+def _marcar_versao(nome: str):
+    """Avança o mtime do marcador da tabela; chamado a cada gravação."""
+    marcador = _arquivo_versao(nome)
+    agora = time.time_ns()
+    with open(marcador, "a"):
+        pass
+    os.utime(marcador, ns=(agora, agora))
+
+
+def versao(nome: str) -> tuple:
+    """Assinatura barata que muda a cada gravação da tabela.
+
+    Serve de chave para caches de leitura: uma coleta nova gera outra versão. É o
+    mtime de um único marcador, tocado por `salvar` e `acrescentar`; tabelas gravadas
+    antes do marcador (ou só no CSV antigo) usam quantidade, tamanho e mtime dos arquivos.
+    """
+    try:
+        return ("marcador", os.stat(_arquivo_versao(nome)).st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    config = TABELAS[nome]
+    if config.get("particao") or config.get("incremental"):
+        arquivos = _partes(nome)
+    else:
+        arquivos = [caminho(nome)]
+    estados = []
+    for arquivo in arquivos + [_caminho_legado(nome)]:
+        try:
+            estados.append(os.stat(arquivo))
+        except FileNotFoundError:
+            continue  # ausente ou removido por uma compactação em andamento
+    return (len(estados), sum(e.st_size for e in estados), max((e.st_mtime_ns for e in estados), default=0))
+
+
+def tipar(nome: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Converte as colunas presentes para os tipos do esquema da tabela."""
+    tipos = TABELAS[nome]["tipos"]
+    convertidas = {}
+    for coluna, tipo in tipos.items():
+        if coluna not in df.columns:
+            continue
+        serie = df[coluna]
+        if tipo == DATA:
+            if not pd.api.types.is_datetime64_any_dtype(serie):
+                serie = pd.to_datetime(serie, errors="coerce")
+            convertidas[coluna] = serie.astype(DATA)
+        elif tipo == "int64":
+            convertidas[coluna] = pd.to_numeric(serie, errors="coerce").fillna(0).astype("int64")
+        elif tipo == "bool":
+            convertidas[coluna] = serie.astype(str).str.lower().isin(["1", "true"]) if serie.dtype != bool else serie
+        else:
+            convertidas[coluna] = serie.astype(tipo)
+    return df.assign(**convertidas)
+
+
+def vazia(nome: str, colunas: list = None) -> pd.DataFrame:
+    tipos = TABELAS[nome]["tipos"]
+    colunas = colunas or list(tipos)
+    return pd.DataFrame({c: pd.Series(dtype=tipos.get(c, "object")) for c in colunas})
+
+
+def escrever_atomico(caminho_final: str, escrever):
+    """Grava num temporário ao lado e troca de uma vez: leitores nunca veem arquivo pela metade."""
+    diretorio, nome_arquivo = os.path.split(caminho_final)
+    os.makedirs(diretorio or ".", exist_ok=True)
+    # Prefixo "." faz o temporário ser ignorado pelo pyarrow ao ler um diretório de partes
+    temporario = os.path.join(diretorio, f".{nome_arquivo}.{os.getpid()}.{time.time_ns()}.tmp")
+    try:
+        escrever(temporario)
+        os.replace(temporario, caminho_final)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def _gravar_parquet(df: pd.DataFrame, caminho_final: str):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    escrever_atomico(caminho_final, lambda tmp: pq.write_table(tabela, tmp, compression="zstd"))
+
+
+def salvar(nome: str, df: pd.DataFrame):
+    """Regrava por inteiro uma tabela simples."""
+    _gravar_parquet(tipar(nome, df), caminho(nome))
+    _marcar_versao(nome)
+
+
+def acrescentar(nome: str, df: pd.DataFrame):
+    """Acrescenta linhas a uma tabela só de acréscimo, gravando uma parte nova (por partição)."""
+    if df.empty:
+        return
+    config = TABELAS[nome]
+    df = tipar(nome, df)
+    carimbo = time.time_ns()
+    coluna_particao = config.get("particao")
+    if not coluna_particao:
+        _gravar_parquet(df, os.path.join(caminho(nome), f"parte-{carimbo}.parquet"))
+        _marcar_versao(nome)
+        return
+    for valor, grupo in df.groupby(coluna_particao, observed=True, sort=False):
+        diretorio = os.path.join(caminho(nome), f"{coluna_particao}={valor}")
+        _gravar_parquet(grupo.drop(columns=coluna_particao), os.path.join(diretorio, f"parte-{carimbo}.parquet"))
+        if len(glob.glob(os.path.join(diretorio, "*.parquet"))) > MAX_PARTES_POR_PARTICAO:
+            compactar_particao(nome, diretorio)
+    _marcar_versao(nome)
+
+
+def compactar_particao(nome: str, diretorio: str):
+    """Junta as partes de uma partição num único arquivo, sem duplicatas de chave.
+
+    O conteúdo lido não muda, então a versão da tabela também não.
+    """
+    partes = sorted(glob.glob(os.path.join(diretorio, "*.parquet")))
+    df = pd.concat([pd.read_parquet(p) for p in partes], ignore_index=True)
+    chave = [c for c in TABELAS[nome].get("chave", []) if c in df.columns]
+    if chave:
+        df = df.drop_duplicates(subset=chave, keep="last")
+    if "data" in df.columns:
+        df = df.sort_values("data", kind="stable")
+    _gravar_parquet(df, os.path.join(diretorio, f"parte-{time.time_ns()}.parquet"))
+    for parte in partes:
+        os.remove(parte)
+
+
+def ler(nome: str, colunas: list = None, filtros: list = None) -> pd.DataFrame:
+    """Lê uma tabela trazendo só as colunas e as linhas (filtros no formato do pyarrow) pedidas.
+
+    Enquanto a tabela só existir no CSV antigo, lê o CSV sem convertê-lo: a conversão
+    fica com os coletores (`migrar_legado`), não com quem só lê, como o dashboard.
+    """
+    config = TABELAS[nome]
+    particionada = config.get("particao") or config.get("incremental")
+    if (particionada and not _partes(nome)) or (not particionada and not os.path.exists(caminho(nome))):
+        if os.path.exists(_caminho_legado(nome)):
+            return _ler_legado(nome, colunas, filtros)
+        return vazia(nome, colunas)
+
+    for tentativa in range(1, TENTATIVAS_LEITURA + 1):
+        try:
+            df = pd.read_parquet(caminho(nome), columns=colunas, filters=filtros)
+            break
+        except FileNotFoundError:
+            # Uma compactação trocou as partes entre a listagem e a leitura: a lista nova já tem o arquivo junto
+            if tentativa == TENTATIVAS_LEITURA:
+                raise
+            time.sleep(0.05 * tentativa)
+    # Partes posteriores prevalecem sobre as anteriores para a mesma chave
+    chave = config.get("chave", [])
+    if particionada and chave and all(c in df.columns for c in chave):
+        df = df.drop_duplicates(subset=chave, keep="last")
+    coluna_particao = config.get("particao")
+    if coluna_particao in df.columns and not isinstance(df[coluna_particao].dtype, pd.CategoricalDtype):
+        df[coluna_particao] = df[coluna_particao].astype("category")
+    return df.reset_index(drop=True)
+
+
+# --- Migração dos CSVs antigos (lidos uma vez e convertidos para Parquet) ---
+
+def _caminho_legado(nome: str) -> str:
+    return os.path.join(DIRETORIO_DADOS, f"{nome}.csv")
+
+
+def _ler_csv_legado(nome: str, caminho_csv: str) -> pd.DataFrame:
+    if nome in ("top_10_acoes",):
+        df = pd.read_csv(caminho_csv, index_col=0, encoding="utf-8-sig")
+        return df.rename_axis("data").reset_index()
+    df = pd.read_csv(caminho_csv, encoding="utf-8-sig", dtype=str if nome == "noticias_indice" else None)
+    if nome == "indicadores_economicos":
+        df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y", errors="coerce")
+    return df
+
+
+def _ler_legado(nome: str, colunas: list = None, filtros: list = None) -> pd.DataFrame:
+    """CSV antigo com os tipos, as colunas e os filtros de uma leitura em Parquet."""
+    tabela = pa.Table.from_pandas(tipar(nome, _ler_csv_legado(nome, _caminho_legado(nome))), preserve_index=False)
+    filtro = pq.filters_to_expression(filtros) if filtros else None
+    return ds.dataset(tabela).to_table(columns=colunas, filter=filtro).to_pandas()
+
+
+def migrar_legado(nome: str):
+    """Converte <nome>.csv para Parquet, se a tabela ainda não existir.
+
+    Chamada pelos coletores antes de gravar a tabela; leituras não convertem nada.
+    """
+    caminho_csv = _caminho_legado(nome)
+    if not os.path.exists(caminho_csv):
+        return
+    config = TABELAS[nome]
+    particionada = config.get("particao") or config.get("incremental")
+    if (particionada and _partes(nome)) or (not particionada and os.path.exists(caminho(nome))):
+        return
+    df = _ler_csv_legado(nome, caminho_csv)
+    if particionada:
+        acrescentar(nome, df)
+    else:
+        salvar(nome, df)
+    print(f"🗃️ {os.path.basename(caminho_csv)} convertido para Parquet.")
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# Redução de séries longas antes de irem para o navegador: o gráfico recebe no máximo
+# alguns centos de pontos por série, escolhidos para preservar o formato da curva
+
+
+def lttb(x: np.ndarray, y: np.ndarray, limite: int) -> np.ndarray:
+    """Posições dos pontos escolhidos pelo Largest-Triangle-Three-Buckets.
+
+    Mantém o primeiro e o último ponto; de cada balde intermediário fica o ponto que
+    forma o maior triângulo com o ponto escolhido antes e a média do balde seguinte,
+    o que preserva picos e vales que uma amostragem regular perderia.
+    """
+    n = len(y)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # limite - 2 baldes entre o primeiro e o último ponto
+    bordas = (np.arange(limite - 1) * (n - 2) / (limite - 2)).astype(np.int64) + 1
+    # Média de cada balde (o último "balde seguinte" é só o ponto final), calculada de uma vez
+    inicios = np.append(bordas[:-1], n - 1)
+    tamanhos = np.diff(np.append(inicios, n))
+    medias_x = np.add.reduceat(x, inicios) / tamanhos
+    medias_y = np.add.reduceat(y, inicios) / tamanhos
+    escolhidos = np.empty(limite, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        xa, ya = x[anterior], y[anterior]
+        dx, dy = xa - medias_x[i + 1], medias_y[i + 1] - ya
+        # Dobro da área do triângulo (ponto anterior, candidato, média do balde seguinte)
+        areas = np.abs(dx * (y[inicio:fim] - ya) - dy * (xa - x[inicio:fim]))
+        anterior = inicio + int(areas.argmax())
+        escolhidos[i + 1] = anterior
+    return escolhidos
+
+
+def reduzir(df: pd.DataFrame, pontos: int, coluna: str = None) -> pd.DataFrame:
+    """Linhas de `df` (índice de datas) escolhidas pelo LTTB sobre `coluna` (padrão: a primeira).
+
+    As demais colunas seguem as mesmas linhas, como as médias móveis junto do fechamento.
+    """
+    coluna = coluna or df.columns[0]
+    validas = df[df[coluna].notna()]
+    if len(validas) <= pontos:
+        return validas
+    x = validas.index.asi8 if isinstance(validas.index, pd.DatetimeIndex) else np.arange(len(validas))
+    return validas.iloc[lttb(x, validas[coluna].to_numpy(dtype=float), pontos)]
+
+
+def reduzir_series(largas: pd.DataFrame, pontos: int) -> pd.DataFrame:
+    """Cada coluna reduzida separadamente, em formato longo ('data', 'serie', 'valor') para o Altair."""
+    partes = []
+    for serie in largas.columns:
+        reduzida = reduzir(largas[[serie]], pontos)
+        partes.append(pd.DataFrame({"data": reduzida.index, "serie": serie, "valor": reduzida[serie].to_numpy()}))
+    if not partes:
+        return pd.DataFrame(columns=["data", "serie", "valor"])
+    return pd.concat(partes, ignore_index=True)
+
+
+def retornos_acumulados(fechamentos: pd.DataFrame) -> pd.DataFrame:
+    """Retorno acumulado (%) de cada coluna desde o seu primeiro valor na janela, para comparar ações."""
+    primeiros = fechamentos.bfill().iloc[0]
+    return (fechamentos / primeiros - 1) * 100
@@ -1,7 +1,13 @@
+import os
 import requests
 import pandas as pd
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+import dados
+from instrumentacao import medir
 
 
 # Mapeamento dos indicadores e seus códigos SGS
@@ -12,34 +18,161 @@ indicadores = {
     "DÓLAR": 1,
     "COMMODITIES": 22795,
     "IGP-M": 189
-    
+
 }
 
-def coletar_indicadores_bacen(indicadores: dict, n_ultimos: int = 20) -> pd.DataFrame:
-    todos_dados = []
+# Pode apontar para um espelho ou para o servidor local dos benchmarks
+URL_SGS = os.getenv("BCB_SGS_URL", "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados")
+TABELA_INDICADORES = "indicadores_economicos"
+TIMEOUT = (5, 30)  # (conexão, leitura) em segundos
+MAX_TENTATIVAS = 3
+# Histórico mínimo de cada série: a análise cruzada usa janelas de até 24 meses. Séries guardadas
+# com menos que isso (coletadas antes pelo endpoint "ultimos") têm o início completado.
+# Com 0, a primeira coleta traz só as últimas observações (limite de 20 do endpoint "ultimos")
+ANOS_HISTORICO_INICIAL = int(os.getenv("INDICADORES_ANOS_HISTORICO_INICIAL", "2"))
+# Distância tolerada entre o início pedido e a primeira observação (séries trimestrais, como o PIB)
+FOLGA_HISTORICO = timedelta(days=93)
+
+
+def criar_sessao(tamanho_pool: int) -> requests.Session:
+    """Sessão com conexões reaproveitadas e novas tentativas limitadas para erros transitórios."""
+    retry = Retry(
+        total=MAX_TENTATIVAS,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool, max_retries=retry)
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    return sessao
+
+
+def ultimas_datas(df_existente: pd.DataFrame) -> dict:
+    """Data da última observação guardada de cada indicador."""
+    if df_existente is None or df_existente.empty:
+        return {}
+    return df_existente.groupby("indicador", observed=True)["data"].max().dropna().to_dict()
+
+
+def primeiras_datas(df_existente: pd.DataFrame) -> dict:
+    """Data da primeira observação guardada de cada indicador."""
+    if df_existente is None or df_existente.empty:
+        return {}
+    return df_existente.groupby("indicador", observed=True)["data"].min().dropna().to_dict()
+
+
+def inicio_historico(hoje):
+    return hoje - timedelta(days=365 * ANOS_HISTORICO_INICIAL)
+
+
+def buscar_serie(sessao: requests.Session, nome: str, codigo: int, ultima_data=None, n_ultimos: int = 20):
+    """Busca uma série SGS: só o intervalo após `ultima_data` ou, sem histórico, os últimos
+    `ANOS_HISTORICO_INICIAL` anos (ou as últimas `n_ultimos` observações)."""
+    url = URL_SGS.format(codigo=codigo)
+    params = {"formato": "json"}
+    hoje = datetime.now().date()
+    if ultima_data is None and ANOS_HISTORICO_INICIAL > 0:
+        params["dataInicial"] = inicio_historico(hoje).strftime("%d/%m/%Y")
+        params["dataFinal"] = hoje.strftime("%d/%m/%Y")
+    elif ultima_data is None:
+        url += f"/ultimos/{n_ultimos}"
+    else:
+        inicio = ultima_data.date() + timedelta(days=1)
+        if inicio > hoje:
+            return None  # Já temos a observação mais recente possível
+        params["dataInicial"] = inicio.strftime("%d/%m/%Y")
+        params["dataFinal"] = hoje.strftime("%d/%m/%Y")
+    return _requisitar(sessao, nome, codigo, url, params, intervalo=ultima_data is not None)
+
+
+def buscar_historico_anterior(sessao: requests.Session, nome: str, codigo: int, primeira_data):
+    """Completa o início de uma série guardada com menos de `ANOS_HISTORICO_INICIAL` anos:
+    busca de `inicio_historico` até a véspera da primeira observação guardada."""
+    hoje = datetime.now().date()
+    inicio = inicio_historico(hoje)
+    if ANOS_HISTORICO_INICIAL <= 0 or primeira_data is None or primeira_data.date() <= inicio + FOLGA_HISTORICO:
+        return None
+    params = {"formato": "json", "dataInicial": inicio.strftime("%d/%m/%Y"),
+              "dataFinal": (primeira_data.date() - timedelta(days=1)).strftime("%d/%m/%Y")}
+    return _requisitar(sessao, nome, codigo, URL_SGS.format(codigo=codigo), params, intervalo=True)
+
+
+def _requisitar(sessao: requests.Session, nome: str, codigo: int, url: str, params: dict, intervalo: bool):
+    try:
+        with medir("http.bcb", serie=nome) as trecho:
+            response = sessao.get(url, params=params, timeout=TIMEOUT)
+            # Novas tentativas feitas pelo urllib3 (Retry da sessão) antes desta resposta
+            historico = getattr(getattr(response.raw, "retries", None), "history", ()) or ()
+            trecho.update(status=response.status_code, bytes=len(response.content), tentativas=len(historico) + 1,
+                          falhou=response.status_code not in (200, 404))
+    except requests.RequestException as e:
+        print(f"❌ Erro ao buscar {nome} (código {codigo}): {e}")
+        return None
+
+    # O SGS responde 404 quando não há observações no intervalo pedido
+    if response.status_code == 404 and intervalo:
+        return None
+    if response.status_code != 200:
+        print(f"❌ Erro ao buscar {nome} (código {codigo}). Status: {response.status_code}")
+        return None
+
+    observacoes = response.json()
+    if not observacoes:
+        return None
+    with medir("parse.bcb", serie=nome):
+        df = pd.DataFrame(observacoes)
+        # O SGS devolve datas dd/mm/aaaa; são convertidas já na entrada
+        df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y", errors="coerce")
+        df["valor"] = df["valor"].astype(str).str.replace(",", ".").astype(float)
+    df["indicador"] = nome
+    df["data_coleta"] = pd.Timestamp(datetime.now().date())
+    return df
+
+
+def coletar_indicadores_bacen(indicadores: dict, n_ultimos: int = 20, df_existente: pd.DataFrame = None) -> pd.DataFrame:
+    """Busca todas as séries ao mesmo tempo e mescla o que for novo ao conjunto existente."""
+    datas = ultimas_datas(df_existente)
+    primeiras = primeiras_datas(df_existente)
+
+    with criar_sessao(len(indicadores)) as sessao, ThreadPoolExecutor(max_workers=len(indicadores)) as executor:
+        futuros = [
+            executor.submit(buscar_serie, sessao, nome, codigo, datas.get(nome), n_ultimos)
+            for nome, codigo in indicadores.items()
+        ] + [
+            executor.submit(buscar_historico_anterior, sessao, nome, codigo, primeiras[nome])
+            for nome, codigo in indicadores.items() if nome in primeiras
+        ]
+        todos_dados = [futuro.result() for futuro in futuros]
+
+    novos = [df for df in todos_dados if df is not None]
+    series_com_novidade = {df["indicador"].iloc[0] for df in novos}
+    print(f"ℹ️ {sum(len(df) for df in novos)} observações novas em {len(series_com_novidade)} de {len(indicadores)} séries.")
+
+    partes = ([df_existente] if df_existente is not None and not df_existente.empty else []) + novos
+    if not partes:
+        return dados.vazia(TABELA_INDICADORES)
 
-    for nome, codigo in indicadores.items():
-        url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados/ultimos/{n_ultimos}?formato=json"
-        response = requests.get(url)
+    df_final = pd.concat(partes, ignore_index=True)
+    df_final = df_final.drop_duplicates(subset=["indicador", "data"], keep="last")
+    df_final = df_final.sort_values(["indicador", "data"], kind="stable").reset_index(drop=True)
+    return dados.tipar(TABELA_INDICADORES, df_final)
 
-        if response.status_code == 200:
-            dados = response.json()
-            df = pd.DataFrame(dados)
-            df["valor"] = df["valor"].str.replace(",", ".").astype(float)
-            df["indicador"] = nome
-            df["data_coleta"] = datetime.now().date()
-            todos_dados.append(df)
-        else:
-            print(f"❌ Erro ao buscar {nome} (código {codigo}). Status: {response.status_code}")
 
-    df_final = pd.concat(todos_dados, ignore_index=True)
-    df_final.rename(columns={"data": "data", "valor": "valor"}, inplace=True)
-    return df_final
+def carregar_existente():
+    if not dados.existe(TABELA_INDICADORES):
+        return None
+    return dados.ler(TABELA_INDICADORES)
 
 
+def main():
+    dados.migrar_legado(TABELA_INDICADORES)
+    # Coletar (apenas o que falta) e salvar
+    df_indicadores = coletar_indicadores_bacen(indicadores, df_existente=carregar_existente())
+    dados.salvar(TABELA_INDICADORES, df_indicadores)
+    print("✅ Tabela 'indicadores_economicos' salva com sucesso.")
 
 
-# Coletar e salvar
-df_indicadores = coletar_indicadores_bacen(indicadores)
-df_indicadores.to_csv("data/indicadores_economicos.csv", index=False, encoding="utf-8-sig")
-print("✅ Arquivo 'indicadores_economicos.csv' salvo com sucesso.")
+if __name__ == "__main__":
+    main()
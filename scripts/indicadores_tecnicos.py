@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+import armazem_precos
+import dados
+
+# Indicadores técnicos materializados na tabela "indicadores_tecnicos", lidos pelo dashboard e pelos agentes
+TABELA_INDICADORES_TECNICOS = "indicadores_tecnicos"
+COLUNAS_TECNICAS = [
+    "fechamento", "retorno", "sma_20", "sma_50", "ema_12", "ema_26", "macd", "macd_sinal",
+    "macd_hist", "rsi_14", "volatilidade_20", "volume_z_20",
+]
+# Pregões anteriores recalculados junto com as barras novas: cobre a maior janela (50)
+# e deixa o peso residual das médias exponenciais desprezível (< 1e-8)
+JANELA_AQUECIMENTO = 250
+PREGOES_POR_ANO = 252
+
+
+def _por_ticker(serie: pd.Series, chaves: pd.Series):
+    return serie.groupby(chaves, sort=False, observed=True)
+
+
+def _janela(resultado: pd.Series) -> pd.Series:
+    """groupby().rolling/ewm devolvem (ticker, índice original); volta ao índice original."""
+    return resultado.droplevel(0)
+
+
+def calcular_indicadores(historico: pd.DataFrame) -> pd.DataFrame:
+    """Calcula os indicadores de todos os tickers de uma vez, com janelas agrupadas.
+
+    `historico` tem índice de datas e as colunas OHLCV mais 'ticker'. Retorna um
+    DataFrame com as colunas 'data', 'ticker' e `COLUNAS_TECNICAS`.
+    """
+    df = historico.rename_axis("data").reset_index().sort_values(["ticker", "data"], kind="stable")
+    df = df.reset_index(drop=True)
+    ticker = df["ticker"]
+    fechamento = df["fechamento"].astype(float)
+    volume = df["volume"].astype(float)
+
+    df["retorno"] = _por_ticker(fechamento, ticker).pct_change()
+    df["sma_20"] = _janela(_por_ticker(fechamento, ticker).rolling(20).mean())
+    df["sma_50"] = _janela(_por_ticker(fechamento, ticker).rolling(50).mean())
+    df["ema_12"] = _janela(_por_ticker(fechamento, ticker).ewm(span=12, adjust=False).mean())
+    df["ema_26"] = _janela(_por_ticker(fechamento, ticker).ewm(span=26, adjust=False).mean())
+    df["macd"] = df["ema_12"] - df["ema_26"]
+    df["macd_sinal"] = _janela(_por_ticker(df["macd"], ticker).ewm(span=9, adjust=False).mean())
+    df["macd_hist"] = df["macd"] - df["macd_sinal"]
+
+    # RSI de Wilder: médias exponenciais (alpha = 1/14) de ganhos e perdas
+    variacao = _por_ticker(fechamento, ticker).diff()
+    ganhos = _janela(_por_ticker(variacao.clip(lower=0), ticker).ewm(alpha=1 / 14, adjust=False).mean())
+    perdas = _janela(_por_ticker(-variacao.clip(upper=0), ticker).ewm(alpha=1 / 14, adjust=False).mean())
+    df["rsi_14"] = 100 - 100 / (1 + ganhos / perdas.replace(0, np.nan))
+    df.loc[perdas.eq(0) & ganhos.gt(0), "rsi_14"] = 100.0
+
+    log_retorno = np.log(fechamento).groupby(ticker, sort=False, observed=True).diff()
+    df["volatilidade_20"] = _janela(_por_ticker(log_retorno, ticker).rolling(20).std()) * np.sqrt(PREGOES_POR_ANO)
+
+    media_volume = _janela(_por_ticker(volume, ticker).rolling(20).mean())
+    desvio_volume = _janela(_por_ticker(volume, ticker).rolling(20).std())
+    df["volume_z_20"] = (volume - media_volume) / desvio_volume.replace(0, np.nan)
+
+    return df[["data", "ticker"] + COLUNAS_TECNICAS]
+
+
+def carregar_indicadores(tickers: list = None, colunas: list = None) -> pd.DataFrame:
+    filtros = [("ticker", "in", list(tickers))] if tickers else None
+    if colunas is not None:
+        colunas = ["data", "ticker"] + [c for c in colunas if c not in ("data", "ticker")]
+    return dados.ler(TABELA_INDICADORES_TECNICOS, colunas=colunas, filtros=filtros)
+
+
+def atualizar_indicadores(historico: pd.DataFrame, existentes: pd.DataFrame) -> pd.DataFrame:
+    """Calcula só as barras que ainda não têm indicadores, mais a janela de aquecimento anterior.
+
+    Retorna apenas as linhas novas (para serem acrescentadas ao arquivo materializado).
+    """
+    df = historico.rename_axis("data").reset_index().sort_values(["ticker", "data"], kind="stable")
+    df = df.reset_index(drop=True)
+    calculadas = existentes.groupby("ticker", observed=True)["data"].agg(["min", "max"])
+    # Tickers como texto dos dois lados: as categorias do histórico e dos indicadores podem diferir
+    limites = calculadas.rename(index=str).reindex(df["ticker"].astype(str))
+    primeira = pd.Series(limites["min"].to_numpy(), index=df.index)
+    ultima = pd.Series(limites["max"].to_numpy(), index=df.index)
+    # Barras anteriores à primeira calculada vêm de um backfill do histórico completo
+    nova = ultima.isna() | (df["data"] > ultima) | (df["data"] < primeira)
+
+    # Posição da primeira barra nova de cada ticker; recua JANELA_AQUECIMENTO pregões a partir dela
+    posicao = df.groupby("ticker", sort=False, observed=True).cumcount()
+    primeira_nova = posicao.where(nova).groupby(df["ticker"], sort=False, observed=True).transform("min")
+    recorte = df[posicao >= primeira_nova - JANELA_AQUECIMENTO]
+    if recorte.empty:
+        return pd.DataFrame(columns=["data", "ticker"] + COLUNAS_TECNICAS)
+
+    # calcular_indicadores preserva a ordem (ticker, data) do recorte
+    calculados = calcular_indicadores(recorte.set_index("data"))
+    return calculados[nova.loc[recorte.index].to_numpy()]
+
+
+def main():
+    historico = armazem_precos.ler_historico()
+    if historico.empty:
+        print("ℹ️ Sem histórico de preços para calcular indicadores técnicos.")
+        return
+    # Só a última data calculada de cada ticker importa aqui: não lê as colunas dos indicadores
+    existentes = carregar_indicadores(colunas=[])
+    novos = atualizar_indicadores(historico, existentes)
+    if novos.empty:
+        print("ℹ️ Indicadores técnicos já estão atualizados.")
+        return
+    dados.acrescentar(TABELA_INDICADORES_TECNICOS, novos)
+    print(f"✅ Indicadores técnicos calculados para {len(novos)} pregões novos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import hashlib
+import re
+import unicodedata
+import zlib
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+import pandas as pd
+
+import dados
+
+# Índice persistente de notícias já vistas, chaveado pelo hash da URL normalizada
+TABELA_INDICE_NOTICIAS = "noticias_indice"
+COLUNAS_INDICE = ["hash_url", "titulo", "link", "fonte", "primeira_vez", "duplicata"]
+
+# Links de navegação ("Economia", "Mercado", "Cotações") não são notícias
+MIN_PALAVRAS_TITULO = 4
+
+# MinHash + LSH: 64 permutações em 16 faixas de 4 linhas (candidatos a partir de ~50% de semelhança)
+NUM_PERMUTACOES = 64
+NUM_FAIXAS = 16
+TAMANHO_SHINGLE = 5
+LIMIAR_SIMILARIDADE = 0.6
+# Notícias replicadas entre portais aparecem com poucos dias de diferença
+JANELA_DEDUPLICACAO_DIAS = 7
+
+_PRIMO = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(20240501)
+_COEF_A = _rng.integers(1, 1 << 31, NUM_PERMUTACOES, dtype=np.uint64)
+_COEF_B = _rng.integers(0, 1 << 31, NUM_PERMUTACOES, dtype=np.uint64)
+
+_PARAMETROS_RASTREIO = re.compile(r"^(utm_|fbclid$|gclid$|ref$|origem$)")
+
+
+def normalizar_url(url: str) -> str:
+    """Forma canônica da URL: sem www, fragmento, barra final e parâmetros de rastreio."""
+    partes = urlsplit(url.strip())
+    host = partes.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    consulta = urlencode(sorted(
+        (chave, valor) for chave, valor in parse_qsl(partes.query)
+        if not _PARAMETROS_RASTREIO.match(chave.lower())
+    ))
+    caminho = partes.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, caminho, consulta, ""))
+
+
+def hash_url(url: str) -> str:
+    return hashlib.sha1(normalizar_url(url).encode("utf-8")).hexdigest()[:16]
+
+
+def normalizar_titulo(titulo: str) -> str:
+    sem_acentos = unicodedata.normalize("NFKD", titulo.lower()).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.findall(r"[a-z0-9]+", sem_acentos))
+
+
+def assinatura_minhash(titulo: str) -> np.ndarray:
+    """Assinatura MinHash dos shingles de caracteres do título normalizado."""
+    texto = normalizar_titulo(titulo)
+    shingles = {texto[i:i + TAMANHO_SHINGLE] for i in range(max(1, len(texto) - TAMANHO_SHINGLE + 1))}
+    valores = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # Todas as permutações de uma vez: (a*x + b) mod p, mínimo por permutação
+    return ((_COEF_A[:, None] * valores[None, :] + _COEF_B[:, None]) % _PRIMO).min(axis=1)
+
+
+def _faixas(assinatura: np.ndarray):
+    linhas = NUM_PERMUTACOES // NUM_FAIXAS
+    for faixa in range(NUM_FAIXAS):
+        yield faixa, assinatura[faixa * linhas:(faixa + 1) * linhas].tobytes()
+
+
+class IndiceNoticias:
+    """Histórico de notícias com deduplicação por URL e por título quase idêntico (MinHash/LSH)."""
+
+    def __init__(self, tabela: str = TABELA_INDICE_NOTICIAS):
+        self.tabela = tabela
+        # O índice é gravado por acréscimo: o CSV antigo precisa virar a primeira parte antes
+        dados.migrar_legado(tabela)
+        # Do histórico inteiro só os hashes são necessários; títulos apenas da janela recente
+        self.hashes = set(dados.ler(tabela, colunas=["hash_url"])["hash_url"])
+        self._novas = []
+
+        # Só as notícias recentes entram no índice LSH de quase-duplicatas
+        self._assinaturas = []
+        self._baldes = {}
+        limite = pd.Timestamp(datetime.now() - timedelta(days=JANELA_DEDUPLICACAO_DIAS))
+        recentes = dados.ler(tabela, colunas=["titulo"],
+                             filtros=[("primeira_vez", ">=", limite), ("duplicata", "==", False)])
+        for titulo in recentes["titulo"]:
+            self._indexar(assinatura_minhash(titulo))
+
+    def _indexar(self, assinatura: np.ndarray):
+        posicao = len(self._assinaturas)
+        self._assinaturas.append(assinatura)
+        for chave in _faixas(assinatura):
+            self._baldes.setdefault(chave, []).append(posicao)
+
+    def _quase_duplicada(self, assinatura: np.ndarray) -> bool:
+        candidatos = {p for chave in _faixas(assinatura) for p in self._baldes.get(chave, ())}
+        return any(
+            np.mean(self._assinaturas[p] == assinatura) >= LIMIAR_SIMILARIDADE
+            for p in candidatos
+        )
+
+    def registrar(self, noticias: list) -> list:
+        """Registra as notícias coletadas e retorna apenas as que ainda não tinham sido vistas."""
+        agora = pd.Timestamp(datetime.now()).floor("s")
+        novas = []
+        for noticia in noticias:
+            titulo = noticia.get("titulo", "").strip()
+            if len(titulo.split()) < MIN_PALAVRAS_TITULO:
+                continue
+            chave = hash_url(noticia["link"])
+            if chave in self.hashes:
+                continue
+            self.hashes.add(chave)
+            assinatura = assinatura_minhash(titulo)
+            duplicata = self._quase_duplicada(assinatura)
+            registro = {
+                "hash_url": chave,
+                "titulo": titulo,
+                "link": noticia["link"],
+                "fonte": noticia.get("fonte", ""),
+                "primeira_vez": agora,
+                "duplicata": duplicata,
+            }
+            # Quase-duplicadas também são gravadas, para que a URL não seja reavaliada depois
+            self._novas.append(registro)
+            if not duplicata:
+                self._indexar(assinatura)
+                novas.append(registro)
+        return novas
+
+    def salvar(self):
+        if not self._novas:
+            return
+        dados.acrescentar(self.tabela, pd.DataFrame(self._novas, columns=COLUNAS_INDICE))
+        self._novas = []
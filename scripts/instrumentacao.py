@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import dados
+
+# Um registro JSON por linha para cada trecho medido (HTTP, parsing, chamadas ao LLM, etapas, reruns)
+ARQUIVO_METRICAS = dados.caminho_arquivo("metricas.jsonl")
+METRICAS_ATIVAS = os.getenv("METRICAS_ATIVAS", "1") != "0"
+# Acima deste tamanho o arquivo vira metricas.jsonl.1 e um novo é iniciado
+TAMANHO_MAXIMO_BYTES = int(float(os.getenv("METRICAS_TAMANHO_MAXIMO_MB", "20")) * 1024 * 1024)
+
+# Identifica as medições feitas por este processo (uma execução do pipeline, do agendador ou do dashboard)
+ID_EXECUCAO = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+
+_trava = threading.Lock()
+
+
+def _gravar(registro: dict, caminho: str = ARQUIVO_METRICAS):
+    linha = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+    with _trava:
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        try:
+            if os.path.getsize(caminho) > TAMANHO_MAXIMO_BYTES:
+                os.replace(caminho, caminho + ".1")
+        except FileNotFoundError:
+            pass
+        # Modo append com uma única escrita por linha: processos diferentes não intercalam registros
+        with open(caminho, "a", encoding="utf-8") as f:
+            f.write(linha)
+
+
+def registrar(estagio: str, duracao_ms: float, ok: bool = True, **atributos):
+    """Grava uma medição já feita. Atributos usuais: bytes, status, tentativas, tokens_prompt, tokens_resposta."""
+    if not METRICAS_ATIVAS:
+        return
+    registro = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "execucao": ID_EXECUCAO,
+        "estagio": estagio,
+        "duracao_ms": round(duracao_ms, 2),
+        "ok": ok,
+    }
+    registro.update({chave: valor for chave, valor in atributos.items() if valor is not None})
+    try:
+        _gravar(registro)
+    except OSError as e:
+        # Métrica perdida não pode derrubar uma coleta
+        print(f"⚠️ Falha ao gravar métrica de '{estagio}': {e}")
+
+
+@contextmanager
+def medir(estagio: str, **atributos):
+    """Mede o bloco e grava a duração; o bloco pode preencher atributos no dict recebido.
+
+        with medir("http.bcb", serie="IPCA") as trecho:
+            resposta = sessao.get(url)
+            trecho["status"] = resposta.status_code
+
+    `trecho["falhou"] = True` marca o trecho como erro sem que haja exceção (ex.: HTTP 503).
+    """
+    trecho = dict(atributos)
+    inicio = time.perf_counter()
+    ok = True
+    try:
+        yield trecho
+    except BaseException as e:
+        ok = False
+        trecho["erro"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        registrar(estagio, (time.perf_counter() - inicio) * 1000, ok=ok and not trecho.pop("falhou", False), **trecho)
+
+
+def ler_metricas(janela: timedelta = timedelta(hours=24), caminho: str = ARQUIVO_METRICAS) -> pd.DataFrame:
+    """Medições dentro da janela (arquivo atual e o rotacionado), como DataFrame."""
+    limite = (datetime.now() - janela).isoformat(timespec="milliseconds")
+    registros = []
+    for arquivo in (caminho + ".1", caminho):
+        if not os.path.exists(arquivo):
+            continue
+        with open(arquivo, "r", encoding="utf-8") as f:
+            for linha in f:
+                # "ts" é o primeiro campo em formato ISO: compara o texto antes de decodificar a linha
+                if linha[8:31] < limite:
+                    continue
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    continue  # Linha cortada por uma escrita interrompida
+    if not registros:
+        return pd.DataFrame(columns=["ts", "execucao", "estagio", "duracao_ms", "ok"])
+    df = pd.DataFrame(registros)
+    df["ts"] = pd.to_datetime(df["ts"])
+    return df
+
+
+def resumir_por_estagio(metricas: pd.DataFrame) -> pd.DataFrame:
+    """p50/p95 de duração, contagem, erros, totais de bytes/tokens e o máximo de tentativas por estágio."""
+    if metricas.empty:
+        return pd.DataFrame(columns=["estagio", "medicoes", "erros", "p50_ms", "p95_ms"])
+    grupos = metricas.groupby("estagio", sort=True)
+    resumo = pd.DataFrame({
+        "medicoes": grupos.size(),
+        "erros": grupos["ok"].apply(lambda s: int((~s.astype(bool)).sum())),
+        "p50_ms": grupos["duracao_ms"].quantile(0.5),
+        "p95_ms": grupos["duracao_ms"].quantile(0.95),
+        "execucoes": grupos["execucao"].nunique(),
+    })
+    for coluna in ("bytes", "tokens_prompt", "tokens_resposta"):
+        if coluna in metricas.columns:
+            resumo[coluna] = grupos[coluna].sum(min_count=1)
+    if "tentativas" in metricas.columns:
+        resumo["tentativas_max"] = grupos["tentativas"].max()
+    return resumo.sort_values("p95_ms", ascending=False).reset_index()
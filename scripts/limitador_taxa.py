@@ -0,0 +1,211 @@
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+# Trava entre processos (coleta em shards); sem fcntl (Windows), vale só dentro do processo
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Teto de fichas reservadas de uma vez por processo no modo compartilhado
+LOTE_MAXIMO = 50
+
+
+class LimitadorTaxa:
+    """Balde de fichas (token bucket) configurado pelos limites publicados do provedor.
+
+    - Libera chamadas tão rápido quanto o orçamento por minuto permite.
+    - Recua exponencialmente, com jitter, quando o provedor sinaliza limite (503, "Note", "Information").
+    - Guarda o consumo diário em disco para que o orçamento valha entre execuções.
+    - Com `compartilhado=True`, o balde inteiro vive no arquivo de estado, sob trava:
+      vários processos consomem do mesmo orçamento por minuto e por dia. Cada processo
+      reserva as fichas em lotes (um décimo da capacidade por minuto, até `LOTE_MAXIMO`),
+      e só passa pela trava e pelo arquivo quando o lote acaba; `liberar_reservas`
+      devolve ao orçamento o que sobrou.
+    """
+
+    def __init__(self, chamadas_por_minuto: int, chamadas_por_dia: int, arquivo_estado: str = None,
+                 espera_base: float = 2.0, espera_maxima: float = 120.0, compartilhado: bool = False,
+                 lote: int = None):
+        self.capacidade = max(1, chamadas_por_minuto)
+        self.reposicao_por_segundo = self.capacidade / 60.0
+        self.chamadas_por_dia = chamadas_por_dia
+        self.arquivo_estado = arquivo_estado
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.compartilhado = compartilhado and bool(arquivo_estado)
+        # Com o plano gratuito (5/minuto) o lote é 1: cada chamada passa pelo estado compartilhado
+        self.lote = max(1, lote or min(LOTE_MAXIMO, self.capacidade // 10)) if self.compartilhado else 1
+
+        self._lock = threading.Lock()
+        # Relógio de parede (não monotônico): os instantes são comparados entre processos
+        self._fichas = float(self.capacidade)
+        self._ultima_reposicao = time.time()
+        self._bloqueado_ate = 0.0
+        self._falhas_consecutivas = 0
+        self._dia, self._chamadas_hoje = date.today().isoformat(), 0
+        # Fichas já descontadas do orçamento compartilhado e ainda não usadas por este processo
+        self._reservadas = 0
+        self._devolver_na_saida = False
+        self._carregar_estado()
+
+    # --- Estado persistido (orçamento diário e, se compartilhado, o balde) ---
+    def _carregar_estado(self):
+        hoje = date.today().isoformat()
+        self._dia, self._chamadas_hoje = hoje, 0
+        if not (self.arquivo_estado and os.path.exists(self.arquivo_estado)):
+            return
+        try:
+            with open(self.arquivo_estado, "r", encoding="utf-8") as f:
+                estado = json.load(f)
+        except (ValueError, OSError):
+            return  # Estado corrompido: recomeça a contagem do dia
+        if estado.get("dia") == hoje:
+            self._chamadas_hoje = int(estado.get("chamadas", 0))
+        if self.compartilhado and "fichas" in estado:
+            self._fichas = float(estado["fichas"])
+            self._ultima_reposicao = float(estado["ultima_reposicao"])
+            self._bloqueado_ate = float(estado.get("bloqueado_ate", 0.0))
+            self._falhas_consecutivas = int(estado.get("falhas_consecutivas", 0))
+
+    def _salvar_estado(self):
+        if not self.arquivo_estado:
+            return
+        os.makedirs(os.path.dirname(self.arquivo_estado) or ".", exist_ok=True)
+        estado = {"dia": self._dia, "chamadas": self._chamadas_hoje}
+        if self.compartilhado:
+            estado.update(fichas=self._fichas, ultima_reposicao=self._ultima_reposicao,
+                          bloqueado_ate=self._bloqueado_ate, falhas_consecutivas=self._falhas_consecutivas)
+        # Temporário + rename: coletas simultâneas nunca leem o estado pela metade
+        temporario = f"{self.arquivo_estado}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+        os.replace(temporario, self.arquivo_estado)
+
+    @contextmanager
+    def _sincronizado(self):
+        """Seção crítica: na versão compartilhada, relê o estado do arquivo sob trava entre processos."""
+        with self._lock:
+            if not self.compartilhado or fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(self.arquivo_estado) or ".", exist_ok=True)
+            with open(self.arquivo_estado + ".lock", "a") as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                try:
+                    self._carregar_estado()
+                    yield
+                finally:
+                    fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _virar_dia(self):
+        hoje = date.today().isoformat()
+        if hoje != self._dia:
+            self._dia, self._chamadas_hoje = hoje, 0
+            self._reservadas = 0
+
+    def cota_restante(self) -> int:
+        with self._lock:
+            # Com reservas em mãos, vale o estado da última leitura, sem passar pelo arquivo
+            if self._reservadas:
+                return self._reservadas + max(0, self.chamadas_por_dia - self._chamadas_hoje)
+        with self._sincronizado():
+            self._virar_dia()
+            return max(0, self.chamadas_por_dia - self._chamadas_hoje)
+
+    def esgotar_cota_diaria(self):
+        """Chamado quando o provedor avisa que o limite diário já foi atingido."""
+        with self._sincronizado():
+            self._chamadas_hoje = max(self._chamadas_hoje, self.chamadas_por_dia)
+            self._reservadas = 0
+            self._salvar_estado()
+
+    def liberar_reservas(self):
+        """Devolve ao orçamento compartilhado as fichas reservadas e não usadas."""
+        with self._sincronizado():
+            if not self._reservadas:
+                return
+            self._repor_fichas(time.time())
+            self._fichas = min(self.capacidade, self._fichas + self._reservadas)
+            self._chamadas_hoje = max(0, self._chamadas_hoje - self._reservadas)
+            self._reservadas = 0
+            self._salvar_estado()
+
+    # --- Balde de fichas ---
+    def _repor_fichas(self, agora: float):
+        decorrido = max(0.0, agora - self._ultima_reposicao)
+        self._fichas = min(self.capacidade, self._fichas + decorrido * self.reposicao_por_segundo)
+        self._ultima_reposicao = agora
+
+    def aguardar(self) -> bool:
+        """Bloqueia até haver uma ficha disponível e a consome.
+
+        Retorna False (sem bloquear) se a cota diária estiver esgotada.
+        """
+        with self._lock:
+            if self._reservadas and time.time() >= self._bloqueado_ate and self._dia == date.today().isoformat():
+                self._reservadas -= 1
+                return True
+        while True:
+            with self._sincronizado():
+                self._virar_dia()
+                restantes_hoje = self.chamadas_por_dia - self._chamadas_hoje
+                if restantes_hoje <= 0 and not self._reservadas:
+                    return False
+                agora = time.time()
+                self._repor_fichas(agora)
+                if agora >= self._bloqueado_ate and self._reservadas:
+                    self._reservadas -= 1
+                    return True
+                if agora >= self._bloqueado_ate and self._fichas >= 1:
+                    reservadas = int(min(self.lote, self._fichas, restantes_hoje))
+                    self._fichas -= reservadas
+                    self._chamadas_hoje += reservadas
+                    self._salvar_estado()
+                    self._reservadas = reservadas - 1
+                    if self._reservadas and not self._devolver_na_saida:
+                        # Rede de segurança para quem não chama liberar_reservas (processos
+                        # filhos do multiprocessing não rodam atexit: os shards liberam explicitamente)
+                        atexit.register(self.liberar_reservas)
+                        self._devolver_na_saida = True
+                    return True
+                falta_ficha = (1 - self._fichas) / self.reposicao_por_segundo if self._fichas < 1 else 0.0
+                espera = max(self._bloqueado_ate - agora, falta_ficha)
+            time.sleep(espera)
+
+    def registrar_sucesso(self):
+        # Sem falhas na última leitura do estado: nada a zerar, e a trava é poupada
+        if not self._falhas_consecutivas:
+            return
+        with self._sincronizado():
+            if self._falhas_consecutivas:
+                self._falhas_consecutivas = 0
+                if self.compartilhado:
+                    self._salvar_estado()
+
+    def registrar_limite(self) -> float:
+        """Aplica recuo exponencial com jitter após um sinal de limite do provedor.
+
+        Retorna quantos segundos as próximas chamadas ficarão bloqueadas.
+        """
+        with self._sincronizado():
+            self._falhas_consecutivas += 1
+            espera = min(self.espera_maxima, self.espera_base * 2 ** (self._falhas_consecutivas - 1))
+            espera *= random.uniform(0.5, 1.5)
+            agora = time.time()
+            self._bloqueado_ate = max(self._bloqueado_ate, agora + espera)
+            # O provedor já considera o minuto estourado: esvazia o balde
+            self._repor_fichas(agora)
+            self._fichas = 0.0
+            # As reservas deste processo não viram chamadas: voltam para a cota do dia
+            self._chamadas_hoje = max(0, self._chamadas_hoje - self._reservadas)
+            self._reservadas = 0
+            if self.compartilhado:
+                self._salvar_estado()
+            return espera
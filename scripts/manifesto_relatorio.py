@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import dados
+
+# Saída de cada etapa do relatório dos agentes, com a impressão digital das entradas que a geraram.
+# Uma etapa cujas entradas (prompt, dados e modelo) não mudaram é reaproveitada sem chamar o LLM.
+ARQUIVO_MANIFESTO = dados.caminho_arquivo("relatorio_manifesto.json")
+DIRETORIO_ETAPAS = dados.caminho_arquivo("relatorio_etapas")
+# Idade máxima de uma saída reaproveitada (as buscas na web envelhecem); 0 = sem limite
+VALIDADE_HORAS = float(os.getenv("RELATORIO_VALIDADE_HORAS", "0"))
+
+
+def impressao(*partes) -> str:
+    """sha256 do conteúdo que determina a saída de uma etapa."""
+    conteudo = json.dumps(partes, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def _nome_arquivo(etapa: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in etapa) + ".md"
+
+
+class ManifestoRelatorio:
+    """Registro das etapas já geradas: {etapa: {impressao, arquivo, gerado_em}}."""
+
+    def __init__(self, caminho: str = ARQUIVO_MANIFESTO, diretorio_etapas: str = DIRETORIO_ETAPAS,
+                 validade_horas: float = VALIDADE_HORAS, registro=None):
+        self.caminho = caminho
+        # RegistroExecucao opcional: tempo, chamadas e tokens de cada etapa desta execução
+        self.registro = registro
+        self.diretorio_etapas = diretorio_etapas
+        self.validade_horas = validade_horas
+        self._trava = threading.Lock()
+        self.etapas = {}
+        if os.path.exists(caminho):
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    self.etapas = json.load(f).get("etapas", {})
+            except (ValueError, OSError):
+                self.etapas = {}
+        self.reaproveitadas = []
+        self.geradas = []
+
+    def reaproveitar(self, etapa: str, impressao_atual: str):
+        """Texto salvo da etapa, se foi gerado com as mesmas entradas (e ainda está na validade)."""
+        registro = self.etapas.get(etapa)
+        if not registro or registro.get("impressao") != impressao_atual:
+            return None
+        if self.validade_horas and datetime.fromisoformat(registro["gerado_em"]) < datetime.now() - timedelta(hours=self.validade_horas):
+            return None
+        caminho = os.path.join(self.diretorio_etapas, registro["arquivo"])
+        if not os.path.exists(caminho):
+            return None
+        with open(caminho, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def registrar(self, etapa: str, impressao_atual: str, texto: str):
+        """Grava a saída da etapa e o manifesto na hora: o que já foi pago não se perde se a etapa seguinte falhar."""
+        arquivo = _nome_arquivo(etapa)
+
+        def escrever_texto(temporario):
+            with open(temporario, "w", encoding="utf-8") as f:
+                f.write(texto)
+
+        dados.escrever_atomico(os.path.join(self.diretorio_etapas, arquivo), escrever_texto)
+        with self._trava:
+            self.etapas[etapa] = {
+                "impressao": impressao_atual,
+                "arquivo": arquivo,
+                "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            }
+            conteudo = json.dumps({"etapas": self.etapas}, ensure_ascii=False, indent=2, sort_keys=True)
+
+            def escrever_manifesto(temporario):
+                with open(temporario, "w", encoding="utf-8") as f:
+                    f.write(conteudo)
+
+            dados.escrever_atomico(self.caminho, escrever_manifesto)
+
+    def executar_ou_reaproveitar(self, etapa: str, impressao_atual: str, executar) -> str:
+        """Reaproveita a saída da etapa quando as entradas não mudaram; senão executa e registra."""
+        texto = self.reaproveitar(etapa, impressao_atual)
+        if texto is not None:
+            print(f"♻️ Etapa '{etapa}' reaproveitada: entradas iguais às da última execução.")
+            with self._trava:
+                self.reaproveitadas.append(etapa)
+            if self.registro is not None:
+                self.registro.reaproveitada(etapa, texto)
+            return texto
+        if self.registro is None:
+            texto = executar()
+        else:
+            with self.registro.etapa(etapa) as medicao:
+                texto = executar()
+                medicao["saida"] = texto
+        self.registrar(etapa, impressao_atual, texto)
+        with self._trava:
+            self.geradas.append(etapa)
+        return texto
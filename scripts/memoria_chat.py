@@ -0,0 +1,86 @@
+import os
+
+from contexto import estimar_tokens
+
+# Turnos recentes enviados na íntegra; os mais antigos entram num resumo que vai sendo atualizado
+JANELA_TURNOS = int(os.getenv("CHAT_JANELA_TURNOS", "4"))
+ORCAMENTO_TOKENS_HISTORICO = int(os.getenv("CHAT_ORCAMENTO_TOKENS_HISTORICO", "1500"))
+ORCAMENTO_TOKENS_RESUMO = int(os.getenv("CHAT_ORCAMENTO_TOKENS_RESUMO", "300"))
+
+INSTRUCAO_RESUMO = (
+    "Atualize o resumo de uma conversa entre um usuário e um analista econômico. "
+    "Mantenha apenas fatos, números, ativos e preferências do usuário que possam ser úteis "
+    "para as próximas perguntas. Responda só com o resumo, em português, em no máximo {palavras} palavras."
+)
+
+
+def _texto_turno(turno: dict) -> str:
+    return f"Usuário: {turno['pergunta']}\nAnalista: {turno['resposta']}"
+
+
+class MemoriaChat:
+    """Histórico do chat com custo limitado: janela dos últimos turnos mais um resumo dos anteriores.
+
+    As mensagens são devolvidas como pares (papel, texto), com papel em
+    "sistema", "usuario" e "assistente", para que o módulo não dependa do LangChain.
+    """
+
+    def __init__(self, janela_turnos: int = JANELA_TURNOS, orcamento_tokens: int = ORCAMENTO_TOKENS_HISTORICO,
+                 orcamento_resumo: int = ORCAMENTO_TOKENS_RESUMO):
+        self.janela_turnos = janela_turnos
+        self.orcamento_tokens = orcamento_tokens
+        self.orcamento_resumo = orcamento_resumo
+        self.resumo = ""
+        self.recentes = []
+
+    def tokens(self) -> int:
+        return estimar_tokens(self.resumo) + sum(t["tokens"] for t in self.recentes)
+
+    def mensagens(self, contexto_sistema: str, pergunta: str) -> list:
+        sistema = contexto_sistema
+        if self.resumo:
+            sistema += f"\n\n**Resumo da conversa até aqui:**\n{self.resumo}"
+        mensagens = [("sistema", sistema)]
+        for turno in self.recentes:
+            mensagens.append(("usuario", turno["pergunta"]))
+            mensagens.append(("assistente", turno["resposta"]))
+        mensagens.append(("usuario", pergunta))
+        return mensagens
+
+    def adicionar(self, pergunta: str, resposta: str, resumir=None):
+        """Guarda o turno e, se a janela ou o orçamento estourarem, move os mais antigos para o resumo.
+
+        `resumir(instrucao, texto) -> str` chama o modelo; sem ela (ou se falhar), o
+        resumo é apenas o texto dos turnos antigos cortado no orçamento.
+        """
+        self.recentes.append({
+            "pergunta": pergunta,
+            "resposta": resposta,
+            "tokens": estimar_tokens(pergunta) + estimar_tokens(resposta),
+        })
+        antigos = []
+        # O turno recém-adicionado sempre fica, mesmo que sozinho passe do orçamento
+        while len(self.recentes) > 1 and (len(self.recentes) > self.janela_turnos or self.tokens() > self.orcamento_tokens):
+            antigos.append(self.recentes.pop(0))
+        if antigos:
+            self.resumo = self._resumir(antigos, resumir)
+
+    def _cortar(self, texto: str) -> str:
+        """Mantém o fim do texto (o mais recente), cortando até caber no orçamento do resumo."""
+        cortado = texto
+        while cortado and estimar_tokens(cortado) > self.orcamento_resumo:
+            cortado = cortado[len(cortado) // 4:]
+        return cortado if cortado == texto else "..." + cortado
+
+    def _resumir(self, antigos: list, resumir) -> str:
+        partes = ([f"Resumo anterior:\n{self.resumo}"] if self.resumo else []) + [_texto_turno(t) for t in antigos]
+        texto = "\n\n".join(partes)
+        if resumir is not None:
+            try:
+                instrucao = INSTRUCAO_RESUMO.format(palavras=int(self.orcamento_resumo * 0.6))
+                novo = resumir(instrucao, texto).strip()
+                if novo:
+                    return self._cortar(novo)
+            except Exception as e:
+                print(f"⚠️ Falha ao resumir o histórico do chat: {e}")
+        return self._cortar(texto)
@@ -1,6 +1,14 @@
+import json
+import os
+import re
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import pandas as pd
+import dados
+from indice_noticias import IndiceNoticias
+from instrumentacao import medir
 
 # Script para coletar notícias de economia e investimentos
 palavras_chave = [
@@ -15,41 +23,136 @@ sites = {
     "G1 Economia": "https://g1.globo.com/economia/",
     "InfoMoney": "https://www.infomoney.com.br/mercados/",
     "Exame Economia": "https://exame.com/economia/",
-   
+
 }
 
-noticias = []
+# Validadores HTTP (ETag/Last-Modified) e notícias extraídas de cada página na última coleta
+ARQUIVO_CACHE_HTTP = dados.caminho_arquivo(".cache_http_noticias.json")
+MAX_CONEXOES = 16
+
+# Todas as palavras-chave numa única expressão: uma passada por título em vez de uma por palavra
+padrao_palavras_chave = re.compile("|".join(re.escape(p) for p in sorted(palavras_chave, key=len, reverse=True)))
+
+# lxml é bem mais rápido que o html.parser puro Python; usa-o quando estiver instalado
+try:
+    import lxml  # noqa: F401
+    PARSER_HTML = "lxml"
+except ImportError:
+    PARSER_HTML = "html.parser"
+
+# Só os links interessam: o parser ignora o restante da árvore
+apenas_links = SoupStrainer("a", href=True)
+
 
 def filtrar_noticias(html, base_url):
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, PARSER_HTML, parse_only=apenas_links)
     encontrados = []
     for a in soup.find_all("a", href=True):
         titulo = a.get_text().strip().lower()
         link = a["href"]
-        if any(p in titulo for p in palavras_chave):
-            if titulo and link.startswith("http"):
+        if titulo and padrao_palavras_chave.search(titulo):
+            if link.startswith("http"):
                 encontrados.append({"titulo": titulo.title(), "link": link})
-            elif titulo and link.startswith("/"):
+            elif link.startswith("/"):
                 encontrados.append({"titulo": titulo.title(), "link": base_url + link})
     return encontrados
 
-for nome_site, url in sites.items():
+
+def carregar_cache_http(caminho: str = ARQUIVO_CACHE_HTTP) -> dict:
+    if not os.path.exists(caminho):
+        return {}
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
-        if resp.status_code == 200:
-            base_url = "/".join(url.split("/")[:3])
-            noticias += filtrar_noticias(resp.text, base_url)
-        else:
-            print(f"[!] Erro ao acessar {nome_site}: Status {resp.status_code}")
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return {}
+
+
+def salvar_cache_http(cache: dict, caminho: str = ARQUIVO_CACHE_HTTP):
+    def escrever(temporario):
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+
+    dados.escrever_atomico(caminho, escrever)
+
+
+def criar_sessao(tamanho_pool: int) -> requests.Session:
+    sessao = requests.Session()
+    sessao.headers.update(headers)
+    adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    return sessao
+
+
+def coletar_site(sessao: requests.Session, nome_site: str, url: str, anterior: dict):
+    """Baixa uma página com GET condicional.
+
+    Retorna (noticias, entrada_cache); páginas inalteradas (304) reaproveitam as
+    notícias extraídas na coleta anterior, sem baixar nem parsear de novo.
+    """
+    condicionais = {}
+    if anterior.get("etag"):
+        condicionais["If-None-Match"] = anterior["etag"]
+    if anterior.get("last_modified"):
+        condicionais["If-Modified-Since"] = anterior["last_modified"]
+
+    try:
+        with medir("http.noticias", site=nome_site) as trecho:
+            resp = sessao.get(url, headers=condicionais, timeout=10)
+            trecho.update(status=resp.status_code, bytes=len(resp.content), falhou=resp.status_code not in (200, 304))
     except Exception as e:
         print(f"[!] Falha ao acessar {nome_site}: {e}")
+        return anterior.get("noticias", []), anterior
+
+    if resp.status_code == 304:
+        print(f"[=] {nome_site} sem alterações desde a última coleta.")
+        return anterior.get("noticias", []), anterior
+    if resp.status_code != 200:
+        print(f"[!] Erro ao acessar {nome_site}: Status {resp.status_code}")
+        return anterior.get("noticias", []), anterior
+
+    base_url = "/".join(url.split("/")[:3])
+    with medir("parse.noticias", site=nome_site, bytes=len(resp.content)):
+        encontrados = filtrar_noticias(resp.content, base_url)
+    entrada = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "noticias": encontrados,
+    }
+    return encontrados, entrada
+
+
+def main():
+    cache = carregar_cache_http()
+    noticias = []
+
+    # Todos os sites ao mesmo tempo, reaproveitando conexões
+    with criar_sessao(MAX_CONEXOES) as sessao, ThreadPoolExecutor(max_workers=min(MAX_CONEXOES, len(sites))) as executor:
+        futuros = {
+            nome_site: (url, executor.submit(coletar_site, sessao, nome_site, url, cache.get(url, {})))
+            for nome_site, url in sites.items()
+        }
+        for nome_site, (url, futuro) in futuros.items():
+            encontrados, cache[url] = futuro.result()
+            noticias += [dict(n, fonte=nome_site) for n in encontrados]
+
+    salvar_cache_http({url: cache[url] for url in sites.values() if cache.get(url)})
+
+    # Remove duplicadas (mesma URL ou mesma manchete em outro portal) contra todo o histórico
+    indice = IndiceNoticias()
+    novas = indice.registrar(noticias)
+    indice.salvar()
 
-# Remover duplicadas
-noticias_unicas = list({n["titulo"]: n for n in noticias}.values())
-# Salvar CSV
-df = pd.DataFrame(noticias_unicas)
+    # Só o que é novo segue para os agentes e o dashboard; sem novidades, o arquivo anterior é mantido
+    if not novas:
+        print(f"ℹ️ Nenhuma notícia nova entre as {len(noticias)} coletadas. Tabela noticias_investimentos mantida.")
+        return
 
+    df = pd.DataFrame(novas, columns=["titulo", "link", "fonte", "primeira_vez"])
+    dados.salvar("noticias_investimentos", df)
+    print(f"✅ Tabela noticias_investimentos gravada com {len(df)} notícias novas.")
 
-print(f"✅ CSV gerado com {len(df)} notícias: noticias_investimentos.csv")
 
-df.to_csv("data/noticias_investimentos.csv", index=False, encoding="utf-8-sig")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
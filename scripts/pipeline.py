@@ -0,0 +1,126 @@
+import importlib
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Permite importar os coletores pelo nome do módulo (ex.: "acoes_bovespa")
+# tanto rodando a partir da raiz do projeto quanto de dentro de scripts/
+DIRETORIO_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+if DIRETORIO_SCRIPTS not in sys.path:
+    sys.path.insert(0, DIRETORIO_SCRIPTS)
+
+import dados  # noqa: E402
+from instrumentacao import registrar  # noqa: E402
+
+# Etapas de coleta independentes entre si: rodam ao mesmo tempo
+ETAPAS_COLETA = {
+    "indicadores": "indicadores_economicos",
+    "acoes": "acoes_bovespa",
+    "noticias": "noticias",
+}
+
+# Correlações e betas das ações contra os fatores macro: recalculados (sem LLM) a partir
+# dos preços e indicadores sempre que uma coleta traz dados novos
+ETAPA_ANALISE_CRUZADA = "analise_cruzada"
+ENTRADAS_ANALISE_CRUZADA = ["precos", "indicadores_economicos"]
+
+# A análise dos agentes só começa quando todas as suas tabelas de entrada existem
+# e ao menos uma coleta desta execução trouxe dados novos
+ETAPA_ANALISE = "agentes_economicos"
+ENTRADAS_ANALISE = [
+    "indicadores_economicos",
+    "top_10_acoes",
+    "noticias_investimentos",
+]
+
+
+def executar_etapa(nome: str, nome_modulo: str) -> dict:
+    """Executa o main() de um módulo no processo atual e mede o tempo de parede."""
+    inicio = time.perf_counter()
+    status = 0
+    erro = None
+    try:
+        modulo = importlib.import_module(nome_modulo)
+        modulo.main()
+    except SystemExit as e:
+        # sys.exit() dentro de uma etapa não pode derrubar o pipeline inteiro
+        status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if status:
+            erro = f"sys.exit({e.code})"
+    except Exception as e:
+        status = 1
+        erro = f"{type(e).__name__}: {e}"
+    duracao_s = time.perf_counter() - inicio
+    registrar(f"etapa.{nome}", duracao_s * 1000, ok=not status, erro=erro)
+    return {
+        "etapa": nome,
+        "status": status,
+        "duracao_s": duracao_s,
+        "erro": erro,
+    }
+
+
+def executar_coletas(etapas: dict = ETAPAS_COLETA) -> list:
+    """Roda as etapas de coleta em paralelo (são limitadas por I/O de rede)."""
+    # Importa os módulos antes de abrir as threads: o custo de importação
+    # (pandas, requests, bs4) é pago uma única vez por processo
+    for nome_modulo in etapas.values():
+        importlib.import_module(nome_modulo)
+
+    with ThreadPoolExecutor(max_workers=len(etapas)) as executor:
+        futuros = [executor.submit(executar_etapa, nome, modulo) for nome, modulo in etapas.items()]
+        return [futuro.result() for futuro in futuros]
+
+
+def entradas_faltando(entradas: list = ENTRADAS_ANALISE) -> list:
+    return [tabela for tabela in entradas if not dados.existe(tabela)]
+
+
+def coletas_com_sucesso(resultados: list) -> list:
+    return [r["etapa"] for r in resultados if r["status"] == 0]
+
+
+def imprimir_resumo(resultados: list, duracao_total: float):
+    print("\n⏱️ Resumo do pipeline:")
+    print(f"{'etapa':<14}{'status':>8}{'tempo (s)':>12}")
+    for r in resultados:
+        status = "pulada" if r["status"] is None else str(r["status"])
+        print(f"{r['etapa']:<14}{status:>8}{r['duracao_s']:>12.2f}")
+        if r["erro"]:
+            print(f"   ↳ {r['erro']}")
+    print(f"{'total':<14}{'':>8}{duracao_total:>12.2f}")
+
+
+def executar_pipeline(incluir_analise: bool = True) -> list:
+    """Coleta tudo em paralelo, atualiza a análise cruzada e, em seguida, roda a análise dos agentes."""
+    inicio = time.perf_counter()
+    print("🔁 Executando coletas (indicadores, ações e notícias) em paralelo...")
+    resultados = executar_coletas()
+    if coletas_com_sucesso(resultados):
+        # Incremental: só os pregões novos são calculados; os agentes leem o resultado
+        resultados.append(executar_etapa("analise_cruzada", ETAPA_ANALISE_CRUZADA))
+
+    if incluir_analise:
+        faltando = entradas_faltando()
+        if faltando:
+            print(f"⚠️ Análise dos agentes não executada. Tabelas ausentes: {', '.join(faltando)}")
+            resultados.append({"etapa": "analise", "status": None, "duracao_s": 0.0,
+                               "erro": f"entradas ausentes: {', '.join(faltando)}"})
+        elif not coletas_com_sucesso(resultados):
+            # As tabelas versionadas no repositório existem mesmo sem coleta: não pagar
+            # a análise do LLM sobre os mesmos arquivos antigos
+            print("⚠️ Análise dos agentes não executada: nenhuma coleta terminou com sucesso.")
+            resultados.append({"etapa": "analise", "status": None, "duracao_s": 0.0,
+                               "erro": "nenhuma coleta com sucesso"})
+        else:
+            print("🧠 Executando análise dos agentes econômicos (CrewAI)...")
+            resultados.append(executar_etapa("analise", ETAPA_ANALISE))
+
+    imprimir_resumo(resultados, time.perf_counter() - inicio)
+    return resultados
+
+
+if __name__ == "__main__":
+    resultados = executar_pipeline()
+    sys.exit(1 if any(r["status"] for r in resultados) else 0)
@@ -0,0 +1,196 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import dados
+from contexto import limitar_tokens, resumir_acoes, resumir_indicadores
+from indice_noticias import normalizar_titulo
+from indicadores_tecnicos import carregar_indicadores
+
+# Índice local (BM25) sobre o relatório dos agentes, as notícias e os resumos de ações e indicadores:
+# cada pergunta do chat recebe só os trechos mais relevantes, num prompt de tamanho limitado
+ARQUIVO_RELATORIO = dados.caminho_arquivo("relatorio_indicacao_acoes.md")
+TOP_K = int(os.getenv("RECUPERACAO_TOP_K", "6"))
+ORCAMENTO_TOKENS_RECUPERACAO = int(os.getenv("RECUPERACAO_ORCAMENTO_TOKENS", "800"))
+PALAVRAS_POR_TRECHO = 120
+JANELA_NOTICIAS_DIAS = 30
+
+# Parâmetros usuais do BM25
+K1 = 1.5
+B = 0.75
+
+STOPWORDS = set("""
+a ao aos as com como da das de do dos e em era esta este isso ja mais mas na nas no nos o os ou para pela pelo
+por qual quais que se sem ser sobre sua seu um uma uns umas voce hoje agora atual atualmente
+""".split())
+
+
+def tokenizar(texto: str) -> list:
+    return [t for t in normalizar_titulo(texto).split() if t not in STOPWORDS and len(t) > 1]
+
+
+# --- Fontes: cada uma tem uma versão barata de calcular e uma função que gera os trechos ---
+
+def _versao_arquivo(caminho: str):
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (estado.st_size, estado.st_mtime_ns)
+
+
+def trechos_relatorio(caminho: str = ARQUIVO_RELATORIO) -> list:
+    """Parágrafos do relatório agrupados em trechos de até PALAVRAS_POR_TRECHO palavras, com o título da seção."""
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, "r", encoding="utf-8") as f:
+        texto = f.read()
+
+    trechos = []
+    for secao in re.split(r"\n(?=#)", texto):
+        linhas = secao.strip().splitlines()
+        if not linhas:
+            continue
+        titulo = linhas[0].lstrip("#").strip() if linhas[0].startswith("#") else ""
+        corpo = "\n".join(linhas[1:] if titulo else linhas)
+        atual = []
+        for paragrafo in re.split(r"\n\s*\n|\n(?=\s*(?:\d+\.|[-*]) )", corpo):
+            palavras = paragrafo.split()
+            if atual and len(atual) + len(palavras) > PALAVRAS_POR_TRECHO:
+                trechos.append(f"{titulo}: {' '.join(atual)}" if titulo else " ".join(atual))
+                atual = []
+            atual += palavras
+        if atual:
+            trechos.append(f"{titulo}: {' '.join(atual)}" if titulo else " ".join(atual))
+    return trechos
+
+
+def trechos_noticias() -> list:
+    limite = pd.Timestamp(datetime.now() - timedelta(days=JANELA_NOTICIAS_DIAS))
+    noticias = dados.ler("noticias_indice", colunas=["titulo", "fonte", "primeira_vez"],
+                         filtros=[("primeira_vez", ">=", limite), ("duplicata", "==", False)])
+    if noticias.empty:
+        noticias = dados.ler("noticias_investimentos")
+    if noticias.empty:
+        return []
+    fonte = noticias["fonte"].astype(str) if "fonte" in noticias.columns else pd.Series("", index=noticias.index)
+    quando = (noticias["primeira_vez"].dt.strftime("%d/%m/%Y") if "primeira_vez" in noticias.columns
+              else pd.Series("", index=noticias.index))
+    return ("Notícia (" + fonte + " " + quando.fillna("") + "): " + noticias["titulo"].astype(str)).tolist()
+
+
+def _descrever(rotulo: str, linha: pd.Series) -> str:
+    campos = ", ".join(
+        f"{coluna}={valor:.4g}" if isinstance(valor, (float, np.floating)) else f"{coluna}={valor}"
+        for coluna, valor in linha.items() if pd.notna(valor)
+    )
+    return f"{rotulo}: {campos}"
+
+
+def trechos_acoes() -> list:
+    acoes = dados.ler("top_10_acoes")
+    if acoes.empty:
+        return []
+    tickers = acoes["ticker"].astype(str).unique().tolist()
+    resumo = resumir_acoes(acoes.set_index("data"), carregar_indicadores(tickers))
+    return [_descrever(f"Ação {linha['ticker']}", linha.drop("ticker")) for _, linha in resumo.iterrows()]
+
+
+def trechos_indicadores() -> list:
+    indicadores = dados.ler("indicadores_economicos")
+    if indicadores.empty:
+        return []
+    resumo = resumir_indicadores(indicadores)
+    return [_descrever(f"Indicador {linha['indicador']}", linha.drop("indicador")) for _, linha in resumo.iterrows()]
+
+
+FONTES = {
+    "relatorio": (lambda: _versao_arquivo(ARQUIVO_RELATORIO), trechos_relatorio),
+    "noticias": (lambda: (dados.versao("noticias_indice"), dados.versao("noticias_investimentos")), trechos_noticias),
+    "acoes": (lambda: (dados.versao("top_10_acoes"), dados.versao("indicadores_tecnicos")), trechos_acoes),
+    "indicadores": (lambda: dados.versao("indicadores_economicos"), trechos_indicadores),
+}
+
+
+class IndiceRecuperacao:
+    """Índice invertido BM25 em memória, refeito só para as fontes cuja versão mudou.
+
+    Pode ser compartilhado entre threads: `atualizar` é serializado e a busca usa
+    sempre um retrato completo do índice, trocado de uma só vez.
+    """
+
+    def __init__(self, fontes: dict = FONTES):
+        self.fontes = fontes
+        self._versoes = {}
+        self._trechos = {}  # fonte -> [(texto, Counter de termos)]
+        self._trava = threading.Lock()
+        self._indice = ([], {}, np.zeros(0), 0.0)
+
+    def atualizar(self) -> list:
+        """Recarrega as fontes alteradas desde a última chamada e devolve os nomes delas."""
+        with self._trava:
+            alteradas = []
+            for nome, (versao, gerar_trechos) in self.fontes.items():
+                atual = versao()
+                if nome in self._versoes and self._versoes[nome] == atual:
+                    continue
+                try:
+                    trechos = gerar_trechos()
+                except Exception as e:
+                    print(f"⚠️ Fonte '{nome}' indisponível para o índice de recuperação: {e}")
+                    trechos = []
+                self._trechos[nome] = [(texto, Counter(tokenizar(texto))) for texto in trechos]
+                self._versoes[nome] = atual
+                alteradas.append(nome)
+            if alteradas:
+                self._montar()
+            return alteradas
+
+    def assinatura(self) -> tuple:
+        """Versões das fontes indexadas: muda sempre que algum dado coletado muda."""
+        with self._trava:
+            return tuple(sorted(self._versoes.items()))
+
+    def _montar(self):
+        documentos = [(nome, texto) for nome, trechos in self._trechos.items() for texto, _ in trechos]
+        contagens = [termos for trechos in self._trechos.values() for _, termos in trechos]
+        postagens = {}
+        for posicao, termos in enumerate(contagens):
+            for termo, frequencia in termos.items():
+                ids, frequencias = postagens.setdefault(termo, ([], []))
+                ids.append(posicao)
+                frequencias.append(frequencia)
+        postagens = {termo: (np.array(ids), np.array(freq, dtype=float)) for termo, (ids, freq) in postagens.items()}
+        comprimentos = np.array([sum(termos.values()) for termos in contagens], dtype=float)
+        media = comprimentos.mean() if len(comprimentos) else 0.0
+        self._indice = (documentos, postagens, comprimentos, media)
+
+    def buscar(self, pergunta: str, k: int = TOP_K) -> list:
+        documentos, postagens, comprimentos, media = self._indice
+        if not documentos:
+            return []
+        pontuacao = np.zeros(len(documentos))
+        for termo in set(tokenizar(pergunta)):
+            if termo not in postagens:
+                continue
+            ids, frequencias = postagens[termo]
+            idf = math.log(1 + (len(documentos) - len(ids) + 0.5) / (len(ids) + 0.5))
+            normalizacao = K1 * (1 - B + B * comprimentos[ids] / media)
+            pontuacao[ids] += idf * frequencias * (K1 + 1) / (frequencias + normalizacao)
+
+        candidatos = np.flatnonzero(pontuacao > 0)
+        melhores = candidatos[np.argsort(-pontuacao[candidatos], kind="stable")[:k]]
+        return [{"fonte": documentos[i][0], "texto": documentos[i][1], "pontuacao": float(pontuacao[i])} for i in melhores]
+
+    def contexto(self, pergunta: str, k: int = TOP_K, orcamento: int = ORCAMENTO_TOKENS_RECUPERACAO) -> str:
+        """Os trechos mais relevantes para a pergunta, formatados para o prompt e dentro do orçamento."""
+        resultados = self.buscar(pergunta, k)
+        if not resultados:
+            return "Nenhum dado coletado relevante para esta pergunta."
+        return limitar_tokens([f"- [{r['fonte']}] {r['texto']}" for r in resultados], orcamento, cabecalho=0)
@@ -0,0 +1,162 @@
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import dados
+from instrumentacao import registrar
+
+# Uma pasta por execução dos agentes, com um JSON por etapa gravado assim que a etapa termina
+DIRETORIO_EXECUCOES = dados.caminho_arquivo("execucoes")
+
+_etapa_atual = contextvars.ContextVar("etapa_atual", default=None)
+
+
+def _gravar_json(caminho: str, conteudo: dict):
+    texto = json.dumps(conteudo, ensure_ascii=False, indent=2, default=str)
+
+    def escrever(temporario):
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+    dados.escrever_atomico(caminho, escrever)
+
+
+def ultima_execucao(diretorio_base: str = DIRETORIO_EXECUCOES):
+    """Estado (execucao.json) da execução mais recente, ou None."""
+    # Pela pasta (id da execução): "20250520-100000-02" vem depois de "20250520-100000"
+    estados = sorted(glob.glob(os.path.join(diretorio_base, "*", "execucao.json")),
+                     key=lambda caminho: os.path.basename(os.path.dirname(caminho)))
+    if not estados:
+        return None
+    with open(estados[-1], "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class RegistroExecucao:
+    """Tempo, chamadas ao LLM, tokens e saída de cada etapa de uma execução dos agentes."""
+
+    def __init__(self, diretorio_base: str = DIRETORIO_EXECUCOES):
+        self.id, self.diretorio = self._criar_diretorio(diretorio_base)
+        self._trava = threading.Lock()
+        self.etapas = {}
+        self.estado = {"id": self.id, "status": "em_andamento", "inicio": datetime.now().isoformat(timespec="seconds")}
+        self._gravar_estado()
+
+    @staticmethod
+    def _criar_diretorio(diretorio_base: str) -> tuple:
+        """Id e pasta da execução; duas execuções no mesmo segundo (agendador e manual) ganham sufixos."""
+        os.makedirs(diretorio_base, exist_ok=True)
+        inicio = datetime.now().strftime("%Y%m%d-%H%M%S")
+        sufixo = 1
+        while True:
+            id_execucao = inicio if sufixo == 1 else f"{inicio}-{sufixo:02d}"
+            diretorio = os.path.join(diretorio_base, id_execucao)
+            try:
+                os.mkdir(diretorio)
+                return id_execucao, diretorio
+            except FileExistsError:
+                sufixo += 1
+
+    def _gravar_estado(self):
+        with self._trava:
+            conteudo = dict(self.estado, etapas={
+                nome: {c: v for c, v in e.items() if c != "saida"} for nome, e in self.etapas.items()
+            })
+        _gravar_json(os.path.join(self.diretorio, "execucao.json"), conteudo)
+
+    @contextmanager
+    def etapa(self, nome: str):
+        """Mede a etapa e atribui a ela as chamadas ao LLM feitas dentro do bloco, na mesma thread."""
+        registro = {"etapa": nome, "status": "em_andamento", "duracao_s": 0.0, "chamadas_llm": 0,
+                    "tokens_prompt": 0, "tokens_resposta": 0, "erro": None, "saida": None}
+        with self._trava:
+            self.etapas[nome] = registro
+        token = _etapa_atual.set(nome)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+            registro["status"] = "concluida"
+        except BaseException as e:
+            registro["status"] = "falhou"
+            registro["erro"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            registro["duracao_s"] = time.perf_counter() - inicio
+            _etapa_atual.reset(token)
+            registrar("agentes.etapa", registro["duracao_s"] * 1000, ok=registro["status"] == "concluida",
+                      etapa=nome, execucao_agentes=self.id, erro=registro["erro"])
+            _gravar_json(os.path.join(self.diretorio, f"{nome}.json"), registro)
+            self._gravar_estado()
+
+    def reaproveitada(self, nome: str, saida: str):
+        with self._trava:
+            self.etapas[nome] = {"etapa": nome, "status": "reaproveitada", "duracao_s": 0.0, "chamadas_llm": 0,
+                                 "tokens_prompt": 0, "tokens_resposta": 0, "erro": None, "saida": saida}
+        self._gravar_estado()
+
+    def registrar_uso(self, tokens_prompt: int, tokens_resposta: int):
+        nome = _etapa_atual.get()
+        with self._trava:
+            registro = self.etapas.get(nome)
+            if registro is None:
+                registro = self.etapas.setdefault("(fora de etapa)", {
+                    "etapa": "(fora de etapa)", "status": "-", "duracao_s": 0.0, "chamadas_llm": 0,
+                    "tokens_prompt": 0, "tokens_resposta": 0, "erro": None, "saida": None})
+            registro["chamadas_llm"] += 1
+            registro["tokens_prompt"] += tokens_prompt
+            registro["tokens_resposta"] += tokens_resposta
+
+    def finalizar(self, status: str):
+        self.estado["status"] = status
+        self.estado["fim"] = datetime.now().isoformat(timespec="seconds")
+        self._gravar_estado()
+
+    def imprimir_resumo(self):
+        """Tabela das etapas, da mais demorada para a mais rápida, com os totais."""
+        with self._trava:
+            etapas = sorted(self.etapas.values(), key=lambda e: e["duracao_s"], reverse=True)
+        print(f"\n⏱️ Execução {self.id} ({self.estado['status']}):")
+        print(f"{'etapa':<28}{'status':>14}{'tempo (s)':>11}{'chamadas':>10}{'tok. prompt':>13}{'tok. resposta':>15}")
+        for e in etapas:
+            print(f"{e['etapa'][:27]:<28}{e['status']:>14}{e['duracao_s']:>11.1f}{e['chamadas_llm']:>10}"
+                  f"{e['tokens_prompt']:>13}{e['tokens_resposta']:>15}")
+        print(f"{'total':<28}{'':>14}{sum(e['duracao_s'] for e in etapas):>11.1f}"
+              f"{sum(e['chamadas_llm'] for e in etapas):>10}{sum(e['tokens_prompt'] for e in etapas):>13}"
+              f"{sum(e['tokens_resposta'] for e in etapas):>15}")
+
+
+class ContadorTokens:
+    """Soma chamadas e tokens (prompt/resposta) do LLM à etapa em execução.
+
+    Compara as métricas de uso acumuladas do LLM do CrewAI (`get_token_usage_summary`)
+    antes e depois de cada chamada; cada chamada ao modelo também vira uma medição
+    "llm.azure" no arquivo de métricas. O LLM medido não pode ser usado por outra
+    thread ao mesmo tempo, senão a diferença mistura as chamadas.
+    """
+
+    def __init__(self, registro: RegistroExecucao):
+        self.registro = registro
+
+    @contextmanager
+    def chamada(self, llm):
+        antes = llm.get_token_usage_summary()
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            registrar("llm.azure", (time.perf_counter() - inicio) * 1000, ok=False, etapa=_etapa_atual.get(),
+                      erro=f"{type(e).__name__}: {e}")
+            raise
+        depois = llm.get_token_usage_summary()
+        if depois.successful_requests == antes.successful_requests:
+            return  # Resposta do cache: o modelo não foi chamado
+        prompt = depois.prompt_tokens - antes.prompt_tokens
+        resposta = depois.completion_tokens - antes.completion_tokens
+        self.registro.registrar_uso(prompt, resposta)
+        registrar("llm.azure", (time.perf_counter() - inicio) * 1000, etapa=_etapa_atual.get(),
+                  tokens_prompt=prompt, tokens_resposta=resposta)
@@ -1,9 +1,22 @@
+import time
+INICIO_EXECUCAO = time.perf_counter()
+
 import streamlit as st
+import altair as alt
+import numpy as np
 import pandas as pd
 import os
+import sys
 from dotenv import load_dotenv
-from langchain.chat_models import AzureChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+
+# A camada de dados (scripts/dados.py) é compartilhada com os coletores
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import dados
+import analise_cruzada
+import graficos
+from memoria_chat import MemoriaChat
+from agendador import ler_estado as ler_estado_agendador
+from instrumentacao import ler_metricas, medir, registrar, resumir_por_estagio
 
 # --- Configuração da Página ---
 st.set_page_config(layout="wide", page_title="Painel de Análise de Investimentos com Chat")
@@ -19,19 +32,22 @@ load_dotenv()
 # --- Chatbot no topo ---
 st.header("💬 Converse com o Agente Econômico")
 
-# Initialize chat_model safely
-chat_model = None
-try:
-    chat_model = AzureChatOpenAI(
-        deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_LLM"),
+# Tempo máximo desejado para desenhar a página (primeira carga ou nova interação)
+META_EXECUCAO_MS = float(os.getenv("DASHBOARD_META_EXECUCAO_MS", "1500"))
+
+# O LangChain só é importado e o cliente só é criado na primeira pergunta; depois,
+# o mesmo cliente é reaproveitado por todas as sessões e interações do processo.
+# Se a criação falhar, nada fica em cache e a próxima pergunta tenta de novo.
+@st.cache_resource(show_spinner="Conectando ao modelo de chat...")
+def obter_modelo_chat():
+    from langchain_openai import AzureChatOpenAI
+    return AzureChatOpenAI(
+        azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_LLM"),
         temperature=0,
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        openai_api_version=os.getenv("AZURE_API_VERSION")
+        api_version=os.getenv("AZURE_API_VERSION")
     )
-except Exception as e:
-    st.error(f"Erro ao inicializar o modelo de chat: {e}")
-    st.warning("As funcionalidades do chatbot estarão desabilitadas.")
 
 contexto_chat = """
 Você é o "Analista Econômico Virtual", um assistente de IA especializado em economia e mercado financeiro brasileiro, com foco em fornecer insights e análises baseadas em dados.
@@ -42,13 +58,10 @@ Você é o "Analista Econômico Virtual", um assistente de IA especializado em e
 - **Seu Tom:** Profissional, analítico, ponderado e educativo. Evite linguagem excessivamente técnica sem explicação. Seja direto, mas completo em suas respostas.
 
 **Contexto Econômico Atual (use como base principal para suas respostas):**
-* **Inflação (IPCA):** Observa-se uma tendência de desaceleração nos últimos meses.
-* **Taxa de Juros (SELIC):** Atualmente fixada em 10,75% ao ano.
-* **Mercado de Ações:** As ações PETR4, VALE3 e WEGE3 apresentam os maiores volumes de negociação recentemente.
-* **Cenário Macroeconômico e Notícias:** Atenção para a recente alta nos preços do petróleo e discussões sobre o risco fiscal no país.
+A cada pergunta, a seção "Dados recuperados" ao final traz os trechos mais relevantes dos dados coletados: relatório dos agentes, notícias recentes e resumos das ações e dos indicadores econômicos (IPCA, SELIC, PIB, câmbio...). Cite valores e datas exatamente como aparecem ali.
 
 **Diretrizes para suas Respostas:**
-1.  **Baseie-se nos Dados:** Utilize primordialmente as informações de contexto fornecidas acima. Se uma pergunta extrapolar esses dados, mencione que a informação específica não está no seu contexto atual, mas pode oferecer uma análise geral se aplicável.
+1.  **Baseie-se nos Dados:** Utilize primordialmente os dados recuperados. Se uma pergunta extrapolar esses dados, mencione que a informação específica não está no seu contexto atual, mas pode oferecer uma análise geral se aplicável.
 2.  **Clareza e Objetividade:** Responda de forma direta e fácil de entender.
 3.  **Abordagem Consultiva:** Não se limite a responder; ofereça perspectivas, explique implicações e, quando apropriado, sugira cautela ou pontos de atenção.
 4.  **Análise, Não Recomendação:** Você fornece análises e informações, mas NÃO deve dar conselhos de investimento diretos (ex: "compre esta ação" ou "invista nisso"). Em vez disso, explique cenários, riscos e potenciais com base nos dados. Frases como "Considerando o cenário X, um investimento Y pode ter tal comportamento..." são aceitáveis, mas sempre com as devidas ressalvas.
@@ -56,41 +69,87 @@ Você é o "Analista Econômico Virtual", um assistente de IA especializado em e
 6.  **Interpretação de Notícias:** Ao comentar notícias, foque nos seus potenciais impactos econômicos e nos ativos mencionados.
 7.  **Seja Proativo:** Se uma pergunta for simples, tente agregar valor com um breve contexto adicional relevante.
 
-Exemplo de interação desejada:
-Usuário: "Com a SELIC a 10,75%, ainda vale a pena investir em renda fixa?"
-Você: "Com a taxa SELIC em 10,75% ao ano, a renda fixa permanece uma modalidade de investimento atrativa, especialmente para perfis mais conservadores, pois oferece retornos nominais consideráveis. Títulos atrelados à SELIC, como o Tesouro SELIC, acompanham essa taxa, proporcionando liquidez e baixo risco. É importante considerar também a inflação (IPCA) para calcular o ganho real. A desaceleração do IPCA, mencionada no nosso contexto, pode favorecer o rendimento real desses investimentos. No entanto, a decisão de investir deve sempre considerar seus objetivos financeiros, perfil de risco e o cenário econômico completo, incluindo discussões sobre risco fiscal que podem afetar as expectativas futuras para juros e inflação."
+Exemplo de interação desejada (os números reais vêm dos dados recuperados):
+Usuário: "Com a SELIC atual, ainda vale a pena investir em renda fixa?"
+Você: "Com a taxa SELIC em X% ao ano, segundo os dados mais recentes, a renda fixa permanece uma modalidade de investimento atrativa, especialmente para perfis mais conservadores, pois oferece retornos nominais consideráveis. Títulos atrelados à SELIC, como o Tesouro SELIC, acompanham essa taxa, proporcionando liquidez e baixo risco. É importante considerar também a inflação (IPCA) para calcular o ganho real. Se o IPCA estiver desacelerando, como indicarem os dados, isso pode favorecer o rendimento real desses investimentos. No entanto, a decisão de investir deve sempre considerar seus objetivos financeiros, perfil de risco e o cenário econômico completo, incluindo discussões sobre risco fiscal que podem afetar as expectativas futuras para juros e inflação."
 
 Agora, responda à pergunta do usuário.
 """
 
+# Índice BM25 dos dados coletados, um por processo; só as fontes alteradas são reindexadas
+@st.cache_resource
+def obter_indice_recuperacao():
+    from recuperacao import IndiceRecuperacao
+    return IndiceRecuperacao()
+
+# Respostas compartilhadas entre todas as sessões: a mesma pergunta sobre os mesmos dados
+# (no mesmo ponto da conversa) é respondida uma vez só, mesmo quando chega ao mesmo tempo
+@st.cache_resource
+def obter_cache_respostas():
+    from cache_respostas import CacheRespostas
+    return CacheRespostas()
+
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
+# O que vai para o modelo: últimos turnos na íntegra e um resumo dos anteriores
+if "memoria_chat" not in st.session_state:
+    st.session_state.memoria_chat = MemoriaChat()
 
 pergunta_cliente = st.text_input("Digite sua pergunta sobre investimentos ou economia:")
 
-if pergunta_cliente and chat_model:
-    mensagens = [SystemMessage(content=contexto_chat)]
-    for troca in st.session_state.chat_history:
-        mensagens.append(HumanMessage(content=troca["pergunta"]))
-        # Langchain typically expects AIMessage for bot responses in history for some models,
-        # but SystemMessage can work depending on the model and library version.
-        # If issues arise, consider changing this to AIMessage for 'resposta'.
-        mensagens.append(SystemMessage(content=troca["resposta"]))
-    mensagens.append(HumanMessage(content=pergunta_cliente))
+# O campo mantém o texto entre interações: a mesma pergunta não é enviada de novo
+# quando o usuário só troca uma ação ou indicador no painel
+ja_respondida = bool(st.session_state.chat_history) and st.session_state.chat_history[-1]["pergunta"] == pergunta_cliente
 
+chat_model = None
+if pergunta_cliente and not ja_respondida:
     try:
-        resposta = chat_model(mensagens).content
-        st.session_state.chat_history.append({"pergunta": pergunta_cliente, "resposta": resposta})
+        chat_model = obter_modelo_chat()
+    except Exception as e:
+        st.error(f"Erro ao inicializar o modelo de chat: {e}")
+        st.warning("As funcionalidades do chatbot estarão desabilitadas.")
+
+if ja_respondida:
+    st.markdown("### 🧠 Resposta do Agente:")
+    st.write(st.session_state.chat_history[-1]["resposta"])
+
+elif pergunta_cliente and chat_model:
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    tipos_mensagem = {"sistema": SystemMessage, "usuario": HumanMessage, "assistente": AIMessage}
+    memoria = st.session_state.memoria_chat
+    # Só os trechos relevantes para esta pergunta entram no prompt
+    indice_recuperacao = obter_indice_recuperacao()
+    indice_recuperacao.atualizar()
+    contexto_pergunta = f"{contexto_chat}\n**Dados recuperados:**\n{indice_recuperacao.contexto(pergunta_cliente)}"
+    pares = memoria.mensagens(contexto_pergunta, pergunta_cliente)
+    mensagens = [tipos_mensagem[papel](content=texto) for papel, texto in pares]
+    # O prompt de sistema já depende só dos dados (assinatura); o histórico entra sem ele
+    chave_resposta = obter_cache_respostas().chave(pergunta_cliente, indice_recuperacao.assinatura(), pares[1:-1] + [memoria.resumo])
+
+    def resumir(instrucao, texto):
+        return chat_model.invoke([SystemMessage(content=instrucao), HumanMessage(content=texto)]).content
 
+    try:
         st.markdown("### 🧠 Resposta do Agente:")
-        st.write(resposta)
+        # Os tokens aparecem na página conforme chegam do modelo; repetições vêm do cache
+        with medir("dashboard.chat") as trecho_chat:
+            resposta, origem = obter_cache_respostas().obter_ou_gerar(
+                chave_resposta, lambda: st.write_stream(trecho.content for trecho in chat_model.stream(mensagens))
+            )
+            trecho_chat["origem"] = origem
+        if origem != "gerada":
+            st.write(resposta)
+            st.caption("⚡ Resposta reaproveitada de uma pergunta idêntica sobre os mesmos dados.")
+        st.session_state.chat_history.append({"pergunta": pergunta_cliente, "resposta": resposta})
+        # Depois da resposta exibida: turnos que saem da janela são incorporados ao resumo
+        memoria.adicionar(pergunta_cliente, resposta, resumir=resumir)
     except Exception as e:
         st.error(f"Erro ao obter resposta do agente: {e}")
 
 elif pergunta_cliente and not chat_model:
     st.warning("O modelo de chat não está configurado. Não é possível processar a pergunta.")
 
-if chat_model:
+if st.session_state.chat_history:
     with st.expander("📜 Histórico da conversa", expanded=False):
         for i, troca in enumerate(st.session_state.chat_history):
             st.markdown(f"**Você:** {troca['pergunta']}")
@@ -100,32 +159,77 @@ if chat_model:
 st.divider()
 
 # --- Funções de carregamento ---
-@st.cache_data
-def carregar_relatorio_md(caminho_arquivo):
+@st.cache_data(max_entries=4)
+def carregar_relatorio_md(caminho_arquivo, mtime):
     if os.path.exists(caminho_arquivo):
         with open(caminho_arquivo, "r", encoding="utf-8") as f:
             return f.read()
     return "Relatório não encontrado. Execute a CrewAI primeiro."
 
-@st.cache_data
-def carregar_csv(caminho_arquivo):
-    if not os.path.exists(caminho_arquivo):
-        return f"Arquivo {os.path.basename(caminho_arquivo)} não encontrado."
+def _ler_tabela(nome_tabela):
+    """Tabela já tipada (datas, categorias, float32) lida pela camada de dados, ou uma mensagem de erro."""
+    if not dados.existe(nome_tabela):
+        return f"Tabela {nome_tabela} não encontrada."
     try:
-        df = pd.read_csv(caminho_arquivo)
+        df = dados.ler(nome_tabela)
         if df.empty:
-            return f"Arquivo {os.path.basename(caminho_arquivo)} está vazio."
+            return f"Tabela {nome_tabela} está vazia."
         return df
-    except pd.errors.EmptyDataError: # Specific error for empty CSV
-        return f"Arquivo {os.path.basename(caminho_arquivo)} não contém dados para parsear."
     except Exception as e:
-        return f"Erro ao carregar {os.path.basename(caminho_arquivo)}: {e}"
-
-# --- Caminhos dos arquivos ---
-ARQUIVO_RELATORIO_AGENTES = "data/relatorio_indicacao_acoes.md"
-ARQUIVO_ACOES = "data/top_10_acoes.csv"
-ARQUIVO_INDICADORES_ECONOMICOS = "data/indicadores_economicos.csv" # Assuming it's in the same directory or provide full path "data/indicadores_economicos.csv"
-ARQUIVO_NOTICIAS = "data/noticias_investimentos.csv"
+        return f"Erro ao carregar {nome_tabela}: {e}"
+
+# `versao` (quantidade, tamanho e mtime dos arquivos) entra na chave dos caches:
+# quando os coletores regravam uma tabela, a próxima interação já lê os dados novos
+@st.cache_data(max_entries=16)
+def carregar_tabela(nome_tabela, versao):
+    return _ler_tabela(nome_tabela)
+
+@st.cache_resource(max_entries=8)
+def indexar_por_grupo(nome_tabela, coluna_grupo, versao):
+    """{valor do grupo: DataFrame indexado e ordenado por data}, montado uma vez por versão da tabela.
+
+    Selecionar uma ação ou indicador vira uma consulta ao dicionário. O objeto é
+    compartilhado entre sessões (cache_resource não copia), então não deve ser alterado.
+    """
+    df = _ler_tabela(nome_tabela)
+    if isinstance(df, str):
+        return df
+    if coluna_grupo not in df.columns:
+        return f"Coluna '{coluna_grupo}' não encontrada na tabela {nome_tabela}."
+    df = df.dropna(subset=['data']).sort_values('data', kind='stable')
+    return {
+        str(valor): grupo.drop(columns=coluna_grupo).set_index('data')
+        for valor, grupo in df.groupby(coluna_grupo, observed=True, sort=True)
+    }
+
+@st.cache_data(max_entries=8)
+def listar_grupos(nome_tabela, versao):
+    """Valores da partição (tickers com dados), sem ler a tabela."""
+    return dados.particoes(nome_tabela)
+
+@st.cache_data(max_entries=32)
+def carregar_grupos(nome_tabela, coluna_grupo, valores, versao):
+    """Como `indexar_por_grupo`, mas lendo do disco só as partições de `valores` (tupla)."""
+    if not valores:
+        return {}
+    df = dados.ler(nome_tabela, filtros=[(coluna_grupo, "in", list(valores))])
+    df = df.dropna(subset=['data']).sort_values('data', kind='stable')
+    return {
+        str(valor): grupo.drop(columns=coluna_grupo).set_index('data')
+        for valor, grupo in df.groupby(coluna_grupo, observed=True, sort=True)
+    }
+
+# --- Caminhos e tabelas ---
+ARQUIVO_RELATORIO_AGENTES = dados.caminho_arquivo("relatorio_indicacao_acoes.md")
+TABELA_ACOES = "top_10_acoes"
+TABELA_INDICADORES_ECONOMICOS = "indicadores_economicos"
+TABELA_NOTICIAS = "noticias_investimentos"
+TABELA_INDICADORES_TECNICOS = "indicadores_tecnicos"
+TABELA_ANALISE_CRUZADA = analise_cruzada.TABELA_ANALISE_CRUZADA
+# Pontos enviados ao navegador por série, qualquer que seja o tamanho do histórico
+PONTOS_POR_SERIE = int(os.getenv("DASHBOARD_PONTOS_POR_SERIE", "500"))
+MODO_RETORNO = "Retorno acumulado (%)"
+MODO_PRECO = "Preço (R$)"
 
 # --- Painel principal ---
 st.header("📊 Análises Detalhadas")
@@ -133,7 +237,10 @@ st.divider()
 
 # --- Relatório dos agentes ---
 st.subheader("🤖 Relatório da Análise dos Agentes (CrewAI)")
-relatorio_agentes = carregar_relatorio_md(ARQUIVO_RELATORIO_AGENTES)
+relatorio_agentes = carregar_relatorio_md(
+    ARQUIVO_RELATORIO_AGENTES,
+    os.path.getmtime(ARQUIVO_RELATORIO_AGENTES) if os.path.exists(ARQUIVO_RELATORIO_AGENTES) else None,
+)
 with st.expander("Clique para ver o relatório completo", expanded=False):
     st.markdown(relatorio_agentes, unsafe_allow_html=True)
 st.divider()
@@ -143,117 +250,178 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("📈 Top 10 Ações (Últimos 20 dias)")
-    df_acoes = carregar_csv(ARQUIVO_ACOES)
-    if isinstance(df_acoes, pd.DataFrame):
-        if 'ticker' not in df_acoes.columns:
-            st.error(f"Coluna 'ticker' não encontrada no arquivo {os.path.basename(ARQUIVO_ACOES)}.")
-        else:
-            st.markdown(f"Dados de {len(df_acoes['ticker'].unique())} ações carregados.")
-            lista_tickers = sorted(df_acoes['ticker'].unique())
-            if lista_tickers:
-                ticker_selecionado = st.selectbox("Selecione uma ação para ver o gráfico:", lista_tickers)
-                if ticker_selecionado:
-                    df_ticker = df_acoes[df_acoes['ticker'] == ticker_selecionado].copy()
-                    
-                    date_col_acao = None
-                    if 'Unnamed: 0' in df_ticker.columns and pd.api.types.is_datetime64_any_dtype(pd.to_datetime(df_ticker['Unnamed: 0'], errors='coerce')):
-                        date_col_acao = 'Unnamed: 0'
-                    elif 'Data' in df_ticker.columns and pd.api.types.is_datetime64_any_dtype(pd.to_datetime(df_ticker['Data'], errors='coerce')):
-                        date_col_acao = 'Data'
-                    elif 'Date' in df_ticker.columns and pd.api.types.is_datetime64_any_dtype(pd.to_datetime(df_ticker['Date'], errors='coerce')):
-                        date_col_acao = 'Date'
-                    # Add more potential date column names if necessary
-                    
-                    if date_col_acao:
-                        df_ticker['data_plot'] = pd.to_datetime(df_ticker[date_col_acao], errors='coerce')
-                        df_ticker.dropna(subset=['data_plot'], inplace=True)
-                        df_ticker.set_index('data_plot', inplace=True)
-                        df_ticker.sort_index(inplace=True)
+    acoes_por_ticker = indexar_por_grupo(TABELA_ACOES, 'ticker', dados.versao(TABELA_ACOES))
+    # Indicadores técnicos já calculados pela coleta (médias, RSI, MACD, volatilidade),
+    # disponíveis para todo o universo coletado e não só para os destaques. A lista vem
+    # das partições; só as ações escolhidas são lidas do disco
+    versao_tecnicos = dados.versao(TABELA_INDICADORES_TECNICOS)
+    tickers_tecnicos = listar_grupos(TABELA_INDICADORES_TECNICOS, versao_tecnicos)
+    if isinstance(acoes_por_ticker, dict):
+        st.markdown(f"Dados de {len(acoes_por_ticker)} ações em destaque carregados "
+                    f"({len(tickers_tecnicos)} no universo coletado).")
+        # Destaques primeiro, depois o restante do universo em ordem alfabética
+        lista_tickers = list(acoes_por_ticker) + [t for t in tickers_tecnicos if t not in acoes_por_ticker]
+        if lista_tickers:
+            ticker_selecionado = st.selectbox("Selecione uma ação para ver o gráfico:", lista_tickers)
+            if ticker_selecionado:
+                df_tec_ticker = carregar_grupos(TABELA_INDICADORES_TECNICOS, 'ticker', (ticker_selecionado,),
+                                                versao_tecnicos).get(ticker_selecionado)
+                df_ticker = acoes_por_ticker.get(ticker_selecionado)
+                if df_ticker is None:
+                    # Fora dos destaques: a tabela mostra os últimos pregões a partir dos indicadores
+                    df_ticker = df_tec_ticker[['fechamento']].tail(20)
+
+                if df_tec_ticker is not None and not df_tec_ticker.empty:
+                    ultimo = df_tec_ticker.iloc[-1]
+                    m1, m2, m3 = st.columns(3)
+                    m1.metric("RSI (14)", f"{ultimo['rsi_14']:.1f}" if pd.notna(ultimo['rsi_14']) else "-")
+                    m2.metric("MACD (hist.)", f"{ultimo['macd_hist']:.3f}" if pd.notna(ultimo['macd_hist']) else "-")
+                    m3.metric("Volatilidade anual (20d)", f"{ultimo['volatilidade_20']:.1%}" if pd.notna(ultimo['volatilidade_20']) else "-")
+                    # Histórico inteiro, mas só PONTOS_POR_SERIE pontos (LTTB) vão para o navegador
+                    st.line_chart(graficos.reduzir(df_tec_ticker[['fechamento', 'sma_20', 'sma_50']], PONTOS_POR_SERIE))
+                    with st.expander(f"RSI e MACD - {ticker_selecionado}", expanded=False):
+                        st.line_chart(graficos.reduzir(df_tec_ticker[['rsi_14']], PONTOS_POR_SERIE))
+                        st.line_chart(graficos.reduzir(df_tec_ticker[['macd', 'macd_sinal']], PONTOS_POR_SERIE))
+                elif 'fechamento' in df_ticker.columns:
+                    if not df_ticker.empty:
+                        st.line_chart(df_ticker['fechamento'])
                     else:
-                        st.warning("Coluna de data não identificada ou não conversível para o gráfico de ações. Verifique se existe uma coluna como 'Data', 'Date' ou 'Unnamed: 0' (com datas).")
-
-                    if 'fechamento' in df_ticker.columns:
-                        if not df_ticker.empty and date_col_acao:
-                            st.line_chart(df_ticker['fechamento'])
-                        elif not date_col_acao:
-                             pass # Warning already shown
-                        else:
-                            st.info(f"Não há dados de fechamento para plotar para {ticker_selecionado} após processamento.")
-                    else:
-                        st.warning("Coluna 'fechamento' não encontrada para a ação selecionada.")
-                    
-                    with st.expander(f"Ver tabela de dados - {ticker_selecionado}", expanded=False):
-                        st.dataframe(df_acoes[df_acoes['ticker'] == ticker_selecionado], height=300)
-            else:
-                st.info(f"Nenhum ticker disponível no arquivo {os.path.basename(ARQUIVO_ACOES)}.")
-    elif isinstance(df_acoes, str):
-        st.error(df_acoes)
-    # No explicit else for df_acoes is None, as carregar_csv now returns a string for not found.
+                        st.info(f"Não há dados de fechamento para plotar para {ticker_selecionado} após processamento.")
+                else:
+                    st.warning("Coluna 'fechamento' não encontrada para a ação selecionada.")
+
+                with st.expander(f"Ver tabela de dados - {ticker_selecionado}", expanded=False):
+                    st.dataframe(df_ticker, height=300)
+        else:
+            st.info(f"Nenhum ticker disponível na tabela {TABELA_ACOES}.")
+    else:
+        st.error(acoes_por_ticker)
 
 with col2:
     st.subheader("📉 Índices Econômicos (IPCA, SELIC, PIB, Dólar, etc.)")
-    df_indicadores = carregar_csv(ARQUIVO_INDICADORES_ECONOMICOS)
-    
-    if isinstance(df_indicadores, pd.DataFrame):
-        # Check for required columns based on the CSV structure
-        required_cols = ['data', 'valor', 'indicador']
-        if not all(col in df_indicadores.columns for col in required_cols):
-            st.error(f"O arquivo {os.path.basename(ARQUIVO_INDICADORES_ECONOMICOS)} deve conter as colunas: {', '.join(required_cols)}.")
+    series_por_indicador = indexar_por_grupo(TABELA_INDICADORES_ECONOMICOS, 'indicador',
+                                             dados.versao(TABELA_INDICADORES_ECONOMICOS))
+
+    if isinstance(series_por_indicador, dict):
+        lista_de_indicadores = list(series_por_indicador)
+
+        if not lista_de_indicadores:
+            st.warning("Nenhum indicador único encontrado na coluna 'indicador'.")
         else:
-            try:
-                # Convert 'data' column to datetime
-                df_indicadores['data'] = pd.to_datetime(df_indicadores['data'], errors='coerce')
-                df_indicadores.dropna(subset=['data'], inplace=True) # Remove rows where date conversion failed
+            indicador_selecionado = st.selectbox(
+                "Selecione o índice para visualização:",
+                lista_de_indicadores,
+                help="Escolha um dos indicadores econômicos disponíveis no arquivo."
+            )
+
+            if indicador_selecionado:
+                df_plot = series_por_indicador[indicador_selecionado]
 
-                if df_indicadores.empty:
-                    st.warning("Não há dados válidos após a conversão de datas.")
+                if df_plot.empty or df_plot['valor'].isnull().all():
+                    st.info(f"Não há valores numéricos válidos para plotar para o indicador '{indicador_selecionado}'.")
                 else:
-                    lista_de_indicadores = sorted(df_indicadores['indicador'].unique())
-                    
-                    if not lista_de_indicadores:
-                        st.warning("Nenhum indicador único encontrado na coluna 'indicador'.")
-                    else:
-                        indicador_selecionado = st.selectbox(
-                            "Selecione o índice para visualização:",
-                            lista_de_indicadores,
-                            help="Escolha um dos indicadores econômicos disponíveis no arquivo."
-                        )
-
-                        if indicador_selecionado:
-                            df_plot = df_indicadores[df_indicadores['indicador'] == indicador_selecionado].copy()
-                            
-                            if df_plot.empty:
-                                st.info(f"Não há dados para o indicador '{indicador_selecionado}'.")
-                            else:
-                                # Ensure 'valor' column is numeric
-                                if not pd.api.types.is_numeric_dtype(df_plot['valor']):
-                                    st.warning(f"A coluna 'valor' para o indicador '{indicador_selecionado}' não é numérica. Tentando converter...")
-                                    df_plot['valor'] = pd.to_numeric(df_plot['valor'], errors='coerce')
-                                    df_plot.dropna(subset=['valor'], inplace=True) # Drop rows where conversion failed
-                                
-                                if df_plot.empty or df_plot['valor'].isnull().all():
-                                     st.info(f"Não há valores numéricos válidos para plotar para o indicador '{indicador_selecionado}'.")
-                                else:
-                                    df_plot.sort_values(by='data', inplace=True)
-                                    df_plot.set_index('data', inplace=True)
-                                    st.line_chart(df_plot['valor'])
-
-                                    with st.expander(f"Ver tabela de dados - {indicador_selecionado}", expanded=False):
-                                        st.dataframe(df_indicadores[df_indicadores['indicador'] == indicador_selecionado], height=300)
-                        else:
-                            st.info("Por favor, selecione um indicador para visualização.")
-            except Exception as e:
-                st.error(f"Erro ao processar os dados dos indicadores econômicos: {e}")
-                
-    elif isinstance(df_indicadores, str): # Error message or "not found" from carregar_csv
-        st.error(df_indicadores)
-    # No explicit else for df_indicadores is None, as carregar_csv now returns a string.
+                    st.line_chart(graficos.reduzir(df_plot[['valor']], PONTOS_POR_SERIE))
+
+                    with st.expander(f"Ver tabela de dados - {indicador_selecionado}", expanded=False):
+                        st.dataframe(df_plot, height=300)
+            else:
+                st.info("Por favor, selecione um indicador para visualização.")
+
+    else: # Error message or "not found" from indexar_por_grupo
+        st.error(series_por_indicador)
+
+st.divider()
+
+# --- Comparação de ações: várias séries no mesmo gráfico, reduzidas no servidor ---
+@st.cache_data(max_entries=32)
+def serie_comparativa(tickers, inicio, fim, modo, pontos, versao):
+    """Fechamentos (ou retornos acumulados) da janela, reduzidos por LTTB, em formato longo.
+
+    Só a janela escolhida é recortada e reduzida. Retorna também o total de pontos da janela.
+    """
+    por_ticker = carregar_grupos(TABELA_INDICADORES_TECNICOS, 'ticker', tickers, versao)
+    fechamentos = pd.DataFrame({
+        ticker: por_ticker[ticker]['fechamento'].loc[pd.Timestamp(inicio):pd.Timestamp(fim)]
+        for ticker in tickers if ticker in por_ticker
+    }).sort_index().astype(float)
+    if modo == MODO_RETORNO:
+        fechamentos = graficos.retornos_acumulados(fechamentos)
+    return graficos.reduzir_series(fechamentos, pontos), int(fechamentos.notna().sum().sum())
+
+st.subheader("📊 Comparação de Ações")
+if tickers_tecnicos:
+    destaques = [t for t in acoes_por_ticker if t in tickers_tecnicos] if isinstance(acoes_por_ticker, dict) else []
+    selecionados = st.multiselect("Ações no gráfico:", tickers_tecnicos, default=destaques[:3])
+    modo = st.radio("Escala:", [MODO_RETORNO, MODO_PRECO], horizontal=True,
+                    help="Retorno acumulado parte de 0% no início do período para todas as ações.")
+    selecionados_com_dados = carregar_grupos(TABELA_INDICADORES_TECNICOS, 'ticker', tuple(selecionados),
+                                             versao_tecnicos)
+    if selecionados_com_dados:
+        primeira = min(df.index.min() for df in selecionados_com_dados.values()).date()
+        ultima = max(df.index.max() for df in selecionados_com_dados.values()).date()
+        inicio_padrao = max(primeira, (pd.Timestamp(ultima) - pd.Timedelta(days=365)).date())
+        inicio, fim = st.slider("Período:", min_value=primeira, max_value=ultima, value=(inicio_padrao, ultima),
+                                format="DD/MM/YYYY")
+        df_comparacao, total_pontos = serie_comparativa(tuple(selecionados), inicio, fim, modo, PONTOS_POR_SERIE,
+                                                        versao_tecnicos)
+        grafico = alt.Chart(df_comparacao).mark_line().encode(
+            x=alt.X('data:T', title=None),
+            y=alt.Y('valor:Q', title=modo, scale=alt.Scale(zero=False)),
+            color=alt.Color('serie:N', title='ação'),
+            tooltip=[alt.Tooltip('serie:N', title='ação'), alt.Tooltip('data:T', format='%d/%m/%Y'),
+                     alt.Tooltip('valor:Q', format='.2f')],
+        ).interactive(bind_y=False)  # zoom e arraste no eixo do tempo
+        st.altair_chart(grafico, use_container_width=True)
+        st.caption(f"{len(df_comparacao)} de {total_pontos} pontos desenhados "
+                   f"(até {PONTOS_POR_SERIE} por ação, escolhidos por LTTB para manter o formato das curvas).")
+    else:
+        st.info("Selecione ao menos uma ação para comparar.")
+else:
+    st.info(f"Nenhum ticker disponível na tabela {TABELA_INDICADORES_TECNICOS}.")
+
+st.divider()
+
+# --- Ações x macro: correlações e betas móveis materializados pela análise cruzada ---
+@st.cache_data(max_entries=4)
+def carregar_sensibilidades(versao):
+    # Só as últimas semanas: basta a leitura mais recente de cada ticker
+    recentes = analise_cruzada.carregar_analise(desde=pd.Timestamp.today().normalize() - pd.Timedelta(days=31))
+    return analise_cruzada.sensibilidades_recentes(recentes)
+
+st.subheader("🔗 Ações x Dólar, Commodities e Selic")
+df_sensibilidades = carregar_sensibilidades(dados.versao(TABELA_ANALISE_CRUZADA))
+if df_sensibilidades.empty:
+    st.info("Análise cruzada ainda sem dados: ela é recalculada quando chegam preços ou indicadores novos.")
+else:
+    todo_universo = st.toggle("Todo o universo coletado", value=False,
+                              help="Desligado, mostra só as ações em destaque (maior volume).")
+    if not todo_universo and isinstance(acoes_por_ticker, dict):
+        df_sensibilidades = df_sensibilidades[df_sensibilidades['ticker'].isin(list(acoes_por_ticker))]
+    fatores = list(analise_cruzada.FATORES)
+    mapa = pd.DataFrame({
+        'ticker': np.repeat(df_sensibilidades['ticker'].to_numpy(), len(fatores)),
+        'fator': np.tile(fatores, len(df_sensibilidades)),
+        'correlacao': df_sensibilidades[[f"corr_{f}" for f in fatores]].to_numpy().ravel(),
+        'beta': df_sensibilidades[[f"beta_{f}" for f in fatores]].to_numpy().ravel(),
+    })
+    grafico = alt.Chart(mapa).mark_rect().encode(
+        x=alt.X('fator:N', title=None, sort=fatores),
+        y=alt.Y('ticker:N', title=None),
+        color=alt.Color('correlacao:Q', scale=alt.Scale(scheme='redblue', domain=[-1, 1], reverse=True),
+                        title='correlação'),
+        tooltip=['ticker', 'fator', alt.Tooltip('correlacao:Q', format='.2f'), alt.Tooltip('beta:Q', format='.2f')],
+    ).properties(height=max(200, 18 * df_sensibilidades['ticker'].nunique()))
+    st.altair_chart(grafico, use_container_width=True)
+    st.caption("Dólar: retornos diários em 63 pregões. Commodities e Selic: retornos mensais em 24 meses. "
+               "Beta = % de retorno da ação por 1% do fator (ou por 1 p.p. de Selic).")
+    with st.expander("Ver correlações e betas", expanded=False):
+        st.dataframe(df_sensibilidades.set_index('ticker').round(2), height=300)
 
 st.divider()
 
 # --- Notícias Recentes ---
 st.subheader("📰 Top 10 Notícias de Investimento")
-df_noticias = carregar_csv(ARQUIVO_NOTICIAS)
+df_noticias = carregar_tabela(TABELA_NOTICIAS, dados.versao(TABELA_NOTICIAS))
 if isinstance(df_noticias, pd.DataFrame):
     if 'titulo' in df_noticias.columns and 'link' in df_noticias.columns:
         for _, row in df_noticias.head(min(10, len(df_noticias))).iterrows():
@@ -265,10 +433,55 @@ if isinstance(df_noticias, pd.DataFrame):
                 st.caption("Link não disponível.")
             st.markdown("---")
     else:
-        st.warning(f"Colunas 'titulo' e 'link' não encontradas no arquivo {os.path.basename(ARQUIVO_NOTICIAS)}. Exibindo primeiras 10 linhas se disponíveis.")
+        st.warning(f"Colunas 'titulo' e 'link' não encontradas na tabela {TABELA_NOTICIAS}. Exibindo primeiras 10 linhas se disponíveis.")
         st.dataframe(df_noticias.head(10))
 elif isinstance(df_noticias, str):
     st.error(df_noticias)
 
+# --- Operações: onde o tempo está indo (coletas, parsing, LLM e o próprio painel) ---
+# Lido no máximo a cada 30 s: o arquivo cresce a cada interação
+@st.cache_data(ttl=30, max_entries=4)
+def carregar_metricas(horas):
+    return resumir_por_estagio(ler_metricas(pd.Timedelta(hours=horas)))
+
+with st.expander("🛠️ Operações: tempo por estágio", expanded=False):
+    janelas = {"Última hora": 1, "Últimas 24 horas": 24, "Últimos 7 dias": 24 * 7}
+    janela_selecionada = st.radio("Janela", list(janelas), index=1, horizontal=True)
+    resumo_metricas = carregar_metricas(janelas[janela_selecionada])
+    if resumo_metricas.empty:
+        st.info("Nenhuma medição registrada nesta janela. Rode as coletas ou o agendador.")
+    else:
+        st.caption("Duração em ms; estágios http.* incluem novas tentativas, espera.* é o tempo parado no limitador de taxa.")
+        st.dataframe(resumo_metricas.round({"p50_ms": 0, "p95_ms": 0}), hide_index=True)
+
 # --- Rodapé ---
-st.sidebar.info(f"Painel atualizado em: {pd.Timestamp.now().strftime('%d/%m/%Y %H:%M:%S')}")
\ No newline at end of file
+st.sidebar.info(f"Painel atualizado em: {pd.Timestamp.now().strftime('%d/%m/%Y %H:%M:%S')}")
+
+# Com o agendador rodando, cada fonte mostra a idade dos dados exibidos (a última versão completa)
+estado_agendador = ler_estado_agendador()
+if estado_agendador:
+    linhas_atualizacao = []
+    for fonte, registro in sorted(estado_agendador.items()):
+        sucesso = registro.get("ultimo_sucesso")
+        momento = pd.Timestamp(sucesso) if sucesso else None
+        idade = f"há {(pd.Timestamp.now(tz=momento.tz) - momento).total_seconds() / 60:.0f} min" if sucesso else "ainda não coletada"
+        marcador = " 🔄 atualizando" if registro.get("em_andamento") else (" ⚠️ última tentativa falhou" if registro.get("status") else "")
+        linhas_atualizacao.append(f"- **{fonte}**: {idade}{marcador}")
+    st.sidebar.markdown("**Atualização dos dados:**\n" + "\n".join(linhas_atualizacao))
+
+estatisticas_cache = obter_cache_respostas().estatisticas()
+if estatisticas_cache["acertos"] + estatisticas_cache["coalescidas"] + estatisticas_cache["falhas"]:
+    st.sidebar.caption(
+        f"💾 Cache do chat: {estatisticas_cache['taxa_acerto']:.0%} de acertos, "
+        f"{estatisticas_cache['economia_s']:.1f} s de espera economizados"
+    )
+
+# --- Tempo de execução do script (primeira carga da sessão ou nova interação) ---
+duracao_ms = (time.perf_counter() - INICIO_EXECUCAO) * 1000
+tipo_execucao = "nova interação" if st.session_state.get("ja_executou") else "primeira carga"
+st.session_state.ja_executou = True
+registrar("dashboard.rerun", duracao_ms, tipo=tipo_execucao)
+if duracao_ms > META_EXECUCAO_MS:
+    st.sidebar.warning(f"⏱️ {tipo_execucao}: {duracao_ms:.0f} ms (meta: {META_EXECUCAO_MS:.0f} ms)")
+else:
+    st.sidebar.caption(f"⏱️ {tipo_execucao}: {duracao_ms:.0f} ms (meta: {META_EXECUCAO_MS:.0f} ms)")
\ No newline at end of file
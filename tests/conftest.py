@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Os scripts importam uns aos outros pelo nome do módulo (ex.: "import dados")
+DIRETORIO_SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+if DIRETORIO_SCRIPTS not in sys.path:
+    sys.path.insert(0, DIRETORIO_SCRIPTS)
+
+# Os caminhos (métricas, cota, cache) são lidos na importação: os testes nunca gravam em data/
+os.environ["AGENTES_DADOS_DIR"] = tempfile.mkdtemp(prefix="agentes-testes-")
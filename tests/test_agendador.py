@@ -0,0 +1,68 @@
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+import agendador
+import dados
+from agendador import Agendador
+
+
+@pytest.fixture
+def diretorio_dados(tmp_path, monkeypatch):
+    monkeypatch.setattr(dados, "DIRETORIO_DADOS", str(tmp_path))
+    return tmp_path
+
+
+def _modulo(monkeypatch, nome, main):
+    modulo = types.ModuleType(nome)
+    modulo.main = main
+    monkeypatch.setitem(sys.modules, nome, modulo)
+
+
+def _gravar_precos(dia):
+    dados.acrescentar("precos", pd.DataFrame({
+        "data": [pd.Timestamp(dia)], "abertura": 1.0, "alta": 1.0, "baixa": 1.0, "fechamento": 1.0,
+        "volume": 1, "ticker": "PETR4"}))
+
+
+def test_derivada_roda_depois_das_coletas_e_so_quando_as_entradas_mudam(diretorio_dados, monkeypatch):
+    execucoes = []
+    _modulo(monkeypatch, "coleta_simulada", lambda: _gravar_precos("2025-05-08"))
+    _modulo(monkeypatch, "derivada_simulada", lambda: execucoes.append("derivada"))
+    fontes = {"acoes": ("coleta_simulada", lambda ultima, agora: ultima is None, ["precos"])}
+    derivadas = {"analise_cruzada": ("derivada_simulada", ["precos", "indicadores_economicos"], ["analise_cruzada"])}
+    agenda = Agendador(fontes, str(diretorio_dados / "estado.json"), derivadas=derivadas)
+
+    # Primeiro as coletas; a derivada espera as entradas pararem de mudar
+    assert agenda.verificar() == ["acoes"]
+    agenda.aguardar()
+    assert execucoes == []
+
+    assert agenda.verificar() == ["analise_cruzada"]
+    agenda.aguardar()
+    assert execucoes == ["derivada"]
+    # Sem linhas novas na saída, mas as entradas foram processadas: não roda de novo
+    assert agenda.estado["analise_cruzada"]["sem_novidades"]
+    assert agenda.verificar() == []
+
+    _gravar_precos("2025-05-09")
+    assert agenda.verificar() == ["analise_cruzada"]
+    agenda.aguardar()
+    assert execucoes == ["derivada", "derivada"]
+
+
+def test_derivada_que_falhou_espera_antes_de_tentar_de_novo(diretorio_dados, monkeypatch):
+    def falhar():
+        raise RuntimeError("indicadores sem cobertura")
+
+    _modulo(monkeypatch, "derivada_com_falha", falhar)
+    derivadas = {"analise_cruzada": ("derivada_com_falha", ["precos"], ["analise_cruzada"])}
+    agenda = Agendador({}, str(diretorio_dados / "estado.json"), derivadas=derivadas)
+
+    assert agenda.verificar() == ["analise_cruzada"]
+    agenda.aguardar()
+    assert agenda.verificar() == []
+    assert agenda.verificar(agendador.agora_b3() + agendador.ESPERA_APOS_FALHA) == ["analise_cruzada"]
+    agenda.aguardar()
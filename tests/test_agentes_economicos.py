@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+# Precisa do CrewAI instalado (requirements.txt); sem ele, só estes testes ficam de fora
+pytest.importorskip("crewai")
+pytest.importorskip("crewai_tools")
+
+from crewai import Agent
+from crewai.llms.base_llm import BaseLLM, call_stop_override
+
+from agentes_economicos import LLMComCache
+from cache_llm import CacheDisco
+from registro_execucao import ContadorTokens, RegistroExecucao
+
+MENSAGENS = [{"role": "user", "content": "Qual a tendência da Selic?"}]
+
+
+class LLMSimulado(BaseLLM):
+    """LLM real do CrewAI trocado por um que responde na hora e soma o uso como o provedor Azure."""
+
+    chamadas: int = 0
+    paradas_vistas: list = []
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None,
+             from_agent=None, response_model=None):
+        self.chamadas += 1
+        self.paradas_vistas.append(self.stop_sequences)
+        self._track_token_usage_internal({"prompt_tokens": 12, "completion_tokens": 5, "total_tokens": 17})
+        return f"resposta {self.chamadas}"
+
+
+def _llm_com_cache(tmp_path, **kwargs):
+    criados = []
+
+    def fabrica():
+        llm = LLMSimulado(model="azure/simulado", temperature=0.3)
+        criados.append(llm)
+        return llm
+
+    llm = LLMComCache(model="azure/simulado", temperature=0.3, cache=CacheDisco(str(tmp_path / "cache")),
+                      fabrica=fabrica, **kwargs)
+    return llm, criados
+
+
+def test_agente_usa_o_llm_com_cache_como_esta(tmp_path):
+    llm, _ = _llm_com_cache(tmp_path)
+    agente = Agent(role="Analista", goal="Analisar", backstory="Economista", llm=llm)
+    assert agente.llm is llm
+
+
+def test_prompt_repetido_sai_do_cache(tmp_path):
+    llm, criados = _llm_com_cache(tmp_path)
+
+    assert llm.call(MENSAGENS) == "resposta 1"
+    assert llm.call(MENSAGENS) == "resposta 1"
+
+    assert [c.chamadas for c in criados] == [1]
+
+
+def test_palavras_de_parada_da_chamada_chegam_ao_llm_real(tmp_path):
+    llm, criados = _llm_com_cache(tmp_path)
+
+    with call_stop_override(llm, ["\nObservation:"]):
+        llm.call(MENSAGENS)
+
+    assert criados[0].paradas_vistas == [["\nObservation:"]]
+
+
+def test_cada_thread_tem_o_seu_llm_real(tmp_path):
+    llm, criados = _llm_com_cache(tmp_path)
+    threads = [threading.Thread(target=llm.call, args=([{"role": "user", "content": f"pergunta {i}"}],))
+               for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(criados) == 3
+    assert all(c.chamadas == 1 for c in criados)
+
+
+def test_tokens_contam_so_chamadas_ao_modelo(tmp_path):
+    registro = RegistroExecucao(str(tmp_path / "execucoes"))
+    llm, _ = _llm_com_cache(tmp_path, contador=ContadorTokens(registro))
+
+    with registro.etapa("analise_cenario") as etapa:
+        llm.call(MENSAGENS)
+        llm.call(MENSAGENS)  # acerto do cache: não é chamada ao modelo
+
+    assert (etapa["chamadas_llm"], etapa["tokens_prompt"], etapa["tokens_resposta"]) == (1, 12, 5)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from analise_cruzada import calcular_analise, estatisticas_moveis, painel_alinhado
+
+
+def _series(t=250, n=3, semente=11):
+    rng = np.random.default_rng(semente)
+    fator = rng.normal(0, 0.01, t)
+    retornos = 0.8 * fator[:, None] * np.arange(1, n + 1) + rng.normal(0, 0.01, (t, n))
+    # Lacunas em cada ação e no fator, inclusive um trecho longo sem pregões
+    retornos[rng.random((t, n)) < 0.1] = np.nan
+    retornos[100:140, 2] = np.nan
+    fator[rng.random(t) < 0.05] = np.nan
+    return retornos, fator
+
+
+def _ingenuo(retornos, fator, janela, minimo):
+    """Correlação e beta móveis pelo pandas, só com as linhas em que ação e fator têm valor."""
+    x = pd.Series(fator)
+    correlacoes, betas = [], []
+    for coluna in range(retornos.shape[1]):
+        y = pd.Series(retornos[:, coluna])
+        xm, ym = x.where(y.notna()), y.where(x.notna())
+        correlacoes.append(ym.rolling(janela, min_periods=minimo).corr(xm))
+        betas.append(ym.rolling(janela, min_periods=minimo).cov(xm) / xm.rolling(janela, min_periods=minimo).var())
+    return pd.concat(correlacoes, axis=1).to_numpy(), pd.concat(betas, axis=1).to_numpy()
+
+
+def test_estatisticas_moveis_batem_com_o_calculo_do_pandas():
+    retornos, fator = _series()
+
+    correlacao, beta = estatisticas_moveis(retornos, fator, janela=63, minimo=37)
+    esperada_corr, esperado_beta = _ingenuo(retornos, fator, 63, 37)
+
+    assert np.array_equal(np.isnan(beta), np.isnan(esperado_beta))
+    assert np.allclose(beta, esperado_beta, equal_nan=True, rtol=1e-6, atol=1e-9)
+    assert np.allclose(correlacao, esperada_corr, equal_nan=True, rtol=1e-6, atol=1e-9)
+    # O beta recupera a sensibilidade usada na simulação (0,8, 1,6 e 2,4)
+    assert np.allclose(beta[-1], [0.8, 1.6, 2.4], atol=0.4)
+
+
+def test_janela_sem_cobertura_ou_fator_parado_vira_lacuna():
+    retornos, fator = _series()
+    fator[150:220] = 0.0
+
+    correlacao, beta = estatisticas_moveis(retornos, fator, janela=63, minimo=37)
+
+    assert np.isnan(beta[:36]).all()
+    assert np.isnan(beta[215]).all() and np.isnan(correlacao[215]).all()
+    assert np.isfinite(beta[-1]).all()
+
+
+def test_painel_repete_a_observacao_so_dentro_da_validade():
+    indicadores = pd.DataFrame({
+        "data": pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-20"]),
+        "indicador": ["SELIC", "DÓLAR", "DÓLAR"],
+        "valor": [12.25, 6.1, 5.9],
+    })
+    calendario = pd.bdate_range("2025-01-02", "2025-01-21")
+
+    painel = painel_alinhado(indicadores, calendario)
+
+    assert (painel["SELIC"] == 12.25).all()
+    # Dólar vale por 7 dias corridos: do dia 10 ao 17 fica sem valor
+    assert painel.loc["2025-01-09", "DÓLAR"] == 6.1
+    assert painel.loc["2025-01-10":"2025-01-17", "DÓLAR"].isna().all()
+    assert painel.loc["2025-01-20", "DÓLAR"] == 5.9
+
+
+def test_fator_mensal_vale_a_partir_do_mes_seguinte():
+    calendario = pd.bdate_range("2020-01-01", "2023-12-31")
+    rng = np.random.default_rng(3)
+    selic = pd.Series(np.cumsum(rng.normal(0, 0.25, len(calendario))) + 10, index=calendario)
+    fechamentos = pd.DataFrame({"PETR4": 30 * np.exp(np.cumsum(rng.normal(0, 0.01, len(calendario))))},
+                               index=calendario)
+
+    resultados = calcular_analise(fechamentos, pd.DataFrame({"SELIC": selic}))
+
+    beta = resultados["beta_selic"]["PETR4"]
+    assert set(resultados) == {"corr_selic", "beta_selic"}
+    # Constante dentro de cada mês e igual à estatística do mês anterior já fechado
+    assert (beta.groupby(beta.index.to_period("M")).nunique(dropna=False) == 1).all()
+    mensal = np.log(fechamentos.resample("ME").last()).diff()
+    _, esperado = estatisticas_moveis(mensal.to_numpy(), selic.resample("ME").last().diff().to_numpy(), 24, 14)
+    assert np.isclose(beta.loc["2023-07-03"], esperado[mensal.index.get_loc(pd.Timestamp("2023-06-30")), 0])
@@ -0,0 +1,66 @@
+import json
+
+import pandas as pd
+import pytest
+
+import armazem_precos
+import dados
+
+
+@pytest.fixture
+def diretorio_dados(tmp_path, monkeypatch):
+    monkeypatch.setattr(dados, "DIRETORIO_DADOS", str(tmp_path))
+    monkeypatch.setattr(armazem_precos, "ARQUIVO_INDICE", str(tmp_path / "precos_indice.json"))
+    return tmp_path
+
+
+def _visao_legada(caminho):
+    # Mesmo formato do top_10_acoes.csv gravado pela versão anterior: datas no índice sem nome
+    linhas = pd.DataFrame({
+        "abertura": [30.59, 31.1, 31.1, 58.0], "alta": [31.03, 31.18, 31.18, 59.0],
+        "baixa": [30.45, 30.64, 30.64, 57.5], "fechamento": [30.71, 30.91, 30.91, 58.4],
+        "volume": [44665000.0, 25075600.0, 25075600.0, 1000.0], "ticker": ["PETR4", "PETR4", "PETR4", "VALE3"],
+    }, index=["2025-05-08", "2025-05-09", "2025-05-09", "2025-05-09"])
+    linhas.to_csv(caminho, encoding="utf-8-sig")
+
+
+def test_migracao_importa_o_historico_da_visao_recente(diretorio_dados):
+    _visao_legada(diretorio_dados / "top_10_acoes.csv")
+
+    indice = armazem_precos.carregar_indice()
+
+    historico = armazem_precos.ler_historico()
+    assert len(historico) == 3
+    assert historico.loc[historico["ticker"] == "PETR4", "fechamento"].tolist() == pytest.approx([30.71, 30.91])
+    assert indice["PETR4"]["ultima_data"] == "2025-05-09"
+    assert indice["VALE3"]["ultima_data"] == "2025-05-09"
+    # A visão recente antiga continua legível até a próxima coleta regravá-la
+    assert (diretorio_dados / "top_10_acoes.csv").exists()
+
+
+def test_migracao_une_csv_por_ticker_e_visao_sem_duplicar(diretorio_dados):
+    _visao_legada(diretorio_dados / "top_10_acoes.csv")
+    (diretorio_dados / "precos").mkdir()
+    pd.DataFrame({"data": ["2025-05-07", "2025-05-08"], "abertura": 30.0, "alta": 30.0, "baixa": 30.0,
+                  "fechamento": 30.0, "volume": 10}).to_csv(diretorio_dados / "precos" / "PETR4.csv", index=False)
+    with open(diretorio_dados / "precos" / "indice.json", "w", encoding="utf-8") as f:
+        json.dump({"PETR4": {"ultima_data": "2025-05-08"}}, f)
+
+    indice = armazem_precos.carregar_indice()
+
+    petr4 = armazem_precos.ler_historico(["PETR4"])
+    assert petr4.index.strftime("%Y-%m-%d").tolist() == ["2025-05-07", "2025-05-08", "2025-05-09"]
+    # O CSV por ticker vale para as datas que ele já tinha
+    assert petr4["fechamento"].tolist() == pytest.approx([30.0, 30.0, 30.91])
+    assert indice["PETR4"]["ultima_data"] == "2025-05-09"
+    assert not (diretorio_dados / "precos" / "PETR4.csv").exists()
+
+
+def test_migracao_nao_reimporta_depois_da_primeira_carga(diretorio_dados):
+    _visao_legada(diretorio_dados / "top_10_acoes.csv")
+    armazem_precos.carregar_indice()
+    partes = dados.versao("precos")
+
+    armazem_precos.carregar_indice()
+
+    assert dados.versao("precos") == partes
@@ -0,0 +1,87 @@
+import os
+
+import cache_llm
+from cache_llm import CacheDisco, chamar_com_cache
+
+
+class LLMSimulado:
+    """Mesmo método `call` do LLM do CrewAI; conta quantas vezes o modelo foi chamado."""
+
+    model = "azure/simulado"
+
+    def __init__(self):
+        self.chamadas = 0
+
+    def call(self, messages, tools=None, **kwargs):
+        self.chamadas += 1
+        return f"resposta {self.chamadas}"
+
+
+MENSAGENS = [{"role": "user", "content": "Qual a tendência da Selic?"}]
+
+
+def test_chamadas_identicas_vao_uma_vez_ao_modelo(tmp_path):
+    cache, llm = CacheDisco(str(tmp_path)), LLMSimulado()
+
+    primeira = chamar_com_cache(cache, llm, MENSAGENS, parametros={"temperature": 0.3})
+    segunda = chamar_com_cache(cache, llm, MENSAGENS, parametros={"temperature": 0.3})
+
+    assert llm.chamadas == 1
+    assert primeira == segunda == "resposta 1"
+    assert cache.estatisticas()["llm"]["acertos"] == 1
+
+
+def test_parametros_ou_mensagens_diferentes_nao_reaproveitam(tmp_path):
+    cache, llm = CacheDisco(str(tmp_path)), LLMSimulado()
+
+    chamar_com_cache(cache, llm, MENSAGENS, parametros={"temperature": 0.3})
+    chamar_com_cache(cache, llm, MENSAGENS, parametros={"temperature": 0.7})
+    chamar_com_cache(cache, llm, MENSAGENS + [{"role": "user", "content": "E o IPCA?"}],
+                     parametros={"temperature": 0.3})
+
+    assert llm.chamadas == 3
+
+
+def test_entrada_expira_pelo_ttl(tmp_path, monkeypatch):
+    agora = [1_000_000.0]
+    monkeypatch.setattr(cache_llm.time, "time", lambda: agora[0])
+    cache, llm = CacheDisco(str(tmp_path), ttl_por_tipo={"llm": 60}), LLMSimulado()
+
+    chamar_com_cache(cache, llm, MENSAGENS)
+    agora[0] += 59
+    chamar_com_cache(cache, llm, MENSAGENS)
+    assert llm.chamadas == 1
+
+    agora[0] += 2
+    assert chamar_com_cache(cache, llm, MENSAGENS) == "resposta 2"
+    assert llm.chamadas == 2
+
+
+def test_despejo_remove_as_entradas_usadas_ha_mais_tempo(tmp_path):
+    cache = CacheDisco(str(tmp_path), tamanho_maximo_bytes=10_000)
+    chaves = [cache.chave("llm", i) for i in range(5)]
+    for i, chave in enumerate(chaves):
+        cache.gravar("llm", chave, "x" * 3_000)
+        # Último uso em ordem crescente, independente da resolução do relógio do sistema de arquivos
+        os.utime(cache._caminho(chave), (1_000 + i, 1_000 + i))
+
+    cache.gravar("llm", cache.chave("llm", "nova"), "x" * 3_000)
+
+    restantes = {e.name for e in os.scandir(tmp_path) if e.name.endswith(".json")}
+    assert sum(os.path.getsize(tmp_path / nome) for nome in restantes) <= 10_000
+    assert f"{chaves[0]}.json" not in restantes
+    assert f"{cache.chave('llm', 'nova')}.json" in restantes
+
+
+def test_resposta_que_nao_e_texto_nao_e_guardada(tmp_path):
+    cache = CacheDisco(str(tmp_path))
+
+    class LLMComFerramenta(LLMSimulado):
+        def call(self, messages, tools=None, **kwargs):
+            self.chamadas += 1
+            return [{"function": {"name": "busca", "arguments": "{}"}}]
+
+    llm = LLMComFerramenta()
+    chamar_com_cache(cache, llm, MENSAGENS, tools=[{"function": {"name": "busca"}}])
+    chamar_com_cache(cache, llm, MENSAGENS, tools=[{"function": {"name": "busca"}}])
+    assert llm.chamadas == 2
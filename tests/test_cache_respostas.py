@@ -0,0 +1,149 @@
+import threading
+
+import pytest
+
+import cache_respostas
+from cache_respostas import CacheRespostas
+
+
+class InterrupcaoSessao(BaseException):
+    """Como o st.stop/rerun do Streamlit: interrompe a sessão sem ser erro da geração."""
+
+
+@pytest.fixture
+def esperando(monkeypatch):
+    """Evento disparado quando algum pedido passa a esperar por uma geração em andamento."""
+    evento = threading.Event()
+
+    class EventoObservado(threading.Event):
+        def wait(self, timeout=None):
+            evento.set()
+            return super().wait(timeout)
+
+    class PendenteObservado(cache_respostas._Pendente):
+        def __init__(self):
+            super().__init__()
+            self.pronta = EventoObservado()
+
+    monkeypatch.setattr(cache_respostas, "_Pendente", PendenteObservado)
+    return evento
+
+
+def _em_paralelo(funcao):
+    """Roda `funcao` numa thread e guarda o retorno ou a exceção."""
+    resultado = {}
+
+    def executar():
+        try:
+            resultado["valor"] = funcao()
+        except BaseException as e:
+            resultado["erro"] = e
+
+    thread = threading.Thread(target=executar)
+    thread.start()
+    return thread, resultado
+
+
+def _geracao_controlada(resposta=None, erro=None):
+    iniciada, liberar = threading.Event(), threading.Event()
+
+    def gerar():
+        iniciada.set()
+        assert liberar.wait(5)
+        if erro is not None:
+            raise erro
+        return resposta
+
+    return gerar, iniciada, liberar
+
+
+def test_chave_normaliza_a_pergunta_e_separa_versao_e_historico():
+    chave = CacheRespostas.chave("Qual a tendência da SELIC?", ("v", 1))
+
+    assert chave == CacheRespostas.chave("qual a tendencia da selic", ("v", 1))
+    assert chave != CacheRespostas.chave("qual a tendencia da selic", ("v", 2))
+    assert chave != CacheRespostas.chave("qual a tendencia da selic", ("v", 1), historico=[("usuario", "oi")])
+
+
+def test_pedido_identico_durante_a_geracao_espera_e_recebe_a_mesma_resposta(esperando):
+    cache = CacheRespostas()
+    gerar, iniciada, liberar = _geracao_controlada(resposta="Selic estável")
+    lider, resultado_lider = _em_paralelo(lambda: cache.obter_ou_gerar("k", gerar))
+    assert iniciada.wait(5)
+
+    chamadas_segundo = []
+    seguidor, resultado_seguidor = _em_paralelo(
+        lambda: cache.obter_ou_gerar("k", lambda: chamadas_segundo.append(1) or "outra"))
+    assert esperando.wait(5)
+    liberar.set()
+    lider.join(5)
+    seguidor.join(5)
+
+    assert resultado_lider["valor"] == ("Selic estável", "gerada")
+    assert resultado_seguidor["valor"] == ("Selic estável", "coalescida")
+    assert chamadas_segundo == []
+    assert cache.obter_ou_gerar("k", lambda: "outra") == ("Selic estável", "cache")
+    estatisticas = cache.estatisticas()
+    assert (estatisticas["falhas"], estatisticas["coalescidas"], estatisticas["acertos"]) == (1, 1, 1)
+
+
+def test_quem_espera_assume_a_geracao_se_o_lider_for_interrompido(esperando):
+    cache = CacheRespostas()
+    gerar, iniciada, liberar = _geracao_controlada(erro=InterrupcaoSessao())
+    lider, resultado_lider = _em_paralelo(lambda: cache.obter_ou_gerar("k", gerar))
+    assert iniciada.wait(5)
+
+    seguidor, resultado_seguidor = _em_paralelo(lambda: cache.obter_ou_gerar("k", lambda: "resposta do seguidor"))
+    assert esperando.wait(5)
+    liberar.set()
+    lider.join(5)
+    seguidor.join(5)
+
+    assert isinstance(resultado_lider["erro"], InterrupcaoSessao)
+    assert resultado_seguidor["valor"] == ("resposta do seguidor", "gerada")
+    assert cache.obter_ou_gerar("k", lambda: "outra") == ("resposta do seguidor", "cache")
+
+
+def test_erro_da_geracao_e_repassado_a_quem_espera_e_nao_fica_no_cache(esperando):
+    cache = CacheRespostas()
+    gerar, iniciada, liberar = _geracao_controlada(erro=TimeoutError("modelo indisponível"))
+    lider, resultado_lider = _em_paralelo(lambda: cache.obter_ou_gerar("k", gerar))
+    assert iniciada.wait(5)
+
+    seguidor, resultado_seguidor = _em_paralelo(lambda: cache.obter_ou_gerar("k", lambda: "outra"))
+    assert esperando.wait(5)
+    liberar.set()
+    lider.join(5)
+    seguidor.join(5)
+
+    assert isinstance(resultado_lider["erro"], TimeoutError)
+    assert resultado_seguidor["erro"] is resultado_lider["erro"]
+    assert cache.obter_ou_gerar("k", lambda: "nova tentativa") == ("nova tentativa", "gerada")
+
+
+def test_espera_longa_demais_gera_a_propria_resposta(esperando):
+    cache = CacheRespostas(espera_maxima_s=0.05)
+    gerar, iniciada, liberar = _geracao_controlada(resposta="lenta")
+    lider, _ = _em_paralelo(lambda: cache.obter_ou_gerar("k", gerar))
+    assert iniciada.wait(5)
+
+    try:
+        assert cache.obter_ou_gerar("k", lambda: "rápida") == ("rápida", "gerada")
+    finally:
+        liberar.set()
+        lider.join(5)
+
+
+def test_entradas_expiram_pelo_ttl_e_saem_pela_mais_antiga(monkeypatch):
+    agora = [1_000_000.0]
+    monkeypatch.setattr(cache_respostas.time, "time", lambda: agora[0])
+    cache = CacheRespostas(capacidade=2, ttl_segundos=60)
+
+    cache.obter_ou_gerar("a", lambda: "A")
+    cache.obter_ou_gerar("b", lambda: "B")
+    cache.obter_ou_gerar("a", lambda: "A2")  # "a" passa a ser a usada mais recentemente
+    cache.obter_ou_gerar("c", lambda: "C")
+
+    assert cache.obter_ou_gerar("b", lambda: "B2") == ("B2", "gerada")
+    agora[0] += 61
+    assert cache.obter_ou_gerar("c", lambda: "C2") == ("C2", "gerada")
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from contexto import construir_contexto, estimar_tokens, limitar_tokens, resumir_acoes, resumir_indicadores
+
+
+def _acoes():
+    datas = pd.bdate_range("2025-05-01", periods=5)
+    return pd.DataFrame({
+        "ticker": ["PETR4"] * 5 + ["VALE3"] * 5,
+        "fechamento": [30.0, 31.0, 32.0, 33.0, 34.5] + [60.0, 58.0, 57.0, 55.0, 54.0],
+        "volume": [100.0] * 5 + [300.0] * 5,
+    }, index=datas.append(datas))
+
+
+def test_resumo_de_acoes_tem_uma_linha_por_ticker_com_variacao_e_tendencia():
+    resumo = resumir_acoes(_acoes()).set_index("ticker")
+
+    assert resumo.loc["PETR4", "ultimo"] == 34.5
+    assert np.isclose(resumo.loc["PETR4", "variacao_pct"], 15.0)
+    assert (resumo.loc["VALE3", "minimo"], resumo.loc["VALE3", "maximo"]) == (54.0, 60.0)
+    assert resumo["tendencia"].to_dict() == {"PETR4": "alta", "VALE3": "baixa"}
+    assert (resumo.loc["VALE3", "desde"], resumo.loc["VALE3", "ate"]) == ("01/05/2025", "07/05/2025")
+    assert resumo.loc["VALE3", "volume_medio"] == 300.0
+
+
+def test_resumo_de_indicadores_usa_a_penultima_observacao_de_cada_um():
+    indicadores = pd.DataFrame({
+        "data": pd.to_datetime(["2025-03-01", "2025-01-01", "2025-02-01", "2025-01-01", "2025-02-01", None]),
+        "indicador": ["SELIC", "SELIC", "SELIC", "IPCA", "IPCA", "IPCA"],
+        "valor": [14.25, 13.25, 13.75, 0.16, 1.31, 9.0],
+    })
+
+    resumo = resumir_indicadores(indicadores).set_index("indicador")
+
+    assert resumo.loc["SELIC", "data"] == "01/03/2025"
+    assert np.isclose(resumo.loc["SELIC", "delta"], 0.5)
+    assert np.isclose(resumo.loc["IPCA", "delta"], 1.15)
+    assert resumo.loc["SELIC", "tendencia"] == "alta"
+    assert resumo["n"].to_dict() == {"SELIC": 3, "IPCA": 2}
+
+
+def test_limitar_tokens_mantem_o_cabecalho_e_avisa_o_que_ficou_de_fora():
+    linhas = ["ticker,ultimo"] + [f"TICK{i},{i}.5 com uma descrição longa o bastante" for i in range(50)]
+
+    texto = limitar_tokens(linhas, orcamento=60)
+
+    assert texto.startswith("ticker,ultimo\n")
+    assert texto.splitlines()[-1].endswith("linhas omitidas pelo limite de 60 tokens)")
+    assert estimar_tokens("\n".join(texto.splitlines()[:-1])) <= 60
+    assert limitar_tokens(linhas[:3], orcamento=1000) == "\n".join(linhas[:3])
+
+
+def test_contexto_respeita_o_orcamento_de_cada_secao():
+    noticias = pd.DataFrame({
+        "titulo": [f"Notícia número {i} sobre o mercado de ações brasileiro" for i in range(200)],
+        "fonte": ["Valor"] * 200,
+    })
+
+    contexto = construir_contexto(_acoes(), None, noticias, orcamentos={"noticias": 100})
+
+    assert contexto["tokens"]["noticias"] <= 100 + estimar_tokens("... (200 linhas omitidas pelo limite de 100 tokens)")
+    assert "omitidas" in contexto["secoes"]["noticias"]
+    assert contexto["secoes"]["indicadores"] == "Nenhum indicador econômico disponível."
+    assert contexto["secoes"]["acoes"].splitlines()[0].startswith("ticker,desde,ate,ultimo")
+    assert "sensibilidades" not in contexto["secoes"]
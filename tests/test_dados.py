@@ -0,0 +1,100 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+import dados
+
+
+@pytest.fixture
+def diretorio_dados(tmp_path, monkeypatch):
+    monkeypatch.setattr(dados, "DIRETORIO_DADOS", str(tmp_path))
+    monkeypatch.setattr(dados.time, "sleep", lambda segundos: None)
+    return tmp_path
+
+
+def _precos(ticker, datas, fechamento):
+    return pd.DataFrame({"data": pd.to_datetime(datas), "abertura": fechamento, "alta": fechamento,
+                         "baixa": fechamento, "fechamento": fechamento, "volume": 100, "ticker": ticker})
+
+
+def test_acrescimos_mais_recentes_prevalecem_na_leitura(diretorio_dados):
+    dados.acrescentar("precos", _precos("PETR4", ["2025-05-08", "2025-05-09"], 30.0))
+    dados.acrescentar("precos", _precos("PETR4", ["2025-05-09", "2025-05-12"], 31.0))
+
+    df = dados.ler("precos").sort_values("data")
+
+    assert df["data"].dt.strftime("%Y-%m-%d").tolist() == ["2025-05-08", "2025-05-09", "2025-05-12"]
+    assert df["fechamento"].tolist() == [30.0, 31.0, 31.0]
+    assert df["fechamento"].dtype == "float32"
+    assert isinstance(df["ticker"].dtype, pd.CategoricalDtype)
+
+
+def test_leitura_repete_quando_a_compactacao_remove_uma_parte(diretorio_dados, monkeypatch):
+    for dia in range(1, 4):
+        dados.acrescentar("precos", _precos("VALE3", [f"2025-05-0{dia}"], float(dia)))
+    leitura_original = dados.pd.read_parquet
+    tentativas = []
+
+    def ler_durante_compactacao(caminho, *args, **kwargs):
+        if caminho != dados.caminho("precos"):
+            return leitura_original(caminho, *args, **kwargs)  # leitura das partes pela própria compactação
+        tentativas.append(caminho)
+        if len(tentativas) == 1:
+            # As partes listadas somem no meio da leitura, como faz o pyarrow numa compactação concorrente
+            dados.compactar_particao("precos", os.path.join(dados.caminho("precos"), "ticker=VALE3"))
+            raise FileNotFoundError("parte removida pela compactação")
+        return leitura_original(caminho, *args, **kwargs)
+
+    monkeypatch.setattr(dados.pd, "read_parquet", ler_durante_compactacao)
+    df = dados.ler("precos")
+
+    assert len(tentativas) == 2
+    assert len(glob.glob(os.path.join(dados.caminho("precos"), "ticker=VALE3", "*.parquet"))) == 1
+    assert sorted(df["fechamento"].tolist()) == [1.0, 2.0, 3.0]
+
+
+def test_leitura_desiste_depois_das_tentativas(diretorio_dados, monkeypatch):
+    dados.acrescentar("precos", _precos("VALE3", ["2025-05-02"], 1.0))
+
+    def sempre_falha(*args, **kwargs):
+        raise FileNotFoundError("parte removida pela compactação")
+
+    monkeypatch.setattr(dados.pd, "read_parquet", sempre_falha)
+    with pytest.raises(FileNotFoundError):
+        dados.ler("precos")
+
+
+def test_csv_legado_e_lido_com_filtros_sem_ser_convertido(diretorio_dados):
+    pd.DataFrame({"data": ["02/05/2025", "05/05/2025"], "valor": [14.75, 14.75],
+                  "indicador": ["Selic", "IPCA"], "data_coleta": ["2025-05-06", "2025-05-06"]}) \
+        .to_csv(diretorio_dados / "indicadores_economicos.csv", index=False)
+
+    df = dados.ler("indicadores_economicos", filtros=[("indicador", "==", "Selic")])
+
+    assert df["data"].tolist() == [pd.Timestamp("2025-05-02")]
+    assert not os.path.exists(dados.caminho("indicadores_economicos"))
+
+
+def test_versao_muda_a_cada_gravacao_e_nao_na_compactacao(diretorio_dados):
+    inicial, outra_tabela = dados.versao("precos"), dados.versao("top_10_acoes")
+    dados.acrescentar("precos", _precos("PETR4", ["2025-05-08"], 30.0))
+    depois_acrescimo = dados.versao("precos")
+    dados.compactar_particao("precos", os.path.join(dados.caminho("precos"), "ticker=PETR4"))
+
+    assert depois_acrescimo != inicial
+    assert dados.versao("precos") == depois_acrescimo
+    assert dados.versao("top_10_acoes") == outra_tabela
+
+    dados.salvar("top_10_acoes", _precos("PETR4", ["2025-05-08"], 30.0))
+    assert dados.versao("top_10_acoes") != outra_tabela
+
+
+def test_particoes_lista_os_tickers_sem_ler_as_partes(diretorio_dados):
+    assert dados.particoes("indicadores_tecnicos") == []
+    dados.acrescentar("precos", pd.concat([_precos("VALE3", ["2025-05-08"], 58.0),
+                                           _precos("PETR4", ["2025-05-08"], 30.0)]))
+
+    assert dados.particoes("precos") == ["PETR4", "VALE3"]
+    assert dados.ler("precos", filtros=[("ticker", "in", ["VALE3"])])["ticker"].tolist() == ["VALE3"]
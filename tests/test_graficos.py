@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from graficos import lttb, reduzir, reduzir_series, retornos_acumulados
+
+
+def _passeio_aleatorio(n, semente=7):
+    return 100 + np.cumsum(np.random.default_rng(semente).normal(size=n))
+
+
+def test_lttb_devolve_o_tamanho_pedido_com_as_pontas():
+    y = _passeio_aleatorio(10_000)
+
+    posicoes = lttb(np.arange(len(y)), y, 300)
+
+    assert len(posicoes) == 300
+    assert posicoes[0] == 0 and posicoes[-1] == len(y) - 1
+    assert np.all(np.diff(posicoes) > 0)
+
+
+def test_lttb_preserva_pico_isolado():
+    y = np.zeros(5_000)
+    y[3_217] = 50.0
+    y[1_001] = -40.0
+
+    posicoes = lttb(np.arange(len(y)), y, 50)
+
+    assert 3_217 in posicoes and 1_001 in posicoes
+
+
+def test_lttb_nao_reduz_series_curtas_ou_limites_degenerados():
+    y = _passeio_aleatorio(20)
+
+    assert np.array_equal(lttb(np.arange(20), y, 20), np.arange(20))
+    assert np.array_equal(lttb(np.arange(20), y, 2), np.arange(20))
+
+
+def test_reduzir_mantem_datas_das_pontas_e_colunas_alinhadas():
+    datas = pd.bdate_range("2015-01-01", periods=3_000)
+    fechamento = _passeio_aleatorio(len(datas))
+    df = pd.DataFrame({"fechamento": fechamento, "sma_20": fechamento * 2}, index=datas)
+    df.iloc[0, 0] = np.nan
+
+    reduzido = reduzir(df, 200)
+
+    assert len(reduzido) == 200
+    assert reduzido.index[0] == datas[1] and reduzido.index[-1] == datas[-1]
+    assert np.allclose(reduzido["sma_20"], reduzido["fechamento"] * 2)
+
+
+def test_reduzir_series_reduz_cada_coluna_no_formato_longo():
+    datas = pd.bdate_range("2020-01-01", periods=1_000)
+    largas = pd.DataFrame({"PETR4": _passeio_aleatorio(1_000, 1), "VALE3": _passeio_aleatorio(1_000, 2)}, index=datas)
+    largas.iloc[:400, 1] = np.nan
+
+    longas = reduzir_series(largas, 100)
+
+    assert list(longas.columns) == ["data", "serie", "valor"]
+    assert longas.groupby("serie")["data"].agg(["size", "min"]).to_dict() == {
+        "size": {"PETR4": 100, "VALE3": 100},
+        "min": {"PETR4": datas[0], "VALE3": datas[400]},
+    }
+
+
+def test_retornos_acumulados_partem_do_primeiro_valor_de_cada_acao():
+    fechamentos = pd.DataFrame({"PETR4": [10.0, 11.0, 12.0], "VALE3": [np.nan, 50.0, 40.0]})
+
+    retornos = retornos_acumulados(fechamentos)
+
+    assert np.allclose(retornos["PETR4"], [0.0, 10.0, 20.0])
+    assert np.allclose(retornos["VALE3"].iloc[1:], [0.0, -20.0])
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+import dados
+from indice_noticias import IndiceNoticias, hash_url, normalizar_url
+
+TITULO = "Petrobras anuncia plano de investimentos de US$ 111 bilhões até 2029"
+
+
+@pytest.fixture
+def diretorio_dados(tmp_path, monkeypatch):
+    monkeypatch.setattr(dados, "DIRETORIO_DADOS", str(tmp_path))
+    return tmp_path
+
+
+def _noticia(titulo, link, fonte="Valor"):
+    return {"titulo": titulo, "link": link, "fonte": fonte}
+
+
+def test_url_normalizada_ignora_rastreio_www_e_barra_final():
+    assert normalizar_url("http://www.Valor.com.br/mercados/petrobras/?utm_source=x&b=2&a=1#topo") == \
+        "https://valor.com.br/mercados/petrobras?a=1&b=2"
+    assert hash_url("https://valor.com.br/noticia?fbclid=abc") == hash_url("https://www.valor.com.br/noticia/")
+
+
+def test_titulo_quase_identico_em_outro_portal_e_marcado_como_duplicata(diretorio_dados):
+    indice = IndiceNoticias()
+
+    novas = indice.registrar([
+        _noticia(TITULO, "https://valor.com.br/petrobras-plano"),
+        _noticia("PETROBRAS anuncia novo plano de investimentos de US$ 111 bilhoes ate 2029",
+                 "https://infomoney.com.br/petrobras", fonte="InfoMoney"),
+        _noticia("Petrobras anuncia plano de desinvestimentos para 2030", "https://exame.com/petrobras"),
+    ])
+
+    assert [n["link"] for n in novas] == ["https://valor.com.br/petrobras-plano", "https://exame.com/petrobras"]
+    indice.salvar()
+    gravadas = dados.ler("noticias_indice").set_index("link")
+    # A duplicata também é gravada, para que a URL não seja reavaliada na próxima coleta
+    assert gravadas["duplicata"].to_dict() == {
+        "https://valor.com.br/petrobras-plano": False,
+        "https://infomoney.com.br/petrobras": True,
+        "https://exame.com/petrobras": False,
+    }
+
+
+def test_url_ja_vista_e_titulos_de_navegacao_sao_ignorados(diretorio_dados):
+    indice = IndiceNoticias()
+    indice.registrar([_noticia(TITULO, "https://valor.com.br/petrobras-plano")])
+    indice.salvar()
+
+    reaberto = IndiceNoticias()
+    novas = reaberto.registrar([
+        _noticia("Título reescrito pelo portal para a mesma matéria", "https://www.valor.com.br/petrobras-plano/?utm_medium=rss"),
+        _noticia("Mercados", "https://valor.com.br/mercados"),
+    ])
+
+    assert novas == []
+    reaberto.salvar()
+    assert len(dados.ler("noticias_indice")) == 1
+
+
+def test_quase_duplicatas_so_contam_dentro_da_janela_recente(diretorio_dados):
+    agora = pd.Timestamp.now().floor("s")
+    recente = "Copom mantém Selic em 10,50% ao ano pela segunda vez seguida"
+    gravadas = pd.DataFrame([
+        {"hash_url": hash_url(link), "titulo": titulo, "link": link, "fonte": "Valor",
+         "primeira_vez": agora - pd.Timedelta(days=dias), "duplicata": False}
+        for titulo, link, dias in [(TITULO, "https://valor.com.br/antiga", 30),
+                                   (recente, "https://valor.com.br/copom", 1)]
+    ])
+    dados.acrescentar("noticias_indice", gravadas)
+
+    novas = IndiceNoticias().registrar([
+        _noticia(TITULO, "https://valor.com.br/republicada"),
+        _noticia(recente, "https://infomoney.com.br/copom"),
+    ])
+
+    assert [n["link"] for n in novas] == ["https://valor.com.br/republicada"]
@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+import limitador_taxa
+from limitador_taxa import LimitadorTaxa
+
+
+def _estado(caminho):
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_compartilhado_reserva_em_lote_e_devolve_o_que_sobrou(tmp_path):
+    arquivo = str(tmp_path / "cota.json")
+    limitador = LimitadorTaxa(600, 100, arquivo_estado=arquivo, compartilhado=True, lote=10)
+
+    assert limitador.aguardar()
+    # Uma ida ao arquivo reservou o lote inteiro para este processo
+    assert _estado(arquivo)["chamadas"] == 10
+    for _ in range(3):
+        assert limitador.aguardar()
+    assert _estado(arquivo)["chamadas"] == 10
+
+    limitador.liberar_reservas()
+    assert _estado(arquivo)["chamadas"] == 4
+
+
+def test_reservas_de_um_processo_contam_para_os_outros(tmp_path):
+    arquivo = str(tmp_path / "cota.json")
+    primeiro = LimitadorTaxa(600, 15, arquivo_estado=arquivo, compartilhado=True, lote=10)
+    segundo = LimitadorTaxa(600, 15, arquivo_estado=arquivo, compartilhado=True, lote=10)
+
+    assert primeiro.aguardar()
+    liberadas = sum(segundo.aguardar() for _ in range(10))
+
+    # O segundo só tem o que o lote do primeiro deixou no orçamento do dia
+    assert liberadas == 5
+    primeiro.liberar_reservas()
+    assert segundo.aguardar()
+
+
+def test_sinal_de_limite_descarta_as_reservas(tmp_path, monkeypatch):
+    monkeypatch.setattr(limitador_taxa.random, "uniform", lambda a, b: 1.0)
+    arquivo = str(tmp_path / "cota.json")
+    limitador = LimitadorTaxa(600, 100, arquivo_estado=arquivo, compartilhado=True, lote=10)
+
+    assert limitador.aguardar()
+    limitador.registrar_limite()
+
+    estado = _estado(arquivo)
+    assert estado["chamadas"] == 1
+    assert estado["fichas"] == 0.0
+    assert estado["bloqueado_ate"] > estado["ultima_reposicao"]
+
+
+class RelogioSimulado:
+    """Substitui time.time/time.sleep do limitador: dormir só avança o relógio."""
+
+    def __init__(self, monkeypatch, inicio=1_000_000.0):
+        self.agora = inicio
+        self.esperas = []
+        monkeypatch.setattr(limitador_taxa.time, "time", lambda: self.agora)
+        monkeypatch.setattr(limitador_taxa.time, "sleep", self.dormir)
+
+    def dormir(self, segundos):
+        self.esperas.append(segundos)
+        self.agora += segundos
+
+
+def test_balde_cheio_libera_a_rajada_e_depois_segue_a_reposicao(monkeypatch):
+    relogio = RelogioSimulado(monkeypatch)
+    limitador = LimitadorTaxa(60, 1000)
+
+    for _ in range(60):
+        assert limitador.aguardar()
+    assert relogio.esperas == []
+
+    # Balde vazio: 60 por minuto repõe uma ficha por segundo
+    assert limitador.aguardar()
+    assert sum(relogio.esperas) == pytest.approx(1.0)
+
+    relogio.agora += 10
+    esperas_antes = len(relogio.esperas)
+    for _ in range(10):
+        assert limitador.aguardar()
+    assert len(relogio.esperas) == esperas_antes
+
+
+def test_reposicao_nao_passa_da_capacidade(monkeypatch):
+    relogio = RelogioSimulado(monkeypatch)
+    limitador = LimitadorTaxa(5, 1000)
+
+    relogio.agora += 3600
+    for _ in range(5):
+        assert limitador.aguardar()
+    assert relogio.esperas == []
+    assert limitador.aguardar()
+    assert sum(relogio.esperas) == pytest.approx(12.0)
+
+
+def test_cota_diaria_esgotada_nao_bloqueia_e_vale_entre_execucoes(tmp_path, monkeypatch):
+    RelogioSimulado(monkeypatch)
+    arquivo = str(tmp_path / "cota.json")
+    limitador = LimitadorTaxa(60, 3, arquivo_estado=arquivo)
+
+    assert [limitador.aguardar() for _ in range(4)] == [True, True, True, False]
+    assert limitador.cota_restante() == 0
+
+    # Nova execução no mesmo dia lê o consumo gravado
+    assert not LimitadorTaxa(60, 3, arquivo_estado=arquivo).aguardar()
+
+
+def test_contagem_do_dia_anterior_nao_vale_hoje(tmp_path, monkeypatch):
+    RelogioSimulado(monkeypatch)
+    arquivo = str(tmp_path / "cota.json")
+    with open(arquivo, "w", encoding="utf-8") as f:
+        json.dump({"dia": "2000-01-01", "chamadas": 3}, f)
+
+    limitador = LimitadorTaxa(60, 3, arquivo_estado=arquivo)
+
+    assert limitador.cota_restante() == 3
+    assert limitador.aguardar()
+
+
+def test_aviso_de_limite_diario_esgota_a_cota(tmp_path, monkeypatch):
+    RelogioSimulado(monkeypatch)
+    limitador = LimitadorTaxa(60, 500, arquivo_estado=str(tmp_path / "cota.json"))
+
+    limitador.esgotar_cota_diaria()
+
+    assert limitador.cota_restante() == 0
+    assert not limitador.aguardar()
+
+
+def test_recuo_exponencial_ate_o_teto(monkeypatch):
+    RelogioSimulado(monkeypatch)
+    monkeypatch.setattr(limitador_taxa.random, "uniform", lambda a, b: 1.0)
+    limitador = LimitadorTaxa(60, 1000, espera_base=2.0, espera_maxima=10.0)
+
+    assert [limitador.registrar_limite() for _ in range(4)] == [2.0, 4.0, 8.0, 10.0]
+    limitador.registrar_sucesso()
+    assert limitador.registrar_limite() == 2.0
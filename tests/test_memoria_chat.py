@@ -0,0 +1,63 @@
+from contexto import estimar_tokens
+from memoria_chat import MemoriaChat
+
+
+def _conversar(memoria, turnos, resumir=None):
+    for i in range(1, turnos + 1):
+        memoria.adicionar(f"pergunta {i}", f"resposta {i}", resumir=resumir)
+
+
+def test_turnos_alem_da_janela_vao_para_o_resumo():
+    memoria = MemoriaChat(janela_turnos=2, orcamento_tokens=10_000, orcamento_resumo=10_000)
+
+    _conversar(memoria, 4)
+
+    assert [t["pergunta"] for t in memoria.recentes] == ["pergunta 3", "pergunta 4"]
+    assert "Usuário: pergunta 1" in memoria.resumo and "Analista: resposta 2" in memoria.resumo
+    assert memoria.mensagens("Contexto.", "pergunta 5") == [
+        ("sistema", f"Contexto.\n\n**Resumo da conversa até aqui:**\n{memoria.resumo}"),
+        ("usuario", "pergunta 3"), ("assistente", "resposta 3"),
+        ("usuario", "pergunta 4"), ("assistente", "resposta 4"),
+        ("usuario", "pergunta 5"),
+    ]
+
+
+def test_resumo_do_modelo_incorpora_o_resumo_anterior():
+    recebidos = []
+
+    def resumir(instrucao, texto):
+        recebidos.append(texto)
+        return f"resumo {len(recebidos)}"
+
+    memoria = MemoriaChat(janela_turnos=1, orcamento_tokens=10_000)
+    _conversar(memoria, 3, resumir=resumir)
+
+    assert memoria.resumo == "resumo 2"
+    assert recebidos[1].startswith("Resumo anterior:\nresumo 1")
+    assert "pergunta 2" in recebidos[1]
+
+
+def test_falha_do_modelo_cai_no_texto_cortado_no_orcamento():
+    def resumir(instrucao, texto):
+        raise RuntimeError("sem cota")
+
+    memoria = MemoriaChat(janela_turnos=1, orcamento_tokens=10_000, orcamento_resumo=20)
+    memoria.adicionar("pergunta longa " * 50, "resposta longa " * 50)
+    memoria.adicionar("pergunta 2", "resposta 2", resumir=resumir)
+
+    assert memoria.resumo.startswith("...")
+    # Fica o fim do texto, o mais recente
+    assert memoria.resumo.rstrip().endswith("resposta longa")
+    assert estimar_tokens(memoria.resumo[3:]) <= 20
+
+
+def test_orcamento_de_tokens_limita_o_historico_mas_guarda_o_ultimo_turno():
+    memoria = MemoriaChat(janela_turnos=10, orcamento_tokens=200, orcamento_resumo=50)
+
+    for i in range(6):
+        memoria.adicionar(f"pergunta {i} " + "detalhe " * 40, "resposta " * 40)
+        assert memoria.recentes[-1]["pergunta"].startswith(f"pergunta {i} ")
+        assert len(memoria.recentes) == 1 or memoria.tokens() <= 200
+
+    memoria.adicionar("enorme " * 1000, "ok")
+    assert [t["pergunta"] for t in memoria.recentes] == ["enorme " * 1000]
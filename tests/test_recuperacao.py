@@ -0,0 +1,85 @@
+import math
+
+import pytest
+
+from recuperacao import IndiceRecuperacao, tokenizar
+
+
+class Fonte:
+    """Fonte de trechos com versão controlada pelo teste; conta quantas vezes foi lida."""
+
+    def __init__(self, trechos):
+        self.trechos, self.versao, self.leituras = trechos, 1, 0
+
+    def gerar(self):
+        self.leituras += 1
+        return list(self.trechos)
+
+
+def _indice(**fontes):
+    return IndiceRecuperacao({nome: (lambda f=fonte: f.versao, fonte.gerar) for nome, fonte in fontes.items()})
+
+
+def test_tokenizar_remove_acentos_e_stopwords():
+    assert tokenizar("Qual é a tendência da Selic hoje?") == ["tendencia", "selic"]
+
+
+def test_busca_ordena_pelos_trechos_mais_relevantes():
+    indice = _indice(
+        relatorio=Fonte(["Selic deve cair no segundo semestre", "Petrobras paga dividendos elevados"]),
+        noticias=Fonte(["Copom sinaliza Selic estável; Selic em 10,5%", "Vale amplia produção de minério"]),
+    )
+    indice.atualizar()
+
+    resultados = indice.buscar("Selic", k=5)
+
+    assert [r["texto"] for r in resultados] == ["Copom sinaliza Selic estável; Selic em 10,5%",
+                                                "Selic deve cair no segundo semestre"]
+    assert resultados[0]["fonte"] == "noticias"
+    assert indice.buscar("inflação americana") == []
+
+
+def test_pontuacao_segue_a_formula_do_bm25():
+    documentos = ["selic alta", "selic juros juros futuro", "dolar"]
+    indice = _indice(docs=Fonte(documentos))
+    indice.atualizar()
+
+    comprimentos = [2, 4, 1]
+    media = sum(comprimentos) / 3
+    idf = math.log(1 + (3 - 2 + 0.5) / (2 + 0.5))
+    esperadas = [idf * 2.5 / (1 + 1.5 * (0.25 + 0.75 * c / media)) for c in comprimentos[:2]]
+
+    resultados = indice.buscar("selic")
+    assert [r["pontuacao"] for r in resultados] == pytest.approx(esperadas)
+
+
+def test_atualizar_so_recarrega_as_fontes_alteradas():
+    relatorio, noticias = Fonte(["Selic deve cair"]), Fonte(["Dólar sobe com tensão fiscal"])
+    indice = _indice(relatorio=relatorio, noticias=noticias)
+
+    assert indice.atualizar() == ["relatorio", "noticias"]
+    assert indice.atualizar() == []
+
+    noticias.versao, noticias.trechos = 2, ["Dólar cai após leilão do Banco Central"]
+    assert indice.atualizar() == ["noticias"]
+    assert (relatorio.leituras, noticias.leituras) == (1, 2)
+    assert [r["texto"] for r in indice.buscar("dólar")] == ["Dólar cai após leilão do Banco Central"]
+
+
+def test_fonte_com_erro_fica_vazia_sem_derrubar_as_outras(capsys):
+    def quebrada():
+        raise OSError("arquivo em uso")
+
+    indice = IndiceRecuperacao({"relatorio": (lambda: 1, quebrada), "noticias": (lambda: 1, lambda: ["Selic estável"])})
+    indice.atualizar()
+
+    assert "Fonte 'relatorio' indisponível" in capsys.readouterr().out
+    assert [r["fonte"] for r in indice.buscar("selic")] == ["noticias"]
+
+
+def test_contexto_formata_os_trechos_ou_avisa_que_nao_ha_dados():
+    indice = _indice(noticias=Fonte(["Selic estável"]))
+
+    assert indice.contexto("selic") == "Nenhum dado coletado relevante para esta pergunta."
+    indice.atualizar()
+    assert indice.contexto("selic") == "- [noticias] Selic estável"
@@ -0,0 +1,38 @@
+import os
+from datetime import datetime
+
+import registro_execucao
+from registro_execucao import RegistroExecucao, ultima_execucao
+
+
+class _RelogioParado(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 5, 20, 10, 0, 0)
+
+
+def test_execucoes_no_mesmo_segundo_ficam_em_pastas_diferentes(tmp_path, monkeypatch):
+    monkeypatch.setattr(registro_execucao, "datetime", _RelogioParado)
+
+    agendada = RegistroExecucao(str(tmp_path))
+    manual = RegistroExecucao(str(tmp_path))
+    manual.finalizar("concluida")
+
+    assert agendada.id == "20250520-100000"
+    assert manual.id == "20250520-100000-02"
+    assert os.path.isdir(agendada.diretorio) and os.path.isdir(manual.diretorio)
+    assert ultima_execucao(str(tmp_path))["id"] == manual.id
+
+
+def test_etapa_que_falha_fica_registrada(tmp_path):
+    registro = RegistroExecucao(str(tmp_path))
+    try:
+        with registro.etapa("analise_cenario"):
+            raise TimeoutError("Azure não respondeu")
+    except TimeoutError:
+        registro.finalizar("falhou")
+
+    estado = ultima_execucao(str(tmp_path))
+    assert estado["status"] == "falhou"
+    assert estado["etapas"]["analise_cenario"]["status"] == "falhou"
+    assert "TimeoutError" in estado["etapas"]["analise_cenario"]["erro"]